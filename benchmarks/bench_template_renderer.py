@@ -0,0 +1,94 @@
+"""Micro-benchmark of the report page renderer.
+
+Compares rendering the completed report page with the precompiled templates
+against the previous implementation, which read the template file on every
+render and ran one ``str.replace`` over the page per placeholder.
+
+Run from the project root:
+
+    python benchmarks/bench_template_renderer.py [--number 2000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from oncallm.template_renderer import TemplateRenderer  # noqa: E402
+
+_ALERT_INFO = {
+    "name": "PodCrashLooping",
+    "namespace": "production",
+    "service": "checkout",
+    "pod": "checkout-7d9f8b6c5-x2x4q",
+    "severity": "critical",
+    "started_at": "2024-01-15T10:30:00Z",
+    "summary": "Pod is crash looping",
+    "description": "Pod checkout-7d9f8b6c5-x2x4q restarted 12 times in 10 minutes",
+}
+
+_ANALYSIS = {
+    field: f"{field.replace('_', ' ').capitalize()}: " + "details " * 60
+    for field in (
+        "root_cause", "diagnosis", "summary_of_findings", "recommended_actions",
+        "solution", "conclusion", "recommendations",
+    )
+}
+
+
+def _legacy_render(renderer: TemplateRenderer, data: Dict[str, Any]) -> str:
+    """The previous implementation: read the file, one replace per key."""
+    rendered = renderer._load_template("completed")
+    for key, value in data.items():
+        rendered = rendered.replace(f"{{{{{key}}}}}", str(value))
+    return rendered
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000,
+                        help="renders per measurement")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="measurements; the fastest is reported")
+    args = parser.parse_args()
+
+    renderer = TemplateRenderer(auto_reload=False)
+    data = {
+        "fingerprint": "abc123def456",
+        "alert_name": _ALERT_INFO["name"],
+        "namespace": _ALERT_INFO["namespace"],
+        "service": _ALERT_INFO["service"],
+        "pod": _ALERT_INFO["pod"],
+        "severity": _ALERT_INFO["severity"],
+        "started_at": _ALERT_INFO["started_at"],
+        "summary": _ALERT_INFO["summary"],
+        "description": _ALERT_INFO["description"],
+        "created_at": "2024-01-15T10:31:12Z",
+        "related_alerts": "",
+        **_ANALYSIS,
+    }
+    reload_renderer = TemplateRenderer(auto_reload=True)
+
+    cases = {
+        "previous (read + replace per key)": lambda: _legacy_render(renderer, data),
+        "compiled": lambda: renderer.render_completed_page(
+            "abc123def456", _ALERT_INFO, _ANALYSIS, "2024-01-15T10:31:12Z"
+        ),
+        "compiled, auto reload": lambda: reload_renderer.render_completed_page(
+            "abc123def456", _ALERT_INFO, _ANALYSIS, "2024-01-15T10:31:12Z"
+        ),
+    }
+    baseline = None
+    for name, render in cases.items():
+        best = min(timeit.repeat(render, number=args.number, repeat=args.repeat))
+        per_render = best / args.number * 1e6
+        if baseline is None:
+            baseline = per_render
+        print(f"{name:36} {per_render:8.1f} us/render  {baseline / per_render:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
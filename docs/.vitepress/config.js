@@ -73,7 +73,9 @@ module.exports = {
         {
           text: 'API Reference',
           items: [
-            { text: 'Webhook Endpoint', link: '/api/webhook' }
+            { text: 'Webhook Endpoint', link: '/api/webhook' },
+            { text: 'Reports', link: '/api/reports' },
+            { text: 'Completion Callbacks', link: '/api/callbacks' }
           ]
         }
       ]
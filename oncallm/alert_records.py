@@ -0,0 +1,197 @@
+"""Compact, shared records of the alert groups referenced by reports.
+
+Every alert of a group gets its own report, and each report used to carry a
+full copy of the group. Reports now reference one immutable
+``AlertGroupRecord`` per group snapshot together with the index of their
+alert, so a group of 50 alerts is held once instead of 50 times.
+
+Records use slotted objects and tuples instead of dictionaries, and intern
+label names and values, which repeat across alerts and groups. A record is
+identified by a hash of its content, and records that are still referenced
+are reused, so reports written at different times for the same snapshot
+share one object.
+"""
+
+import hashlib
+import json
+import sys
+import threading
+from typing import Any, Dict, Optional, Tuple
+import weakref
+
+from oncallm.alerts import AlertGroup
+
+# (name, value) pairs, sorted by name.
+Pairs = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+# group_id -> record, for records that are still referenced somewhere.
+_records: "weakref.WeakValueDictionary[str, AlertGroupRecord]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+class AlertRecord:
+    """One alert of a group record. Never modified after creation."""
+
+    __slots__ = (
+        "status", "labels", "annotations", "starts_at", "ends_at",
+        "generator_url", "fingerprint",
+    )
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        """Build the record from a serialized alert.
+
+        Args:
+            data: The alert as produced by ``Alert.model_dump(mode="json")``.
+        """
+        self.status = sys.intern(data["status"])
+        self.labels = _interned_pairs(data.get("labels"))
+        self.annotations = _pairs(data.get("annotations"))
+        self.starts_at: Optional[str] = data.get("startsAt")
+        self.ends_at: Optional[str] = data.get("endsAt")
+        self.generator_url: str = data.get("generatorURL", "")
+        self.fingerprint: str = data["fingerprint"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The alert in the layout of ``Alert.model_dump(mode="json")``."""
+        return {
+            "status": self.status,
+            "labels": dict(self.labels),
+            "annotations": dict(self.annotations),
+            "startsAt": self.starts_at,
+            "endsAt": self.ends_at,
+            "generatorURL": self.generator_url,
+            "fingerprint": self.fingerprint,
+        }
+
+
+class AlertGroupRecord:
+    """An Alertmanager group as referenced by reports.
+
+    Shared by the reports of all alerts of the group, so it is never
+    modified after creation. Labels and annotations without a value are
+    left out.
+    """
+
+    __slots__ = (
+        "group_id", "size", "version", "group_key", "truncated_alerts",
+        "status", "receiver", "group_labels", "common_labels",
+        "common_annotations", "external_url", "alerts", "__weakref__",
+    )
+
+    def __init__(self, group_id: str, data: Dict[str, Any], size: int) -> None:
+        """Build the record from a serialized alert group.
+
+        Args:
+            group_id: Hash identifying the group's content.
+            data: The group as produced by ``AlertGroup.model_dump(mode="json")``.
+            size: Length of the group's JSON encoding.
+        """
+        self.group_id = group_id
+        self.size = size
+        self.version: str = data.get("version", "")
+        self.group_key: str = data.get("groupKey", "")
+        self.truncated_alerts: int = data.get("truncatedAlerts", 0)
+        self.status = sys.intern(data.get("status", ""))
+        self.receiver = sys.intern(data.get("receiver", ""))
+        self.group_labels = _interned_pairs(data.get("groupLabels"))
+        self.common_labels = _interned_pairs(data.get("commonLabels"))
+        self.common_annotations = _pairs(data.get("commonAnnotations"))
+        self.external_url = sys.intern(data.get("externalURL", ""))
+        self.alerts = tuple(AlertRecord(alert) for alert in data.get("alerts", ()))
+
+    def alert_labels(self, index: int) -> Dict[str, str]:
+        """The common labels of the group merged with those of one alert.
+
+        Args:
+            index: Position of the alert in the group.
+
+        Returns:
+            The labels, or only the common labels if there is no such alert.
+        """
+        labels = dict(self.common_labels)
+        if 0 <= index < len(self.alerts):
+            labels.update(self.alerts[index].labels)
+        return labels
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The group in the layout of ``AlertGroup.model_dump(mode="json")``."""
+        return {
+            "version": self.version,
+            "groupKey": self.group_key,
+            "truncatedAlerts": self.truncated_alerts,
+            "status": self.status,
+            "receiver": self.receiver,
+            "groupLabels": dict(self.group_labels),
+            "commonLabels": dict(self.common_labels),
+            "commonAnnotations": dict(self.common_annotations),
+            "externalURL": self.external_url,
+            "alerts": [alert.to_dict() for alert in self.alerts],
+        }
+
+
+def compact_alert_group(alert_group: AlertGroup) -> AlertGroupRecord:
+    """Get the shared record of an alert group.
+
+    Args:
+        alert_group: The group as received from Alertmanager.
+
+    Returns:
+        The record already held for a group with the same content, or a new
+        one.
+    """
+    data = alert_group.model_dump(mode="json")
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    group_id = hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+    return _shared_record(group_id, data, len(encoded))
+
+
+def load_alert_group(group_id: str, encoded: str) -> AlertGroupRecord:
+    """Get the shared record of a serialized alert group.
+
+    Args:
+        group_id: Identifier the record was stored under.
+        encoded: JSON encoding of the record's ``to_dict()``.
+
+    Returns:
+        The record already held under that identifier, or a decoded one.
+    """
+    with _lock:
+        record = _records.get(group_id)
+    if record is not None:
+        return record
+    return _shared_record(group_id, json.loads(encoded), len(encoded))
+
+
+def cached_alert_group(group_id: str) -> Optional[AlertGroupRecord]:
+    """The record held under an identifier, if it is still referenced."""
+    with _lock:
+        return _records.get(group_id)
+
+
+def _shared_record(
+    group_id: str, data: Dict[str, Any], size: int
+) -> AlertGroupRecord:
+    with _lock:
+        record = _records.get(group_id)
+        if record is None:
+            record = AlertGroupRecord(group_id, data, size)
+            _records[group_id] = record
+        return record
+
+
+def _pairs(mapping: Optional[Dict[str, Any]]) -> Pairs:
+    """Set values of a mapping as sorted pairs with interned names."""
+    return tuple(sorted(
+        (sys.intern(name), value)
+        for name, value in (mapping or {}).items()
+        if value is not None
+    ))
+
+
+def _interned_pairs(mapping: Optional[Dict[str, Any]]) -> Pairs:
+    """Like ``_pairs``, interning the values too."""
+    return tuple(
+        (name, sys.intern(str(value))) for name, value in _pairs(mapping)
+    )
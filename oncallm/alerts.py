@@ -10,6 +10,10 @@ class AlertLabel(BaseModel):
     severity: Optional[str] = None
     instance: Optional[str] = None
 
+    class Config:
+        # Keep every other label, e.g. node or deployment.
+        extra = "allow"
+
 class AlertAnnotation(BaseModel):
     summary: Optional[str] = None
     description: Optional[str] = None
@@ -0,0 +1,275 @@
+"""Outbound notifications of finished analyses.
+
+Every analysis that finishes, whether completed, partial or failed, is
+posted as JSON to the URLs in ``ONCALLM_CALLBACK_URLS``, so integrations can
+react to it instead of polling the reports. Analysis workers only hand the
+event over; requests are sent from the event loop over one pooled HTTP
+client.
+
+Each request carries a list of events. Events that queue up while earlier
+deliveries are in flight, as during an alert storm, are sent together, up to
+``ONCALLM_CALLBACK_BATCH_SIZE`` per request. Failed deliveries are retried
+with backoff, and those that still fail are written to a dead-letter log.
+"""
+
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+import json
+import logging
+import threading
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set
+
+import httpx
+
+from oncallm.retry import RetryPolicy
+
+_logger = logging.getLogger(__name__)
+
+# HTTP status codes after which a delivery is attempted again.
+_RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_callback_urls(spec: str) -> List[str]:
+    """Parse a comma-separated list of callback URLs.
+
+    Args:
+        spec: URLs, e.g. ``"http://bot:8080/oncallm,http://sync/hook"``.
+
+    Returns:
+        The URLs in order, without empty entries.
+    """
+    return [url.strip() for url in spec.split(",") if url.strip()]
+
+
+class CompletionNotifier:
+    """Delivers completion events to the configured callback URLs."""
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        batch_size: int = 1,
+        batch_window_seconds: float = 0.0,
+        max_pending: int = 10000,
+        max_connections: int = 10,
+        timeout_seconds: float = 10.0,
+        retry_policy: Optional[RetryPolicy] = None,
+        dead_letter_path: str = ""
+    ) -> None:
+        """Initialize the notifier.
+
+        Args:
+            urls: Callback URLs; every event is posted to each of them.
+            batch_size: Maximum events per request.
+            batch_window_seconds: How long to wait for more events before
+                sending a request that is not full. Zero sends right away,
+                batching only the events that are already waiting.
+            max_pending: Events that may wait for delivery. Events beyond
+                that are dead-lettered.
+            max_connections: Size of the HTTP connection pool, which also
+                bounds the deliveries in flight.
+            timeout_seconds: Timeout of a single request.
+            retry_policy: Attempts and backoff per delivery. Defaults to 5
+                attempts, backing off from 1 up to 60 seconds.
+            dead_letter_path: File that failed deliveries are appended to as
+                JSON lines. Empty to only log them.
+        """
+        self.urls = list(urls)
+        self.batch_size = max(1, batch_size)
+        self.batch_window_seconds = batch_window_seconds
+        self.max_pending = max_pending
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=5, base_delay_seconds=1.0, max_delay_seconds=60.0
+        )
+        self.dead_letter_path = dead_letter_path
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        self._dead_letter_lock = threading.Lock()
+        self.delivered = 0
+        self.dead_lettered = 0
+
+    def start(self) -> None:
+        """Start delivering events. Must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_connections)
+        self._runner = asyncio.create_task(self._run())
+
+    def notify(self, event: Dict[str, Any]) -> None:
+        """Queue an event for delivery without waiting for it.
+
+        Safe to call from any thread.
+
+        Args:
+            event: JSON-compatible description of the finished analysis.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._dead_letter([event], "notifier not running")
+            return
+        loop.call_soon_threadsafe(self._enqueue, event)
+
+    async def close(self, timeout_seconds: float = 5.0) -> None:
+        """Stop delivering events.
+
+        Deliveries in flight get ``timeout_seconds`` to finish. Events that
+        were not delivered by then are dead-lettered.
+
+        Args:
+            timeout_seconds: Longest time to wait for deliveries in flight.
+        """
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+        if self._pending:
+            self._dead_letter(list(self._pending), "shutdown")
+            self._pending.clear()
+        if self._deliveries:
+            _, unfinished = await asyncio.wait(
+                set(self._deliveries), timeout=timeout_seconds
+            )
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Delivery counters."""
+        return {
+            "pending": len(self._pending),
+            "in_flight": len(self._deliveries),
+            "delivered": self.delivered,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    def _enqueue(self, event: Dict[str, Any]) -> None:
+        if len(self._pending) >= self.max_pending:
+            _logger.error("Callback queue full, dead-lettering event")
+            self._dead_letter([event], "queue full")
+            return
+        self._pending.append(event)
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        """Group waiting events into requests and start their delivery."""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            if (
+                len(self._pending) < self.batch_size
+                and self.batch_window_seconds > 0
+            ):
+                deadline = loop.time() + self.batch_window_seconds
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            # Wait for a free connection first, so events keep collecting
+            # into the next batch while all connections are busy.
+            await self._slots.acquire()
+            events = [
+                self._pending.popleft()
+                for _ in range(min(self.batch_size, len(self._pending)))
+            ]
+            for index, url in enumerate(self.urls):
+                if index > 0:
+                    await self._slots.acquire()
+                task = asyncio.create_task(self._deliver(url, events))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, url: str, events: List[Dict[str, Any]]) -> None:
+        """Post a batch of events to one URL, retrying transient failures.
+
+        Holds a connection slot, taken by the caller, until it returns.
+        """
+        body = json.dumps({"events": events}, default=str)
+        error = "cancelled"
+        try:
+            for attempt in range(1, self.retry_policy.max_attempts + 1):
+                try:
+                    response = await self._client.post(
+                        url,
+                        content=body,
+                        headers={"Content-Type": "application/json"}
+                    )
+                except httpx.TransportError as e:
+                    error = str(e) or type(e).__name__
+                    retryable = True
+                else:
+                    if response.is_success:
+                        self.delivered += len(events)
+                        return
+                    error = f"HTTP {response.status_code}"
+                    retryable = response.status_code in _RETRYABLE_STATUS_CODES
+                if not retryable or attempt == self.retry_policy.max_attempts:
+                    break
+                delay = self.retry_policy.next_delay(attempt)
+                _logger.warning(
+                    "Callback to %s failed on attempt %d (%s), retrying in %.1fs",
+                    url, attempt, error, delay
+                )
+                await asyncio.sleep(delay)
+            _logger.error(
+                "Giving up on callback to %s with %d events: %s",
+                url, len(events), error
+            )
+            await asyncio.to_thread(self._dead_letter, events, error, url)
+        except asyncio.CancelledError:
+            self._dead_letter(events, error, url)
+            raise
+        finally:
+            self._slots.release()
+
+    def _dead_letter(
+        self,
+        events: List[Dict[str, Any]],
+        reason: str,
+        url: Optional[str] = None
+    ) -> None:
+        """Record events that could not be delivered."""
+        self.dead_lettered += len(events)
+        if not self.dead_letter_path:
+            _logger.error(
+                "Dropped %d callback events (%s): %s",
+                len(events), reason, json.dumps(events, default=str)
+            )
+            return
+        entry = json.dumps({
+            "failed_at": datetime.now(timezone.utc).isoformat(),
+            "url": url,
+            "reason": reason,
+            "events": events,
+        }, default=str)
+        try:
+            with self._dead_letter_lock:
+                with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(entry + "\n")
+        except OSError as e:
+            _logger.error(
+                "Could not write callback dead-letter log %s: %s; events: %s",
+                self.dead_letter_path, e, entry
+            )
@@ -0,0 +1,152 @@
+"""Suppression of duplicate alert notifications.
+
+Alertmanager re-sends every firing alert each ``repeat_interval``. An alert is
+considered a duplicate when an alert with the same fingerprint and the same
+labels and annotations is already queued or running, or was analysed
+successfully within the configured TTL.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import time
+from typing import Callable, Dict, Iterable, Tuple
+
+from oncallm.alerts import Alert
+from oncallm.jobs import AnalysisJob
+
+
+def alert_content_hash(alert: Alert) -> str:
+    """Hash the labels and annotations of an alert.
+
+    Args:
+        alert: The alert to hash.
+
+    Returns:
+        Hex digest that changes whenever a label or annotation changes.
+    """
+    content = {
+        "labels": alert.labels.model_dump(),
+        "annotations": alert.annotations.model_dump(),
+    }
+    encoded = json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class AlertDeduplicator:
+    """Tracks in-flight and recently completed alerts by fingerprint.
+
+    All methods are expected to be called from the event loop thread.
+    """
+
+    def __init__(
+        self,
+        completed_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Initialize the deduplicator.
+
+        Args:
+            completed_ttl_seconds: How long a completed analysis is reused for
+                identical notifications.
+            clock: Monotonic time source, overridable for tests.
+        """
+        self.completed_ttl_seconds = completed_ttl_seconds
+        self._clock = clock
+        # fingerprint -> (content hash, job_id) of queued or running jobs.
+        self._in_flight: Dict[str, Tuple[str, str]] = {}
+        # fingerprint -> (content hash, completion time), oldest first.
+        self._completed: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def is_duplicate(self, alert: Alert) -> bool:
+        """Check whether an identical alert is in flight or recently analysed.
+
+        Args:
+            alert: Incoming alert notification.
+
+        Returns:
+            True if the notification needs no new analysis.
+        """
+        content_hash = alert_content_hash(alert)
+        in_flight = self._in_flight.get(alert.fingerprint)
+        if in_flight is not None and in_flight[0] == content_hash:
+            return True
+
+        self._expire_completed()
+        completed = self._completed.get(alert.fingerprint)
+        return completed is not None and completed[0] == content_hash
+
+    def mark_in_flight(self, job: AnalysisJob) -> None:
+        """Record every alert of a queued job as in flight.
+
+        Calling this again after the job's alert group was refreshed updates
+        the recorded content hashes.
+
+        Args:
+            job: The queued analysis job.
+        """
+        for alert in job.alert_group.alerts:
+            self._in_flight[alert.fingerprint] = (
+                alert_content_hash(alert), job.job_id
+            )
+
+    def mark_finished(self, job: AnalysisJob, succeeded: bool) -> None:
+        """Release the alerts of a finished job.
+
+        Only successful analyses are remembered, so a re-sent notification
+        for a failed alert triggers a fresh analysis.
+
+        Args:
+            job: The job that finished.
+            succeeded: Whether the analysis completed successfully.
+        """
+        now = self._clock()
+        for alert in job.alert_group.alerts:
+            fingerprint = alert.fingerprint
+            in_flight = self._in_flight.get(fingerprint)
+            if in_flight is not None and in_flight[1] == job.job_id:
+                del self._in_flight[fingerprint]
+            if succeeded:
+                self._completed.pop(fingerprint, None)
+                self._completed[fingerprint] = (alert_content_hash(alert), now)
+
+    def release(self, job: AnalysisJob, fingerprints: Iterable[str]) -> None:
+        """Release alerts that were dropped from a job before it ran.
+
+        Unlike ``mark_finished``, nothing is remembered as analysed, so the
+        alerts are analysed again if they are re-sent.
+
+        Args:
+            job: The job the alerts were recorded for.
+            fingerprints: Fingerprints of the dropped alerts.
+        """
+        for fingerprint in fingerprints:
+            in_flight = self._in_flight.get(fingerprint)
+            if in_flight is not None and in_flight[1] == job.job_id:
+                del self._in_flight[fingerprint]
+
+    def forget(self, fingerprint: str) -> None:
+        """Drop everything known about an alert that resolved.
+
+        If the alert fires again later, that is a new incident and gets a
+        fresh analysis.
+
+        Args:
+            fingerprint: Fingerprint of the resolved alert.
+        """
+        self._in_flight.pop(fingerprint, None)
+        self._completed.pop(fingerprint, None)
+
+    def clear(self) -> None:
+        """Forget all tracked alerts."""
+        self._in_flight.clear()
+        self._completed.clear()
+
+    def _expire_completed(self) -> None:
+        """Drop completed entries older than the TTL."""
+        cutoff = self._clock() - self.completed_ttl_seconds
+        while self._completed:
+            fingerprint, (_, completed_at) = next(iter(self._completed.items()))
+            if completed_at > cutoff:
+                break
+            del self._completed[fingerprint]
@@ -0,0 +1,253 @@
+"""Durable SQLite journal for queued analysis jobs.
+
+The in-memory scheduler decides what runs next; this journal makes sure that
+queued and in-progress jobs survive a restart. Every accepted job is written
+before the webhook responds, leased when a worker starts it and deleted
+(acked) when it finishes. Jobs that are still in the journal at startup were
+never acked and are replayed into the scheduler.
+
+Writes are group-committed: operations issued while a transaction is being
+written are collected and committed together in the next transaction, so
+ingest throughput is bounded by batch size rather than by fsync latency.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import socket
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+from oncallm.jobs import AnalysisJob
+
+_logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    group_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_lease_idx ON jobs (lease_expires_at);
+"""
+
+# Pending write operation: (SQL statement, parameters, completion future).
+_Operation = Tuple[str, tuple, Optional[asyncio.Future]]
+
+
+def default_owner_id() -> str:
+    """Identify this process as a lease owner.
+
+    Returns:
+        Host name and process id, unique across replicas sharing a volume.
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class SQLiteJobJournal:
+    """Write-ahead journal of analysis jobs backed by SQLite in WAL mode.
+
+    All SQLite access happens on one dedicated thread; the public coroutine
+    methods must be called from the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 900.0,
+        owner_id: Optional[str] = None,
+        max_batch_size: int = 512
+    ) -> None:
+        """Initialize the journal.
+
+        Args:
+            path: SQLite database file, typically on a persistent volume.
+            lease_seconds: How long a started job is reserved for its owner.
+            owner_id: Lease owner name, defaults to host name and pid.
+            max_batch_size: Upper bound of operations per transaction.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner_id = owner_id or default_owner_id()
+        self.max_batch_size = max_batch_size
+        self.commit_count = 0
+        self._io_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="oncallm-journal"
+        )
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[_Operation] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        """Open the database and start the group-commit writer."""
+        await self._run_io(self._open)
+        self._wakeup = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        _logger.info("Job journal opened at %s", self.path)
+
+    async def close(self) -> None:
+        """Flush outstanding writes and close the database."""
+        if self._writer_task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._writer_task
+            self._writer_task = None
+        await self._run_io(self._close)
+        self._io_executor.shutdown(wait=True)
+
+    async def append(self, job: AnalysisJob) -> None:
+        """Durably record a queued job, replacing an older version of it.
+
+        Args:
+            job: The job accepted into the scheduler.
+
+        Raises:
+            sqlite3.Error: If the transaction holding the job failed.
+        """
+        await self._submit(
+            "INSERT INTO jobs (job_id, group_key, payload, enqueued_at) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET payload = excluded.payload",
+            (job.job_id, job.group_key, job.model_dump_json(), job.enqueued_at)
+        )
+
+    def lease(self, job_id: str) -> None:
+        """Reserve a job for this process while a worker runs it.
+
+        Args:
+            job_id: Identifier of the started job.
+        """
+        self._submit_nowait(
+            "UPDATE jobs SET lease_owner = ?, lease_expires_at = ? "
+            "WHERE job_id = ?",
+            (self.owner_id, time.time() + self.lease_seconds, job_id)
+        )
+
+    def ack(self, job_id: str) -> None:
+        """Remove a finished, shed or cancelled job from the journal.
+
+        Args:
+            job_id: Identifier of the job.
+        """
+        self._submit_nowait("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    async def replay(self) -> List[AnalysisJob]:
+        """Take over every job that was never acked.
+
+        The journal belongs to a single process, so jobs still leased by its
+        previous incarnation are released and replayed immediately.
+
+        Returns:
+            The unacked jobs in enqueue order.
+        """
+        rows = await self._run_io(self._release_unacked)
+        jobs = []
+        for job_id, payload in rows:
+            try:
+                jobs.append(AnalysisJob.model_validate_json(payload))
+            except ValueError as e:
+                _logger.error("Dropping unreadable journal entry %s: %s", job_id, e)
+                self.ack(job_id)
+        return jobs
+
+    def _submit_nowait(self, sql: str, params: tuple) -> None:
+        """Queue a write for the next transaction without waiting for it."""
+        self._pending.append((sql, params, None))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _submit(self, sql: str, params: tuple) -> None:
+        """Queue a write and wait until its transaction has committed."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, params, future))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        await future
+
+    async def _writer_loop(self) -> None:
+        """Commit pending operations in batches until the journal closes."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._pending:
+                await self._commit(self._take_batch())
+            if self._closing:
+                return
+
+    def _take_batch(self) -> List[_Operation]:
+        """Remove up to ``max_batch_size`` pending operations."""
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+        return batch
+
+    async def _commit(self, batch: List[_Operation]) -> None:
+        """Write a batch in one transaction and resolve its futures."""
+        try:
+            await self._run_io(self._write_batch, batch)
+        except Exception as e:
+            _logger.error("Job journal commit of %d writes failed: %s", len(batch), e)
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        for _, _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _run_io(self, func, *args):
+        """Run a blocking SQLite call on the journal thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, func, *args)
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL keeps commits durable across process crashes, which is the
+        # failure mode this journal protects against, without an fsync per
+        # transaction.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _write_batch(self, batch: List[_Operation]) -> None:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params, _ in batch:
+                self._conn.execute(sql, params)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self.commit_count += 1
+
+    def _release_unacked(self) -> List[Tuple[str, str]]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT job_id, payload FROM jobs ORDER BY enqueued_at"
+            ).fetchall()
+            # Replayed jobs go back into the scheduler and are leased again
+            # when a worker starts them.
+            self._conn.execute(
+                "UPDATE jobs SET lease_owner = NULL, lease_expires_at = NULL"
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return rows
@@ -0,0 +1,56 @@
+"""Analysis jobs queued for the LLM worker pool.
+
+An analysis job covers a whole Alertmanager group: the agent already receives
+the complete group as context, so the group is analysed once and the result is
+fanned out to the report of every member alert.
+"""
+
+import threading
+import time
+from typing import List, Optional
+import uuid
+
+from pydantic import BaseModel, Field, PrivateAttr
+
+from oncallm.alerts import AlertGroup
+
+
+class AnalysisJob(BaseModel):
+    """A single queued analysis covering every alert of one group."""
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    group_key: str
+    alert_group: AlertGroup
+    enqueued_at: float = Field(default_factory=time.time)
+    # Number of the analysis attempt this job is on, starting at 1.
+    attempt: int = 1
+    # Label shared by the groups merged into this job during an alert storm.
+    correlation_key: Optional[str] = None
+    # Set once the job's alerts resolved; not persisted.
+    _cancel_event: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    @property
+    def fingerprints(self) -> List[str]:
+        """Fingerprints of every alert whose report this job produces."""
+        return [alert.fingerprint for alert in self.alert_group.alerts]
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the job was cancelled; safe to read from worker threads."""
+        return self._cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Ask a running analysis of this job to stop at its next step."""
+        self._cancel_event.set()
+
+
+def build_analysis_job(alert_group: AlertGroup) -> AnalysisJob:
+    """Create the analysis job for an incoming alert group.
+
+    Args:
+        alert_group: Alert group received from Alertmanager.
+
+    Returns:
+        A new job keyed on the group's ``groupKey``.
+    """
+    return AnalysisJob(group_key=alert_group.groupKey, alert_group=alert_group)
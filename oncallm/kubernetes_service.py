@@ -7,14 +7,20 @@ from kubernetes.client.rest import ApiException
 logger = logging.getLogger(__name__)
 
 class KubernetesService:
-    def __init__(self):
+    def __init__(self, request_timeout: Optional[float] = None):
         """
         Initialize the Kubernetes client.
         
         Tries to load in-cluster config first (for running inside Kubernetes).
         If that fails, falls back to kubeconfig (for running outside Kubernetes).
         Optionally uses KUBECONFIG environment variable or defaults to ~/.kube/config.
+        
+        Args:
+            request_timeout: Timeout in seconds applied to every API request,
+                so a slow API server cannot stall an analysis. None waits
+                indefinitely.
         """
+        self.request_timeout = request_timeout
         try:
             # Try to load in-cluster config first.
             config.load_incluster_config()
@@ -44,7 +50,10 @@ class KubernetesService:
         """
         try:
             logger.debug(f"🔍 K8S API: Getting pod details for {namespace}/{pod_name}")
-            pod = self.core_v1.read_namespaced_pod(name=pod_name, namespace=namespace)
+            pod = self.core_v1.read_namespaced_pod(
+                name=pod_name, namespace=namespace,
+                _request_timeout=self.request_timeout
+            )
             
             result = {
                 "name": pod.metadata.name,
@@ -87,7 +96,10 @@ class KubernetesService:
             Dictionary with service details
         """
         try:
-            service = self.core_v1.read_namespaced_service(name=service_name, namespace=namespace)
+            service = self.core_v1.read_namespaced_service(
+                name=service_name, namespace=namespace,
+                _request_timeout=self.request_timeout
+            )
             return {
                 "name": service.metadata.name,
                 "namespace": service.metadata.namespace,
@@ -130,7 +142,8 @@ class KubernetesService:
                 name=pod_name,
                 namespace=namespace,
                 container=container,
-                tail_lines=tail_lines
+                tail_lines=tail_lines,
+                _request_timeout=self.request_timeout
             )
             
             log_preview = logs[:200] + "..." if len(logs) > 200 else logs
@@ -152,7 +165,10 @@ class KubernetesService:
             List of pod details
         """
         try:
-            service = self.core_v1.read_namespaced_service(name=service_name, namespace=namespace)
+            service = self.core_v1.read_namespaced_service(
+                name=service_name, namespace=namespace,
+                _request_timeout=self.request_timeout
+            )
             if not service.spec.selector:
                 return []
             
@@ -161,7 +177,8 @@ class KubernetesService:
             
             pods = self.core_v1.list_namespaced_pod(
                 namespace=namespace,
-                label_selector=label_selector
+                label_selector=label_selector,
+                _request_timeout=self.request_timeout
             )
             
             return [
@@ -193,7 +210,8 @@ class KubernetesService:
         try:
             deployment = self.apps_v1.read_namespaced_deployment(
                 name=deployment_name, 
-                namespace=namespace
+                namespace=namespace,
+                _request_timeout=self.request_timeout
             )
             
             return {
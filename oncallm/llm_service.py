@@ -1,7 +1,10 @@
 import os
 import json
 import logging
+import time
+from contextlib import closing
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 from langchain.agents import Tool
 from langchain_openai import ChatOpenAI
 from oncallm.kubernetes_service import KubernetesService
@@ -9,17 +12,105 @@ from oncallm.prompt import get_system_prompt
 from langchain.prompts import ChatPromptTemplate
 from langgraph.prebuilt import create_react_agent
 from oncallm.alerts import OncallK8sResponse, AlertGroup
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langfuse.langchain import CallbackHandler  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+# Longest excerpt of a single tool result kept in a partial report.
+_MAX_FINDING_CHARS = 2000
+
+# Longest excerpt of tool arguments and reasoning in a progress step.
+_MAX_PROGRESS_CHARS = 500
+
+
+def _optional_seconds(name: str, default: str) -> Optional[float]:
+    """Read a timeout in seconds from the environment; 0 disables it."""
+    value = float(os.getenv(name, default))
+    return value if value > 0 else None
+
+
+class AnalysisDeadlineExceeded(Exception):
+    """Raised when an analysis is stopped at its wall-clock deadline.
+
+    Attributes:
+        partial_analysis: Report assembled from the evidence the agent had
+            collected before it was stopped.
+        elapsed_seconds: How long the analysis ran.
+    """
+
+    def __init__(self, partial_analysis: OncallK8sResponse, elapsed_seconds: float):
+        super().__init__(
+            f"Analysis stopped after {elapsed_seconds:.0f}s deadline"
+        )
+        self.partial_analysis = partial_analysis
+        self.elapsed_seconds = elapsed_seconds
+
+
+class AnalysisCancelled(Exception):
+    """Raised when an analysis is stopped because it is no longer needed."""
+
+
+def _excerpt(text: str) -> str:
+    if len(text) > _MAX_PROGRESS_CHARS:
+        return text[:_MAX_PROGRESS_CHARS] + "..."
+    return text
+
+
+def describe_agent_steps(messages: List[Any], elapsed: float) -> List[Dict[str, Any]]:
+    """Describe new agent messages as progress steps for the report page.
+
+    Args:
+        messages: Messages the agent added since the previous step.
+        elapsed: Seconds since the analysis started.
+
+    Returns:
+        JSON-compatible steps: ``reasoning`` for the agent's text,
+        ``tool_call`` for every tool it invokes and ``tool_result`` for
+        every result it receives.
+    """
+    elapsed = round(elapsed, 1)
+    steps: List[Dict[str, Any]] = []
+    for message in messages:
+        if isinstance(message, AIMessage):
+            if message.content:
+                steps.append({
+                    "type": "reasoning",
+                    "text": _excerpt(str(message.content)),
+                    "elapsed_seconds": elapsed,
+                })
+            for tool_call in message.tool_calls:
+                steps.append({
+                    "type": "tool_call",
+                    "tool": tool_call["name"],
+                    "arguments": _excerpt(json.dumps(tool_call["args"], default=str)),
+                    "elapsed_seconds": elapsed,
+                })
+        elif isinstance(message, ToolMessage):
+            steps.append({
+                "type": "tool_result",
+                "tool": message.name,
+                "chars": len(str(message.content)),
+                "elapsed_seconds": elapsed,
+            })
+    return steps
+
+
 class OncallmAgent:
 
     def __init__(self):
         """Set up the agent with tools and prompts."""
+        # Wall-clock budget of one analysis. The graph is stopped between
+        # steps once it is spent, and every blocking call inside a step has
+        # its own timeout so a step cannot overrun the deadline by much.
+        self.analysis_timeout = _optional_seconds(
+            "ONCALLM_ANALYSIS_TIMEOUT_SECONDS", "300"
+        )
+        tool_timeout = _optional_seconds("ONCALLM_TOOL_TIMEOUT_SECONDS", "30")
+        llm_timeout = _optional_seconds("ONCALLM_LLM_TIMEOUT_SECONDS", "120")
+
         # Instantiate your KubernetesService (adjust kubeconfig_path if needed)
-        k8s_service = KubernetesService()  # or provide path if needed
+        k8s_service = KubernetesService(request_timeout=tool_timeout)
         # Langfuse ≥3.0: credentials are configured via environment variables
         # or the singleton Langfuse client. The CallbackHandler takes no args.
         self.langfuse_handler = CallbackHandler()
@@ -72,6 +163,7 @@ class OncallmAgent:
             temperature=0.4,
             openai_api_base=os.getenv("LLM_API_BASE"),
             max_tokens=1024,
+            timeout=llm_timeout,
         )
 
         system_prompt = get_system_prompt(tools)
@@ -93,9 +185,122 @@ class OncallmAgent:
         return json.dumps(debug_request.model_dump(), indent=2, default=default_serializer)
 
 
-    def do_analysis(self, alert_group):
+    def do_analysis(
+        self,
+        alert_group,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """Run the agent on an alert group within the analysis deadline.
+
+        The graph is streamed step by step rather than invoked, so it can be
+        stopped cleanly once the deadline has passed or the caller cancels,
+        and its progress can be reported while it runs.
+
+        Args:
+            alert_group: The alert group to analyse.
+            should_stop: Checked after every step; returning True cancels
+                the analysis.
+            on_step: Called with every progress step, see
+                :func:`describe_agent_steps`. Errors it raises are logged
+                and do not affect the analysis.
+
+        Returns:
+            The structured analysis produced by the agent.
+
+        Raises:
+            AnalysisDeadlineExceeded: If the deadline passed before the agent
+                produced its answer.
+            AnalysisCancelled: If ``should_stop`` requested a stop.
+        """
         res = self.debug_request_to_string(alert_group)
         print("Res: ", res)
-        response = self.agent.invoke({"messages": [HumanMessage(content=res)]}, config={"callbacks": [self.langfuse_handler]})
+        started_at = time.monotonic()
+        response: Dict[str, Any] = {}
+        stream = self.agent.stream(
+            {"messages": [HumanMessage(content=res)]},
+            config={"callbacks": [self.langfuse_handler]},
+            stream_mode="values"
+        )
+        reported = 0
+        # Closing the generator stops the graph before its next step.
+        with closing(stream):
+            for state in stream:
+                response = state
+                if on_step is not None:
+                    messages = state.get('messages', [])
+                    self._report_steps(
+                        messages[reported:], time.monotonic() - started_at, on_step
+                    )
+                    reported = len(messages)
+                if 'structured_response' in state:
+                    break
+                if should_stop is not None and should_stop():
+                    logger.info("Analysis cancelled, stopping agent")
+                    raise AnalysisCancelled()
+                elapsed = time.monotonic() - started_at
+                if self.analysis_timeout is not None and elapsed > self.analysis_timeout:
+                    logger.warning(
+                        "Analysis exceeded its %.0fs deadline, stopping agent",
+                        self.analysis_timeout
+                    )
+                    raise AnalysisDeadlineExceeded(
+                        self._build_partial_analysis(
+                            response.get('messages', []), elapsed
+                        ),
+                        elapsed
+                    )
         print("Response: ", response)
         return response['structured_response']
+
+    def _report_steps(
+        self,
+        messages: List[Any],
+        elapsed: float,
+        on_step: Callable[[Dict[str, Any]], None]
+    ) -> None:
+        """Pass the steps of new messages to the progress callback."""
+        try:
+            for step in describe_agent_steps(messages, elapsed):
+                on_step(step)
+        except Exception as e:
+            logger.warning("Reporting analysis progress failed: %s", e)
+
+    def _build_partial_analysis(self, messages: List[Any], elapsed: float) -> OncallK8sResponse:
+        """Summarise the evidence gathered by an analysis that was stopped.
+
+        Args:
+            messages: Conversation state of the agent when it was stopped.
+            elapsed: Seconds the analysis ran.
+
+        Returns:
+            A report listing the tool results and the agent's last reasoning.
+        """
+        findings = []
+        last_reasoning = ""
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                content = str(message.content)
+                if len(content) > _MAX_FINDING_CHARS:
+                    content = content[:_MAX_FINDING_CHARS] + "..."
+                findings.append(f"{message.name}: {content}")
+            elif isinstance(message, AIMessage) and message.content:
+                last_reasoning = str(message.content)
+
+        not_determined = "Not determined: the analysis did not finish in time."
+        return OncallK8sResponse(
+            root_cause=not_determined,
+            conclusion=(
+                f"The analysis was stopped after {elapsed:.0f}s, before the "
+                f"agent reached a conclusion. {len(findings)} tool calls had "
+                "completed."
+            ),
+            diagnosis=last_reasoning or not_determined,
+            summary_of_findings="\n\n".join(findings) or "No data was collected.",
+            recommended_actions="Review the collected data below and investigate manually.",
+            recommendations=(
+                "Increase ONCALLM_ANALYSIS_TIMEOUT_SECONDS if analyses of this "
+                "alert regularly run out of time."
+            ),
+            solution=not_determined
+        )
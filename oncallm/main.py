@@ -6,20 +6,61 @@ retrieve the analysis reports.
 """
 
 import asyncio
+import base64
+import binascii
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import (
+    Any, AsyncIterator, Dict, Iterator, List, MutableMapping, Optional, Set, Tuple, Union
+)
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 import uvicorn
 
-from oncallm.alerts import AlertGroup
-from oncallm.llm_service import OncallmAgent
+from oncallm.alert_records import AlertGroupRecord, compact_alert_group
+from oncallm.alerts import Alert, AlertGroup, OncallK8sResponse
+from oncallm.callbacks import CompletionNotifier, parse_callback_urls
+from oncallm.dedup import AlertDeduplicator, alert_content_hash
+from oncallm.durable_queue import SQLiteJobJournal
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.llm_service import (
+    AnalysisCancelled,
+    AnalysisDeadlineExceeded,
+    OncallmAgent,
+)
 from oncallm.health_routes import router as health_router
+from oncallm.compression import (
+    CompressionMiddleware, available_encodings, negotiate_encoding
+)
+from oncallm.page_cache import (
+    CachedPage, ReportPageCache, etag_matches, page_etag, variant_etag
+)
+from oncallm.process_workers import ProcessPoolAgent
+from oncallm.report_events import ReportEvents
+from oncallm.report_store import (
+    MemoryReportStore,
+    ReportQuery,
+    SQLiteReportStore,
+    expand_report,
+    iter_reports,
+    query_reports,
+)
+from oncallm.retry import RetryPolicy, RetryQueue, RetryableAnalysisError
+from oncallm.scheduler import (
+    AlertScheduler,
+    parse_priority_rules,
+    parse_tenant_settings,
+)
+from oncallm.shared_queue import SharedJobQueue
+from oncallm.storm import StormBatcher, parse_cluster_labels
 from oncallm.template_renderer import TemplateRenderer
 
 load_dotenv()
@@ -31,18 +72,88 @@ logging.basicConfig(
 )
 _logger = logging.getLogger(__name__)
 
-# In-memory store for processed analysis reports. Keyed by alert fingerprint.
-_analysis_reports: Dict[str, Any] = {}
+# Store for processed analysis reports. Keyed by alert fingerprint. In memory
+# and bounded, unless reports are persisted (ONCALLM_REPORT_STORE is "sqlite")
+# or replicas share a store (ONCALLM_QUEUE_BACKEND is "shared").
+_analysis_reports: MutableMapping[str, Any] = MemoryReportStore(
+    max_entries=int(os.getenv("ONCALLM_REPORT_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("ONCALLM_REPORT_MAX_BYTES", "67108864")),
+    ttl_seconds=float(os.getenv("ONCALLM_REPORT_TTL_SECONDS", "604800")),
+    processing_ttl_seconds=float(
+        os.getenv("ONCALLM_REPORT_PROCESSING_TTL_SECONDS", "3600")
+    )
+)
+
+# Responses smaller than this are sent uncompressed.
+_COMPRESSION_MIN_BYTES = int(os.getenv("ONCALLM_COMPRESSION_MIN_BYTES", "1024"))
+
+# Wakes up the event streams of pending report pages when reports change.
+_report_events = ReportEvents()
+
+# Rendered pages of finished reports, served without rendering or
+# compressing them again.
+_report_pages = ReportPageCache(
+    max_bytes=int(os.getenv("ONCALLM_REPORT_PAGE_CACHE_BYTES", "33554432")),
+    encodings=available_encodings(),
+    minimum_size=_COMPRESSION_MIN_BYTES
+)
 
 # Queue and executor will be initialised at application startup.
-_alert_queue: Optional[asyncio.Queue] = None
+_alert_queue: Optional[AlertScheduler] = None
 _executor: Optional[ThreadPoolExecutor] = None
 
+# Caps the number of analyses running concurrently in the executor.
+_analysis_semaphore: Optional[asyncio.Semaphore] = None
+
+# Optional on-disk journal that lets queued jobs survive restarts. Only set
+# when ONCALLM_QUEUE_BACKEND is "sqlite" or "shared".
+_job_journal: Optional[SQLiteJobJournal] = None
+
+# Queue shared by all replicas, which claim jobs from it. Also set as the
+# journal when ONCALLM_QUEUE_BACKEND is "shared".
+_shared_queue: Optional[SharedJobQueue] = None
+
+# Jobs waiting in the queue, keyed by Alertmanager groupKey. A notification for
+# a group that is already queued updates that job instead of adding another.
+_pending_groups: Dict[str, AnalysisJob] = {}
+
+# Jobs taken off the queue that have not finished yet, either running or
+# waiting for a retry. Keyed by job_id.
+_started_jobs: Dict[str, AnalysisJob] = {}
+
+# Merged storm jobs waiting in the queue, keyed by the fingerprints they
+# cover. Their groupKey is synthetic, so resolved notifications of a member
+# group find them here rather than in _pending_groups.
+_storm_jobs: Dict[str, AnalysisJob] = {}
+
+# Suppresses re-sent notifications for alerts that are already queued, running
+# or were analysed within ONCALLM_DEDUP_TTL_SECONDS.
+_deduplicator = AlertDeduplicator(
+    completed_ttl_seconds=float(os.getenv("ONCALLM_DEDUP_TTL_SECONDS", "21600"))
+)
+
+# Transient analysis failures are retried with backoff. Jobs waiting for their
+# next attempt are held in _retry_queue, outside the scheduler.
+_retry_policy = RetryPolicy(
+    max_attempts=int(os.getenv("ONCALLM_RETRY_MAX_ATTEMPTS", "3")),
+    base_delay_seconds=float(os.getenv("ONCALLM_RETRY_BASE_DELAY_SECONDS", "30")),
+    max_delay_seconds=float(os.getenv("ONCALLM_RETRY_MAX_DELAY_SECONDS", "600"))
+)
+_retry_queue: Optional[RetryQueue] = None
+
+# Collects new jobs for ONCALLM_STORM_WINDOW_SECONDS and merges correlated
+# ones into a single analysis. None when the window is disabled.
+_storm_batcher: Optional[StormBatcher] = None
+
+# Posts finished analyses to ONCALLM_CALLBACK_URLS. None when no URL is set.
+_completion_notifier: Optional[CompletionNotifier] = None
+
 # Template renderer for HTML pages.
 _template_renderer: Optional[TemplateRenderer] = None
 
-# Global agent instance to be initialized once at startup.
-_agent: Optional[OncallmAgent] = None
+# Global agent instance to be initialized once at startup. In process mode
+# this is a proxy that runs analyses in worker processes.
+_agent: Optional[Union[OncallmAgent, ProcessPoolAgent]] = None
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI):
@@ -54,24 +165,180 @@ async def _lifespan(app: FastAPI):
     Yields:
         None: Control back to FastAPI during application runtime.
     """
-    global _alert_queue, _executor, _template_renderer, _agent
-    _alert_queue = asyncio.Queue()
-    _executor = ThreadPoolExecutor(max_workers=10)
+    global _alert_queue, _executor, _analysis_semaphore, _job_journal
+    global _retry_queue, _storm_batcher, _template_renderer, _agent
+    global _shared_queue, _analysis_reports, _completion_notifier
+    worker_concurrency = _get_worker_concurrency()
+    queue_backend = os.getenv("ONCALLM_QUEUE_BACKEND", "memory")
+    lease_seconds = float(os.getenv("ONCALLM_QUEUE_LEASE_SECONDS", "900"))
+    _alert_queue = AlertScheduler(
+        rules=parse_priority_rules(os.getenv("ONCALLM_PRIORITY_RULES", "")),
+        aging_seconds=float(os.getenv("ONCALLM_PRIORITY_AGING_SECONDS", "300")),
+        maxsize=int(os.getenv("ONCALLM_QUEUE_MAX_SIZE", "1000")),
+        shed_policy=os.getenv("ONCALLM_QUEUE_SHED_POLICY", "reject"),
+        on_shed=_shed_job,
+        tenant_key=os.getenv("ONCALLM_TENANT_KEY", ""),
+        tenant_weights=parse_tenant_settings(
+            os.getenv("ONCALLM_TENANT_WEIGHTS", "")
+        ),
+        tenant_limits=parse_tenant_settings(
+            os.getenv("ONCALLM_TENANT_CONCURRENCY_LIMITS", "")
+        )
+    )
+    _executor = ThreadPoolExecutor(
+        max_workers=worker_concurrency, thread_name_prefix="oncallm-analysis"
+    )
+    _analysis_semaphore = asyncio.Semaphore(worker_concurrency)
+    _retry_queue = RetryQueue(submit=_resubmit_job)
+    storm_window_seconds = float(os.getenv("ONCALLM_STORM_WINDOW_SECONDS", "0"))
+    if storm_window_seconds > 0 and queue_backend == "shared":
+        _logger.warning("Storm batching is not supported with a shared queue")
+    elif storm_window_seconds > 0:
+        _storm_batcher = StormBatcher(
+            storm_window_seconds,
+            submit=_submit_storm_cluster,
+            cluster_labels=parse_cluster_labels(
+                os.getenv("ONCALLM_STORM_CLUSTER_LABELS", "")
+            )
+        )
     _template_renderer = TemplateRenderer()
+    callback_urls = parse_callback_urls(os.getenv("ONCALLM_CALLBACK_URLS", ""))
+    if callback_urls:
+        _completion_notifier = CompletionNotifier(
+            callback_urls,
+            batch_size=int(os.getenv("ONCALLM_CALLBACK_BATCH_SIZE", "1")),
+            batch_window_seconds=float(
+                os.getenv("ONCALLM_CALLBACK_BATCH_WINDOW_SECONDS", "0")
+            ),
+            max_pending=int(os.getenv("ONCALLM_CALLBACK_MAX_PENDING", "10000")),
+            max_connections=int(
+                os.getenv("ONCALLM_CALLBACK_MAX_CONNECTIONS", "10")
+            ),
+            timeout_seconds=float(
+                os.getenv("ONCALLM_CALLBACK_TIMEOUT_SECONDS", "10")
+            ),
+            retry_policy=RetryPolicy(
+                max_attempts=int(
+                    os.getenv("ONCALLM_CALLBACK_MAX_ATTEMPTS", "5")
+                ),
+                base_delay_seconds=1.0,
+                max_delay_seconds=60.0
+            ),
+            dead_letter_path=os.getenv("ONCALLM_CALLBACK_DEAD_LETTER_PATH", "")
+        )
+        _completion_notifier.start()
+        _logger.info(
+            "Posting finished analyses to %d callback URLs", len(callback_urls)
+        )
     
     # Initialize the agent once at startup to avoid expensive initialization
     # for every alert processing.
-    _logger.info("Initializing OncallmAgent...")
-    _agent = OncallmAgent()
-    _logger.info("OncallmAgent initialized successfully")
+    if os.getenv("ONCALLM_WORKER_MODE", "thread") == "process":
+        # Executor threads only wait for the worker processes.
+        _agent = ProcessPoolAgent(
+            int(os.getenv("ONCALLM_WORKER_PROCESSES", str(worker_concurrency)))
+        )
+    else:
+        _logger.info("Initializing OncallmAgent...")
+        _agent = OncallmAgent()
+        _logger.info("OncallmAgent initialized successfully")
+    
+    report_read_connections = int(
+        os.getenv("ONCALLM_REPORT_STORE_READ_CONNECTIONS", "4")
+    )
+    if (
+        queue_backend != "shared"
+        and os.getenv("ONCALLM_REPORT_STORE", "memory") == "sqlite"
+    ):
+        _analysis_reports = SQLiteReportStore(
+            os.getenv(
+                "ONCALLM_REPORT_STORE_PATH", "/var/lib/oncallm/reports.db"
+            ),
+            read_connections=report_read_connections
+        )
+        _logger.info("Persisting reports to %s", _analysis_reports.path)
     
+    claim_task = None
+    if queue_backend == "shared":
+        shared_store_path = os.getenv(
+            "ONCALLM_SHARED_STORE_PATH", "/var/lib/oncallm/shared.db"
+        )
+        _shared_queue = SharedJobQueue(
+            shared_store_path,
+            lease_seconds=lease_seconds,
+            priority_key=_alert_queue.priority_key
+        )
+        await _shared_queue.start()
+        _job_journal = _shared_queue
+        _analysis_reports = SQLiteReportStore(
+            shared_store_path,
+            read_connections=report_read_connections,
+            shared=True
+        )
+        _logger.info(
+            "Sharing queue and reports with other replicas as %s",
+            _shared_queue.owner_id
+        )
+        claim_task = asyncio.create_task(
+            _claim_shared_jobs(
+                _shared_queue,
+                _alert_queue,
+                worker_concurrency,
+                float(os.getenv("ONCALLM_SHARED_POLL_SECONDS", "1"))
+            )
+        )
+    elif queue_backend == "sqlite":
+        _job_journal = SQLiteJobJournal(
+            os.getenv("ONCALLM_QUEUE_PATH", "/var/lib/oncallm/queue.db"),
+            lease_seconds=lease_seconds
+        )
+        await _job_journal.start()
+        replayed_jobs = await _job_journal.replay()
+        for job in replayed_jobs:
+            _restore_job(job)
+        _logger.info("Replayed %d queued jobs from journal", len(replayed_jobs))
+    
+    _logger.info(
+        "Starting alert worker pool with %d concurrent analyses",
+        worker_concurrency
+    )
     worker_task = asyncio.create_task(
-        _process_alerts_worker(_alert_queue, _executor)
+        _process_alerts_worker(_alert_queue, _executor, _analysis_semaphore)
     )
+    reap_task = None
+    if isinstance(_analysis_reports, MemoryReportStore):
+        reap_task = asyncio.create_task(
+            _reap_reports(
+                _analysis_reports,
+                float(os.getenv("ONCALLM_REPORT_REAP_INTERVAL_SECONDS", "60"))
+            )
+        )
     yield  # Application is up and running.
-    worker_task.cancel()
+    background_tasks = [
+        task for task in (reap_task, claim_task, worker_task) if task is not None
+    ]
+    for task in background_tasks:
+        task.cancel()
+    # The worker waits for its cancelled analyses, so none of them can ack
+    # its job once the journal is closed below: running jobs stay in the
+    # journal and are replayed after the restart.
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    _retry_queue.close()
+    if _storm_batcher is not None:
+        _storm_batcher.close()
     if _executor:
         _executor.shutdown(wait=False, cancel_futures=True)
+    if _completion_notifier is not None:
+        await _completion_notifier.close()
+    if isinstance(_agent, ProcessPoolAgent):
+        _agent.close()
+    if _shared_queue is not None:
+        # Let other replicas take over the unfinished jobs right away.
+        await _shared_queue.release_owned()
+    if _job_journal is not None:
+        await _job_journal.close()
+    if isinstance(_analysis_reports, SQLiteReportStore):
+        _analysis_reports.close()
 
 app = FastAPI(
     title="OnCallM - Kubernetes Alert Analysis",
@@ -81,6 +348,7 @@ app = FastAPI(
 )
 
 app.include_router(health_router)
+app.add_middleware(CompressionMiddleware, minimum_size=_COMPRESSION_MIN_BYTES)
 
 @app.get("/")
 async def root() -> Dict[str, Any]:
@@ -97,74 +365,705 @@ async def root() -> Dict[str, Any]:
             "GET /health - Health check",
             "POST /webhook - Submit alerts for analysis", 
             "GET /reports - List all reports",
-            "GET /report/{fingerprint} - View HTML report page"
+            "GET /reports/export - Export full reports as NDJSON",
+            "GET /report/{fingerprint} - View HTML report page",
+            "GET /report/{fingerprint}/events - Stream report status changes",
+            "GET /metrics - Queue metrics"
         ]
     }
 
+@app.get("/metrics")
+async def metrics() -> Dict[str, Any]:
+    """Expose internal queue metrics.
+    
+    Returns:
+        Dictionary with queue depth and wait times per priority class and
+        per tenant.
+    """
+    if _alert_queue is None:
+        raise HTTPException(status_code=503, detail="Service not initialised")
+    result: Dict[str, Any] = {"queue": _alert_queue.stats()}
+    if isinstance(_analysis_reports, (MemoryReportStore, SQLiteReportStore)):
+        result["reports"] = _analysis_reports.stats()
+    result["report_pages"] = _report_pages.stats()
+    result["report_streams"] = _report_events.subscriber_count()
+    if _retry_queue is not None:
+        result["retries"] = _retry_queue.stats()
+    if _storm_batcher is not None:
+        result["storm"] = _storm_batcher.stats()
+    if _completion_notifier is not None:
+        result["callbacks"] = _completion_notifier.stats()
+    if _shared_queue is not None:
+        result["shared_queue"] = await _shared_queue.stats()
+    return result
+
+def _get_worker_concurrency() -> int:
+    """Read the configured number of concurrent analyses.
+
+    Returns:
+        The value of ONCALLM_WORKER_CONCURRENCY, clamped to at least 1.
+    """
+    return max(1, int(os.getenv("ONCALLM_WORKER_CONCURRENCY", "4")))
+
 async def _process_alerts_worker(
-    queue: asyncio.Queue, 
-    executor: ThreadPoolExecutor
+    queue: AlertScheduler, 
+    executor: ThreadPoolExecutor,
+    semaphore: asyncio.Semaphore
 ) -> None:
-    """Background worker to process queued alerts.
+    """Background dispatcher that fans queued alerts out to the worker pool.
+    
+    A slot on the semaphore is acquired before an item is taken off the
+    queue, so at most ``semaphore`` analyses are in flight and the remaining
+    alerts stay queued until capacity frees up.
     
     Args:
         queue: The asyncio queue containing alert processing tasks.
         executor: ThreadPoolExecutor for running blocking operations.
+        semaphore: Semaphore bounding the number of in-flight analyses.
     """
+    in_flight: Set[asyncio.Task] = set()
     while True:
         try:
-            alert_fingerprint, alert_group = await queue.get()
-            _logger.info(
-                "Processing alert with fingerprint: %s", alert_fingerprint
-            )
+            await semaphore.acquire()
+            try:
+                job = await queue.get()
+            except BaseException:
+                semaphore.release()
+                raise
             
-            # Process the alert in the thread pool to avoid blocking the event
-            # loop.
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                executor, _process_alert, alert_fingerprint, alert_group
-            )
+            # Once started, later notifications for the group need a new job.
+            if _pending_groups.get(job.group_key) is job:
+                del _pending_groups[job.group_key]
+            _forget_storm_job(job)
+            _started_jobs[job.job_id] = job
+            if _job_journal is not None:
+                _job_journal.lease(job.job_id)
             
-            queue.task_done()
+            task = asyncio.create_task(
+                _run_queued_alert(queue, executor, semaphore, job)
+            )
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        except asyncio.CancelledError:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            break
+        except Exception as e:
+            _logger.error("Error dispatching alert: %s", e)
+
+async def _claim_shared_jobs(
+    shared_queue: SharedJobQueue,
+    queue: AlertScheduler,
+    capacity: int,
+    poll_interval_seconds: float
+) -> None:
+    """Feed the local scheduler with jobs claimed from the shared queue.
+    
+    Only as many jobs are claimed as this replica has free workers, so the
+    other replicas can claim the rest. The leases of claimed jobs are renewed
+    while they wait in the local scheduler, run or wait for a retry.
+    
+    Args:
+        shared_queue: The queue shared by all replicas.
+        queue: The local scheduler feeding the worker pool.
+        capacity: Number of analyses this replica runs concurrently.
+        poll_interval_seconds: Pause between claims when no job is waiting
+            or no worker is free.
+    """
+    renew_interval = shared_queue.lease_seconds / 3
+    last_renewal = time.monotonic()
+    while True:
+        try:
+            free = capacity - len(_started_jobs) - queue.qsize()
+            claimed = await shared_queue.claim(free)
+            for job in claimed:
+                _deduplicator.mark_in_flight(job)
+                try:
+                    queue.put_nowait(job)
+                except asyncio.QueueFull:
+                    _shed_job(job)
+            if time.monotonic() - last_renewal >= renew_interval:
+                # Jobs held back in the scheduler, e.g. by tenant limits,
+                # must not be claimed by another replica either.
+                shared_queue.renew(
+                    {*_started_jobs, *(job.job_id for job in queue.queued_jobs())}
+                )
+                last_renewal = time.monotonic()
+            if not claimed or len(claimed) < free:
+                await asyncio.sleep(poll_interval_seconds)
         except asyncio.CancelledError:
             break
         except Exception as e:
-            _logger.error("Error processing alert: %s", e)
+            _logger.error("Error claiming jobs from the shared queue: %s", e)
+            await asyncio.sleep(poll_interval_seconds)
+
+async def _reap_reports(
+    store: MemoryReportStore, interval_seconds: float
+) -> None:
+    """Periodically drop expired reports and reports of lost jobs.
+    
+    Args:
+        store: The in-memory report store.
+        interval_seconds: Pause between two passes.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            store.reap(active=_active_fingerprints())
+        except Exception as e:
+            _logger.error("Error reaping reports: %s", e)
+
+def _active_fingerprints() -> Set[str]:
+    """Fingerprints of alerts whose jobs are queued, buffered or started.
+    
+    Returns:
+        The fingerprints whose "processing" reports must be kept.
+    """
+    jobs = [*_pending_groups.values(), *_started_jobs.values()]
+    if _alert_queue is not None:
+        # Merged storm jobs are only tracked by the scheduler.
+        jobs.extend(_alert_queue.queued_jobs())
+    active = set()
+    for job in jobs:
+        active.update(job.fingerprints)
+    return active
+
+async def _run_queued_alert(
+    queue: AlertScheduler,
+    executor: ThreadPoolExecutor,
+    semaphore: asyncio.Semaphore,
+    job: AnalysisJob
+) -> None:
+    """Run a single queued job in the executor and release its slot.
+    
+    Args:
+        queue: The queue the job was taken from.
+        executor: ThreadPoolExecutor for running blocking operations.
+        semaphore: Semaphore slot held for this analysis.
+        job: The analysis job covering one alert group.
+    """
+    succeeded = False
+    retrying = False
+    cancelled = False
+    try:
+        _logger.info(
+            "Processing alert group %s (%d alerts), attempt %d",
+            job.group_key, len(job.fingerprints), job.attempt
+        )
+        
+        # Process the alert in the thread pool to avoid blocking the event
+        # loop.
+        loop = asyncio.get_running_loop()
+        succeeded = await loop.run_in_executor(executor, _process_alert, job)
+    except RetryableAnalysisError as e:
+        _schedule_retry(job, e)
+        retrying = True
+        if _job_journal is not None:
+            # Persist the attempt count so a restart keeps the budget.
+            await _job_journal.append(job)
+    except asyncio.CancelledError:
+        # Shutting down: the job stays in the journal to be replayed.
+        cancelled = True
+        raise
+    except Exception as e:
+        _logger.error("Error processing alert: %s", e)
+    finally:
+        if not retrying and not cancelled:
+            _finish_job(job, succeeded)
+        queue.task_done(job)
+        semaphore.release()
 
-def _process_alert(alert_fingerprint: str, alert_group: AlertGroup) -> None:
-    """Process a single alert and store the analysis.
+def _process_alert(job: AnalysisJob) -> bool:
+    """Analyse an alert group once and store the result for every member.
     
     Args:
-        alert_fingerprint: Unique identifier for the alert.
-        alert_group: The alert group data from Alertmanager.
+        job: The analysis job covering one alert group.
+        
+    Returns:
+        True if the analysis completed, False if it failed or was stopped at
+        its deadline with a partial report.
+        
+    Raises:
+        RetryableAnalysisError: If the analysis failed transiently and the
+            job has attempts left; no report is stored in that case.
     """
+    alert_group = job.alert_group
     try:
         # Use the global agent instance initialized at startup.
         if _agent is None:
             raise RuntimeError("Agent not initialized")
         
-        analysis = _agent.do_analysis(alert_group)
+        analysis = _agent.do_analysis(
+            alert_group,
+            should_stop=lambda: job.cancelled,
+            on_step=lambda step: _report_events.publish_progress(
+                job.fingerprints, step
+            )
+        )
         
-        # Store the completed analysis with enhanced report data.
-        _analysis_reports[alert_fingerprint] = {
-            "status": "completed",
-            "analysis": analysis.model_dump(),
-            "alert_group": alert_group.model_dump(),
-            "created_at": alert_group.alerts[0].startsAt.isoformat(),
-            "fingerprint": alert_fingerprint
-        }
+        # Fan the completed analysis out to every alert of the group.
+        _store_group_reports(
+            job, status="completed", analysis=analysis.model_dump()
+        )
+        _notify_completion(job, "completed", analysis=analysis.model_dump())
+        
+        _logger.info(
+            "Completed analysis for alert group %s (%d alerts)",
+            job.group_key, len(alert_group.alerts)
+        )
+        return True
         
-        _logger.info("Completed analysis for alert: %s", alert_fingerprint)
+    except AnalysisCancelled:
+        # The resolved reports were already written by the webhook.
+        _logger.info(
+            "Analysis of alert group %s cancelled, its alerts resolved",
+            job.group_key
+        )
+        return False
+        
+    except AnalysisDeadlineExceeded as e:
+        # Keep what the agent found; retrying would hit the same deadline.
+        _logger.warning(
+            "Analysis of alert group %s stopped at its deadline after %.0fs",
+            job.group_key, e.elapsed_seconds
+        )
+        _store_group_reports(
+            job,
+            status="partial",
+            analysis=e.partial_analysis.model_dump(),
+            error=str(e)
+        )
+        _notify_completion(
+            job, "partial",
+            analysis=e.partial_analysis.model_dump(), error=str(e)
+        )
+        return False
         
     except Exception as e:
-        _logger.error("Error analyzing alert %s: %s", alert_fingerprint, e)
-        _analysis_reports[alert_fingerprint] = {
-            "status": "failed",
-            "error": str(e),
-            "alert_group": alert_group.model_dump(),
-            "created_at": alert_group.alerts[0].startsAt.isoformat(),
-            "fingerprint": alert_fingerprint
+        if job.cancelled:
+            return False
+        if _retry_queue is not None and _retry_policy.should_retry(job, e):
+            raise RetryableAnalysisError(str(e)) from e
+        _logger.error("Error analyzing alert group %s: %s", job.group_key, e)
+        _store_group_reports(
+            job, status="failed", error=str(e), attempts=job.attempt
+        )
+        _notify_completion(job, "failed", error=str(e))
+        return False
+    
+    finally:
+        _report_events.clear_progress(job.fingerprints)
+
+def _notify_completion(
+    job: AnalysisJob,
+    status: str,
+    analysis: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None
+) -> None:
+    """Hand a finished analysis to the callback notifier, if configured.
+    
+    Returns at once; the callbacks are sent from the event loop.
+    
+    Args:
+        job: The finished job.
+        status: Status of the stored reports.
+        analysis: The analysis stored in the reports, if any.
+        error: The error stored in the reports, if any.
+    """
+    if _completion_notifier is None:
+        return
+    base_url = os.getenv("ONCALLM_BASE_URL", "http://localhost:8001")
+    _completion_notifier.notify({
+        "type": "analysis.finished",
+        "status": status,
+        "group_key": job.group_key,
+        "attempts": job.attempt,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "reports": [
+            {
+                "fingerprint": fingerprint,
+                "report_url": f"{base_url}/report/{fingerprint}",
+                "api_url": f"{base_url}/api/reports/{fingerprint}"
+            }
+            for fingerprint in job.fingerprints
+        ],
+        "analysis": analysis,
+        "error": error
+    })
+
+def _schedule_retry(job: AnalysisJob, error: Exception) -> None:
+    """Move a transiently failed job to the retry delay queue.
+    
+    Args:
+        job: The job whose attempt failed.
+        error: The error raised by the attempt.
+    """
+    delay = _retry_policy.next_delay(job.attempt)
+    _logger.warning(
+        "Analysis of alert group %s failed on attempt %d (%s), retrying in %.0fs",
+        job.group_key, job.attempt, error, delay
+    )
+    job.attempt += 1
+    _store_group_reports(
+        job, status="processing", attempt=job.attempt, last_error=str(error)
+    )
+    _retry_queue.schedule(job, delay)
+
+def _resubmit_job(job: AnalysisJob) -> None:
+    """Put a job whose retry backoff elapsed back into the scheduler.
+    
+    Args:
+        job: The job to attempt again.
+    """
+    _started_jobs.pop(job.job_id, None)
+    if job.group_key in _pending_groups:
+        # A newer notification for the group is queued and supersedes it.
+        _finish_job(job, succeeded=False)
+        return
+    try:
+        _alert_queue.put_nowait(job)
+    except asyncio.QueueFull:
+        _shed_job(job)
+        return
+    _pending_groups[job.group_key] = job
+    if job.correlation_key is not None:
+        _track_storm_job(job)
+
+def _finish_job(job: AnalysisJob, succeeded: bool) -> None:
+    """Release the bookkeeping held for a job that will not run again.
+    
+    Args:
+        job: The finished job.
+        succeeded: Whether its analysis completed.
+    """
+    _started_jobs.pop(job.job_id, None)
+    _forget_storm_job(job)
+    _deduplicator.mark_finished(job, succeeded)
+    if _job_journal is not None:
+        _job_journal.ack(job.job_id)
+
+def _store_group_reports(job: AnalysisJob, **fields: Any) -> None:
+    """Store a report for every alert of a job's group.
+    
+    Alerts that resolved while the job ran keep their "resolved" report.
+    
+    Args:
+        job: The job whose alerts receive the report.
+        **fields: Report fields such as ``status``, ``analysis`` or ``error``.
+    """
+    # One shared record for all the reports of the group.
+    alert_group = compact_alert_group(job.alert_group)
+    fingerprints = job.fingerprints
+    for alert_index, alert in enumerate(job.alert_group.alerts):
+        current = _analysis_reports.get(alert.fingerprint)
+        if current is not None and current.get("status") == "resolved":
+            continue
+        report = {
+            **fields,
+            "alert_group": alert_group,
+            "alert_index": alert_index,
+            "group_key": job.group_key,
+            "created_at": alert.startsAt.isoformat(),
+            "fingerprint": alert.fingerprint,
+            "updated_at": time.time()
+        }
+        if _shared_queue is not None:
+            # Lets other replicas recognise re-sent notifications.
+            report["content_hash"] = alert_content_hash(alert)
+        if job.correlation_key is not None:
+            # Link the reports of alerts analysed together during a storm.
+            report["correlation_key"] = job.correlation_key
+            report["related_fingerprints"] = [
+                fingerprint for fingerprint in fingerprints
+                if fingerprint != alert.fingerprint
+            ]
+        _prerender_report_page(alert.fingerprint, report)
+        _analysis_reports[alert.fingerprint] = report
+        _report_events.publish(alert.fingerprint)
+
+async def _submit_storm_cluster(
+    job: AnalysisJob, members: List[AnalysisJob]
+) -> None:
+    """Schedule the job for a cluster of buffered jobs.
+    
+    Args:
+        job: The job to schedule; either the only member or the merged job.
+        members: The buffered jobs the cluster consists of.
+    """
+    if job not in members:
+        # The merged job replaces its members; later notifications for a
+        # member group start a new job.
+        for member in members:
+            if _pending_groups.get(member.group_key) is member:
+                del _pending_groups[member.group_key]
+        _deduplicator.mark_in_flight(job)
+        if _job_journal is not None:
+            await _job_journal.append(job)
+            for member in members:
+                _job_journal.ack(member.job_id)
+    try:
+        _alert_queue.put_nowait(job)
+    except asyncio.QueueFull:
+        _shed_job(job)
+        return
+    if job not in members:
+        _track_storm_job(job)
+
+def _track_storm_job(job: AnalysisJob) -> None:
+    """Register a queued merged job under the fingerprints it covers.
+    
+    Args:
+        job: A merged storm job waiting in the queue.
+    """
+    for fingerprint in job.fingerprints:
+        _storm_jobs[fingerprint] = job
+
+def _forget_storm_job(job: AnalysisJob) -> None:
+    """Drop a merged job from ``_storm_jobs`` once it left the queue.
+    
+    Args:
+        job: Any job; jobs that were not merged are ignored.
+    """
+    if job.correlation_key is None:
+        return
+    for fingerprint in job.fingerprints:
+        if _storm_jobs.get(fingerprint) is job:
+            del _storm_jobs[fingerprint]
+
+def _withdraw_pending_job(job: AnalysisJob) -> None:
+    """Remove a job that has not started from the batcher or the queue.
+    
+    Args:
+        job: A job registered in ``_pending_groups``.
+    """
+    if _storm_batcher is None or _storm_batcher.remove(job.job_id) is None:
+        _alert_queue.remove(job.job_id)
+
+def _queue_full_error(group_key: str) -> HTTPException:
+    """Build the 503 response sent when the alert queue is full.
+    
+    Args:
+        group_key: The alert group that was refused.
+        
+    Returns:
+        The exception to raise; Alertmanager retries 5xx responses.
+    """
+    _logger.warning("Alert queue full, rejecting alert group %s", group_key)
+    return HTTPException(
+        status_code=503,
+        detail="Alert queue is full",
+        headers={
+            "Retry-After": os.getenv("ONCALLM_QUEUE_RETRY_AFTER_SECONDS", "30")
         }
+    )
+
+def _shed_job(job: AnalysisJob) -> None:
+    """Record a queued job that was evicted to keep the queue bounded.
+    
+    Args:
+        job: The job removed from the queue by the shed policy.
+    """
+    if _pending_groups.get(job.group_key) is job:
+        del _pending_groups[job.group_key]
+    _finish_job(job, succeeded=False)
+    _store_group_reports(
+        job,
+        status="shed",
+        error="Analysis skipped because the alert queue was overloaded"
+    )
+
+def _restore_job(job: AnalysisJob) -> None:
+    """Put a job replayed from the journal back into the scheduler.
+    
+    Args:
+        job: A job that was queued or running when the process stopped.
+    """
+    try:
+        _alert_queue.put_nowait(job)
+    except asyncio.QueueFull:
+        _shed_job(job)
+        return
+    _pending_groups[job.group_key] = job
+    if job.correlation_key is not None:
+        _track_storm_job(job)
+    _deduplicator.mark_in_flight(job)
+    for fingerprint in job.fingerprints:
+        _analysis_reports[fingerprint] = {"status": "processing"}
+
+async def _resolve_alerts(
+    alert_group: AlertGroup, resolved_alerts: List[Alert]
+) -> None:
+    """Stop the work queued for resolved alerts and summarise them.
+    
+    Resolved alerts are removed from the group's queued job, which is
+    withdrawn once no firing alert is left. Started jobs whose alerts all
+    resolved are withdrawn from the retry queue or stopped at their next
+    agent step.
+    
+    Args:
+        alert_group: The notification carrying the resolved alerts.
+        resolved_alerts: Alerts of the group whose status is "resolved".
+    """
+    resolved = {alert.fingerprint for alert in resolved_alerts}
+    record = compact_alert_group(alert_group)
+    for alert_index, alert in enumerate(alert_group.alerts):
+        if alert.fingerprint in resolved:
+            _deduplicator.forget(alert.fingerprint)
+            _store_resolved_report(record, alert_index, alert)
+
+    if _shared_queue is not None:
+        # The group's job may be waiting in the shared queue instead.
+        if await _shared_queue.withdraw_resolved(alert_group.groupKey, resolved):
+            _logger.info(
+                "Alert group %s resolved, cancelling shared queued analysis",
+                alert_group.groupKey
+            )
+
+    pending_job = _pending_groups.get(alert_group.groupKey)
+    if pending_job is not None and resolved & set(pending_job.fingerprints):
+        remaining = [
+            alert for alert in pending_job.alert_group.alerts
+            if alert.fingerprint not in resolved
+        ]
+        if remaining:
+            pending_job.alert_group = pending_job.alert_group.model_copy(
+                update={"alerts": remaining}
+            )
+            if _job_journal is not None:
+                await _job_journal.append(pending_job)
+        else:
+            _logger.info(
+                "Alert group %s resolved, cancelling queued analysis",
+                alert_group.groupKey
+            )
+            _withdraw_pending_job(pending_job)
+            del _pending_groups[alert_group.groupKey]
+            _finish_job(pending_job, succeeded=False)
+
+    # Merged storm jobs still queued lose their resolved alerts too.
+    storm_jobs = {
+        job.job_id: job
+        for job in (_storm_jobs.get(fingerprint) for fingerprint in resolved)
+        if job is not None
+    }
+    for job in storm_jobs.values():
+        remaining = [
+            alert for alert in job.alert_group.alerts
+            if alert.fingerprint not in resolved
+        ]
+        if remaining:
+            for fingerprint in resolved:
+                if _storm_jobs.get(fingerprint) is job:
+                    del _storm_jobs[fingerprint]
+            job.alert_group = job.alert_group.model_copy(
+                update={"alerts": remaining}
+            )
+            if _job_journal is not None:
+                await _job_journal.append(job)
+        else:
+            _logger.info(
+                "Alert group %s resolved, cancelling merged analysis %s",
+                alert_group.groupKey, job.group_key
+            )
+            _alert_queue.remove(job.job_id)
+            if _pending_groups.get(job.group_key) is job:
+                del _pending_groups[job.group_key]
+            _finish_job(job, succeeded=False)
+
+    # Matched by fingerprint, as merged storm jobs span several groups.
+    for job in list(_started_jobs.values()):
+        if not set(job.fingerprints) <= resolved:
+            continue
+        _logger.info(
+            "Alert group %s resolved, cancelling started analysis",
+            alert_group.groupKey
+        )
+        if (
+            _retry_queue is not None
+            and _retry_queue.cancel(job.job_id) is not None
+        ):
+            _finish_job(job, succeeded=False)
+        else:
+            # The worker finishes the job once the agent has stopped.
+            job.cancel()
+
+def _store_resolved_report(
+    alert_group: AlertGroupRecord, alert_index: int, alert: Alert
+) -> None:
+    """Record that an alert resolved.
+    
+    An existing analysis is kept and only marked as resolved; otherwise a
+    summary built from the alert itself replaces the pending report.
+    
+    Args:
+        alert_group: Record of the notification carrying the alert.
+        alert_index: Position of the alert in the notification.
+        alert: The resolved alert.
+    """
+    resolved_at = (alert.endsAt or datetime.now(timezone.utc)).isoformat()
+    report = _analysis_reports.get(alert.fingerprint)
+    if report and report.get("status") in ("completed", "partial"):
+        _analysis_reports[alert.fingerprint] = {
+            **report, "resolved_at": resolved_at, "updated_at": time.time()
+        }
+        _report_events.publish(alert.fingerprint)
+        return
+    report = {
+        "status": "resolved",
+        "analysis": _summarize_resolved_alert(alert).model_dump(),
+        "resolved_at": resolved_at,
+        "alert_group": alert_group,
+        "alert_index": alert_index,
+        "group_key": alert_group.group_key,
+        "created_at": alert.startsAt.isoformat(),
+        "fingerprint": alert.fingerprint,
+        "updated_at": time.time()
+    }
+    _prerender_report_page(alert.fingerprint, report)
+    _analysis_reports[alert.fingerprint] = report
+    _report_events.publish(alert.fingerprint)
+
+def _summarize_resolved_alert(alert: Alert) -> OncallK8sResponse:
+    """Build a post-mortem summary of a resolved alert without the LLM.
+    
+    Args:
+        alert: The resolved alert.
+        
+    Returns:
+        A report in the shape of an analysis, for the report page.
+    """
+    duration = "an unknown time"
+    ends_at = alert.endsAt
+    if ends_at is not None and (
+        (ends_at.tzinfo is None) == (alert.startsAt.tzinfo is None)
+    ):
+        minutes = (ends_at - alert.startsAt).total_seconds() / 60
+        duration = f"{minutes:.0f} minutes"
+    not_analysed = "Not analysed: the alert resolved before an analysis was needed."
+    annotations = alert.annotations
+    return OncallK8sResponse(
+        root_cause=not_analysed,
+        conclusion=(
+            f"{alert.labels.alertname} in namespace {alert.labels.namespace} "
+            f"resolved after {duration}."
+        ),
+        diagnosis=(
+            annotations.description or annotations.summary
+            or annotations.message or "No description"
+        ),
+        summary_of_findings=(
+            f"Started: {alert.startsAt.isoformat()}\n"
+            f"Resolved: {ends_at.isoformat() if ends_at else 'unknown'}\n"
+            f"Duration: {duration}"
+        ),
+        recommended_actions="No action needed unless the alert keeps recurring.",
+        recommendations=(
+            "Alerts that repeatedly fire and resolve on their own may need a "
+            "longer 'for' duration or a different threshold."
+        ),
+        solution="Resolved without intervention."
+    )
 
 @app.post("/webhook", response_model=Dict[str, Any])
 async def webhook(alert_group: AlertGroup) -> Dict[str, Any]:
@@ -178,7 +1077,9 @@ async def webhook(alert_group: AlertGroup) -> Dict[str, Any]:
         reports for each alert in the group.
         
     Raises:
-        HTTPException: If the service is not properly initialized.
+        HTTPException: If the service is not properly initialized, or with
+            status 503 and a ``Retry-After`` header if the alert queue is
+            full. Alertmanager retries 5xx responses.
     """
     if _alert_queue is None or _agent is None:
         # Should never happen unless startup failed.
@@ -186,12 +1087,19 @@ async def webhook(alert_group: AlertGroup) -> Dict[str, Any]:
             status_code=503, detail="Service not initialised"
         )
 
-    _logger.info("Received alert group, queuing for processing")
+    _logger.info(
+        "Received alert group %s with %d alerts",
+        alert_group.groupKey, len(alert_group.alerts)
+    )
 
     # Create report URLs for each alert using their fingerprints.
     report_urls = []
     base_url = os.getenv("ONCALLM_BASE_URL", "http://localhost:8001")
     
+    new_fingerprints = []
+    firing_alerts = []
+    resolved_alerts = []
+    
     for alert in alert_group.alerts:
         fingerprint = alert.fingerprint
         report_url = f"{base_url}/report/{fingerprint}"
@@ -202,11 +1110,107 @@ async def webhook(alert_group: AlertGroup) -> Dict[str, Any]:
             "report_url": report_url
         })
         
-        # Mark report as pending so clients can poll for completion.
+        # Resolved alerts are never analysed.
+        if alert.status == "resolved":
+            resolved_alerts.append(alert)
+            continue
+        firing_alerts.append(alert)
+
+    # The SQLite store reads from disk; look up all reports in one go off
+    # the event loop.
+    reports = await asyncio.to_thread(
+        _get_reports, [alert.fingerprint for alert in firing_alerts]
+    )
+    for alert in firing_alerts:
+        # Re-sent notifications keep pointing at the existing report.
+        if not _is_duplicate(alert, reports[alert.fingerprint]):
+            new_fingerprints.append(alert.fingerprint)
+
+    if resolved_alerts:
+        await _resolve_alerts(alert_group, resolved_alerts)
+
+    if not new_fingerprints:
+        if not firing_alerts:
+            message = "Resolved alerts recorded"
+        else:
+            _logger.info(
+                "All alerts of group %s are already analysed or in progress",
+                alert_group.groupKey
+            )
+            message = "Alerts already analysed or in progress"
+        return {
+            "status": "success",
+            "message": message,
+            "report_urls": report_urls
+        }
+
+    # Only the firing alerts are analysed.
+    if resolved_alerts:
+        alert_group = alert_group.model_copy(update={"alerts": firing_alerts})
+
+    if _shared_queue is not None:
+        # Whichever replica has a free worker claims the job; a group that
+        # is still waiting in the shared queue is updated instead.
+        job = build_analysis_job(alert_group)
+        for alert in firing_alerts:
+            if alert.fingerprint in new_fingerprints:
+                _analysis_reports[alert.fingerprint] = {
+                    "status": "processing",
+                    "content_hash": alert_content_hash(alert)
+                }
+        await _shared_queue.append(job)
+        return {
+            "status": "success",
+            "message": "Alerts queued for analysis",
+            "report_urls": report_urls
+        }
+
+    # The whole group is analysed once. If the group is still waiting in the
+    # queue, refresh that job with the latest snapshot of the group instead;
+    # putting it again lets the scheduler raise its priority if needed.
+    pending_job = _pending_groups.get(alert_group.groupKey)
+    if pending_job is not None:
+        _logger.info(
+            "Alert group %s already queued, updating pending job",
+            alert_group.groupKey
+        )
+        # Alerts missing from the new snapshot are no longer analysed.
+        dropped = set(pending_job.fingerprints).difference(
+            alert.fingerprint for alert in alert_group.alerts
+        )
+        pending_job.alert_group = alert_group
+        _deduplicator.release(pending_job, dropped)
+        _deduplicator.mark_in_flight(pending_job)
+        for fingerprint in dropped:
+            report = _analysis_reports.get(fingerprint)
+            if report is not None and report.get("status") == "processing":
+                del _analysis_reports[fingerprint]
+                _report_events.publish(fingerprint)
+        if _storm_batcher is None or pending_job.job_id not in _storm_batcher:
+            await _alert_queue.put(pending_job)
+        job = pending_job
+    else:
+        job = build_analysis_job(alert_group)
+        if _storm_batcher is not None:
+            # Queue capacity is checked again when the window closes.
+            if not _alert_queue.can_admit(job):
+                raise _queue_full_error(alert_group.groupKey)
+            _storm_batcher.add(job)
+        else:
+            try:
+                await _alert_queue.put(job)
+            except asyncio.QueueFull:
+                raise _queue_full_error(alert_group.groupKey)
+        _pending_groups[job.group_key] = job
+        _deduplicator.mark_in_flight(job)
+
+    # Mark reports as pending so clients can poll for completion.
+    for fingerprint in new_fingerprints:
         _analysis_reports[fingerprint] = {"status": "processing"}
-        
-        # Queue for processing.
-        await _alert_queue.put((fingerprint, alert_group))
+
+    # Only acknowledge Alertmanager once the job is on disk.
+    if _job_journal is not None:
+        await _job_journal.append(job)
 
     return {
         "status": "success", 
@@ -214,25 +1218,243 @@ async def webhook(alert_group: AlertGroup) -> Dict[str, Any]:
         "report_urls": report_urls
     }
 
+def _get_reports(fingerprints: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Look up the stored reports of several alerts.
+    
+    Args:
+        fingerprints: Fingerprints of the alerts.
+        
+    Returns:
+        Dictionary mapping each fingerprint to its report, or None.
+    """
+    return {
+        fingerprint: _analysis_reports.get(fingerprint)
+        for fingerprint in fingerprints
+    }
+
+def _is_duplicate(alert: Alert, report: Optional[Dict[str, Any]]) -> bool:
+    """Check whether a firing alert needs no new analysis.
+    
+    Args:
+        alert: A firing alert of an incoming notification.
+        report: The stored report of the alert, if any.
+        
+    Returns:
+        True if an identical alert is queued, running or was analysed
+        recently, by this replica or, with a shared queue, by another one.
+    """
+    if not report:
+        return False
+    if _deduplicator.is_duplicate(alert):
+        return True
+    if _shared_queue is None:
+        return False
+    # Jobs of other replicas are only known from their reports.
+    if report.get("content_hash") != alert_content_hash(alert):
+        return False
+    if report["status"] == "processing":
+        return True
+    return (
+        report["status"] == "completed"
+        and time.time() - report.get("updated_at", 0)
+        < _deduplicator.completed_ttl_seconds
+    )
+
 @app.get("/report/{fingerprint}", response_class=HTMLResponse)
-async def get_alert_report(fingerprint: str) -> str:
+async def get_alert_report(fingerprint: str, request: Request) -> Response:
     """Serve the alert analysis report as an HTML page.
     
+    Pages of finished reports are rendered and compressed once, in a
+    worker thread, and served from ``_report_pages`` with a strong ETag, so
+    a request whose ``If-None-Match`` matches gets an empty 304 response.
+    
     Args:
         fingerprint: The unique fingerprint of the alert.
+        request: The incoming request, for its conditional headers.
         
     Returns:
-        HTML page with the alert analysis report.
+        HTML page with the alert analysis report, or 304 Not Modified.
         
     Raises:
         HTTPException: If the alert report is not found.
     """
-    report = _analysis_reports.get(fingerprint)
+    report = await asyncio.to_thread(_analysis_reports.get, fingerprint)
     if not report:
         raise HTTPException(status_code=404, detail="Alert report not found")
     
-    # Generate HTML report page using template renderer.
-    return _generate_report_html(fingerprint, report)
+    if report["status"] == "processing":
+        # The page reloads itself until the analysis is done.
+        return HTMLResponse(
+            _generate_report_html(fingerprint, report),
+            headers={"Cache-Control": "no-store"}
+        )
+    
+    headers = {
+        "Cache-Control": (
+            "public, max-age="
+            + os.getenv("ONCALLM_REPORT_PAGE_MAX_AGE_SECONDS", "60")
+        ),
+        "Vary": "Accept-Encoding"
+    }
+    version = _page_version(report)
+    page = _report_pages.get(fingerprint, version) if version else None
+    if page is None and version:
+        # Rendering and compressing take milliseconds; keep them off the
+        # event loop.
+        page = await asyncio.to_thread(
+            _render_report_page, fingerprint, report, version
+        )
+    if page is None:
+        # Reports stored without a page are rendered on every request and
+        # compressed by the middleware, hence the weak ETag.
+        body = _generate_report_html(fingerprint, report).encode("utf-8")
+        headers["ETag"] = f"W/{page_etag(body)}"
+    else:
+        encoding = negotiate_encoding(
+            request.headers.get("accept-encoding"), page.encoded
+        )
+        headers["ETag"] = variant_etag(page.etag, encoding)
+        if encoding is None:
+            body = page.body
+        else:
+            body = page.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+    
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        headers.pop("Content-Encoding", None)
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+@app.get("/report/{fingerprint}/events")
+async def stream_report_events(fingerprint: str) -> StreamingResponse:
+    """Stream the status of a report as Server-Sent Events.
+    
+    The page of a pending report subscribes to this stream and reloads
+    once the status changes, instead of polling the whole page. Meanwhile
+    it shows the steps of the agent, if the analysis runs in this replica.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        
+    Returns:
+        A ``text/event-stream`` response that ends once the report is no
+        longer processing.
+        
+    Raises:
+        HTTPException: If the alert report is not found.
+    """
+    if fingerprint not in _analysis_reports:
+        raise HTTPException(status_code=404, detail="Alert report not found")
+    keepalive_seconds = float(
+        os.getenv("ONCALLM_REPORT_EVENTS_KEEPALIVE_SECONDS", "15")
+    )
+    return StreamingResponse(
+        _report_status_events(fingerprint, keepalive_seconds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+async def _report_status_events(
+    fingerprint: str, keepalive_seconds: float
+) -> AsyncIterator[str]:
+    """Produce the events of a report's status stream.
+    
+    The status is read from the report store whenever the report is
+    stored, and at least every ``keepalive_seconds``, which also picks up
+    reports stored by other replicas.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        keepalive_seconds: Longest time without sending anything.
+        
+    Yields:
+        Encoded events: a ``progress`` event per agent step, a ``status``
+        event per status change, and comments that keep the connection
+        open.
+    """
+    changed = _report_events.subscribe(fingerprint)
+    try:
+        # Reconnect after 5 seconds if the connection drops.
+        yield "retry: 5000\n\n"
+        sent = None
+        steps_sent = 0
+        while True:
+            changed.clear()
+            for step in _report_events.progress(fingerprint, steps_sent):
+                yield f"event: progress\ndata: {json.dumps(step)}\n\n"
+                steps_sent += 1
+            report = _analysis_reports.get(fingerprint)
+            status = report.get("status") if report else "not_found"
+            if status != sent:
+                yield f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+                sent = status
+            if status != "processing":
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        _report_events.unsubscribe(fingerprint, changed)
+
+def _prerender_report_page(fingerprint: str, report: Dict[str, Any]) -> None:
+    """Render the page of a finished report before storing the report.
+    
+    The page is cached and its ETag recorded in the report as
+    ``page_etag``. Nothing is rendered for reports still processing or
+    without a template renderer, nor on the event loop, where rendering
+    and compressing would hold up every other request; those pages are
+    rendered on their first request.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        report: The report about to be stored; updated in place.
+    """
+    if _template_renderer is None or report.get("status") == "processing":
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        return
+    try:
+        body = _generate_report_html(fingerprint, report).encode("utf-8")
+    except Exception as e:
+        _logger.warning("Could not render report page %s: %s", fingerprint, e)
+        return
+    report["page_etag"] = _report_pages.put(fingerprint, body).etag
+
+def _page_version(report: Dict[str, Any]) -> Optional[str]:
+    """The version the cached page of a report is stored under.
+    
+    Args:
+        report: A finished report.
+        
+    Returns:
+        ``page_etag`` for prerendered pages, otherwise a key derived from
+        ``updated_at``; None for reports that have neither.
+    """
+    version = report.get("page_etag")
+    if version is None and report.get("updated_at") is not None:
+        version = f"updated:{report['updated_at']!r}"
+    return version
+
+def _render_report_page(
+    fingerprint: str, report: Dict[str, Any], version: str
+) -> CachedPage:
+    """Render, compress and cache the page of a finished report.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        report: The stored report.
+        version: Result of :func:`_page_version` for the report.
+        
+    Returns:
+        The cached page.
+    """
+    body = _generate_report_html(fingerprint, report).encode("utf-8")
+    return _report_pages.put(fingerprint, body, version=version)
 
 
 def _generate_report_html(fingerprint: str, report: Dict[str, Any]) -> str:
@@ -250,32 +1472,41 @@ def _generate_report_html(fingerprint: str, report: Dict[str, Any]) -> str:
     
     if report["status"] == "processing":
         return _template_renderer.render_processing_page(fingerprint)
-    elif report["status"] == "failed":
+    elif report["status"] in ("failed", "shed"):
         error_message = report.get("error", "Unknown error occurred")
         return _template_renderer.render_failed_page(fingerprint, error_message)
     else:
-        # Extract alert information for completed reports.
+        # Completed, partial and resolved reports all carry an analysis.
         alert_group = report.get("alert_group", {})
-        alert_info = _extract_alert_info(alert_group)
+        if isinstance(alert_group, AlertGroupRecord):
+            alert_group = alert_group.to_dict()
+        alert_info = _extract_alert_info(
+            alert_group, report.get("alert_index", 0)
+        )
         analysis = report.get("analysis", {})
         created_at = report.get("created_at", "Unknown")
         
         return _template_renderer.render_completed_page(
-            fingerprint, alert_info, analysis, created_at
+            fingerprint, alert_info, analysis, created_at,
+            related_fingerprints=report.get("related_fingerprints")
         )
 
-def _extract_alert_info(alert_group: Dict[str, Any]) -> Dict[str, str]:
+def _extract_alert_info(
+    alert_group: Dict[str, Any], alert_index: int = 0
+) -> Dict[str, str]:
     """Extract alert information from alert group.
     
     Args:
         alert_group: The alert group data.
+        alert_index: Position of the report's alert in the group.
         
     Returns:
         Dictionary containing extracted alert information.
     """
     alert_info = {}
-    if alert_group and "alerts" in alert_group:
-        first_alert = alert_group["alerts"][0]
+    if alert_group and alert_group.get("alerts"):
+        alerts = alert_group["alerts"]
+        first_alert = alerts[alert_index if alert_index < len(alerts) else 0]
         alert_info = {
             "name": first_alert.get("labels", {}).get("alertname", "Unknown"),
             "namespace": first_alert.get("labels", {}).get(
@@ -296,23 +1527,382 @@ def _extract_alert_info(alert_group: Dict[str, Any]) -> Dict[str, str]:
         }
     return alert_info
 
+# Fields a report listing can return, selected with ``fields=``.
+_REPORT_LIST_FIELDS = (
+    "fingerprint", "status", "created_at", "namespace", "alertname",
+    "severity", "group_key", "resolved_at", "error", "analysis",
+)
+_DEFAULT_REPORT_LIST_FIELDS = ("fingerprint", "status", "created_at")
+
+# Fields served from the store's indexed columns, without loading reports.
+_INDEXED_REPORT_FIELDS = frozenset(
+    ("fingerprint", "status", "created_at", "namespace", "alertname", "severity")
+)
+
 @app.get("/reports")
-async def list_reports() -> Dict[str, List[Dict[str, str]]]:
-    """List all available reports.
+async def list_reports(
+    status: Optional[str] = None,
+    namespace: Optional[str] = None,
+    alertname: Optional[str] = None,
+    severity: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    sort: str = "-created_at",
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+) -> Dict[str, Any]:
+    """List reports page by page, newest first by default.
     
+    Args:
+        status: Only reports with this status.
+        namespace: Only alerts of this namespace.
+        alertname: Only alerts with this name.
+        severity: Only alerts with this severity label.
+        since: Only alerts that started at or after this ISO 8601 time.
+        until: Only alerts that started at or before this ISO 8601 time.
+        sort: ``-created_at`` for newest first or ``created_at``.
+        limit: Maximum number of reports on the page.
+        cursor: ``next_cursor`` of the previous page.
+        fields: Comma-separated fields to return per report. Defaults to
+            fingerprint, status and created_at.
+        
     Returns:
-        Dictionary containing list of reports with their metadata.
+        Dictionary with the page of reports and the cursor of the next
+        page, which is None on the last page.
+        
+    Raises:
+        HTTPException: With status 400 for an unknown sort order or field,
+            an invalid time bound or an invalid cursor.
     """
+    if sort not in ("created_at", "-created_at"):
+        raise HTTPException(status_code=400, detail=f"Unknown sort order: {sort}")
+    selected = _parse_report_fields(fields)
+    try:
+        report_query = ReportQuery(
+            status=status,
+            namespace=namespace,
+            alertname=alertname,
+            severity=severity,
+            since=since,
+            until=until,
+            descending=sort.startswith("-"),
+            # One extra report tells whether another page follows.
+            limit=limit + 1,
+            after=_decode_cursor(cursor) if cursor else None
+        )
+    except ValueError as e:
+        raise _invalid_time_bound(e)
+    # The SQLite store reads from disk; keep it off the event loop.
+    rows = await asyncio.to_thread(
+        query_reports,
+        _analysis_reports,
+        report_query,
+        load_reports=not set(selected) <= _INDEXED_REPORT_FIELDS
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        next_cursor = _encode_cursor((last["created_at"], last["fingerprint"]))
     return {
         "reports": [
-            {
-                "fingerprint": fingerprint,
-                "status": report["status"],
-                "created_at": report.get("created_at", "Unknown")
-            }
-            for fingerprint, report in _analysis_reports.items()
-        ]
-          }
+            _project_report(columns, report, selected)
+            for columns, report in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
+@app.get("/reports/export")
+async def export_reports(
+    status: Optional[str] = None,
+    namespace: Optional[str] = None,
+    alertname: Optional[str] = None,
+    severity: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> StreamingResponse:
+    """Stream full reports as newline-delimited JSON, oldest first.
+    
+    Reports are read from the store one page at a time while the response
+    is sent, so an export holds a single page in memory whatever the size
+    of the history.
+    
+    Args:
+        status: Only reports with this status.
+        namespace: Only alerts of this namespace.
+        alertname: Only alerts with this name.
+        severity: Only alerts with this severity label.
+        since: Only alerts that started at or after this ISO 8601 time.
+        until: Only alerts that started at or before this ISO 8601 time.
+        
+    Returns:
+        Streaming response with one JSON report per line.
+        
+    Raises:
+        HTTPException: With status 400 for an invalid time bound.
+    """
+    try:
+        report_query = ReportQuery(
+            status=status,
+            namespace=namespace,
+            alertname=alertname,
+            severity=severity,
+            since=since,
+            until=until,
+            descending=False
+        )
+    except ValueError as e:
+        raise _invalid_time_bound(e)
+    return StreamingResponse(
+        _export_lines(report_query),
+        media_type="application/x-ndjson",
+        headers={
+            "Content-Disposition": 'attachment; filename="oncallm-reports.ndjson"'
+        }
+    )
+
+def _export_lines(report_query: ReportQuery) -> Iterator[bytes]:
+    """Encode the reports matching a query as NDJSON lines.
+    
+    A plain generator: the response iterates it in the thread pool, so
+    reads from the SQLite store do not block the event loop.
+    
+    Args:
+        report_query: Filters and order of the export.
+        
+    Yields:
+        One encoded report per line.
+    """
+    for fingerprint, report in iter_reports(_analysis_reports, report_query):
+        line = json.dumps(
+            {**expand_report(report), "fingerprint": fingerprint}, default=str
+        )
+        yield line.encode("utf-8") + b"\n"
+
+@app.get("/reports/{fingerprint}")
+async def get_report(fingerprint: str) -> Dict[str, Any]:
+    """Return a report as stored, for clients of the original API.
+    
+    New clients should use ``/api/reports/{fingerprint}``, which supports
+    conditional and long-polling requests.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        
+    Returns:
+        The stored report.
+        
+    Raises:
+        HTTPException: If the report is not found.
+    """
+    if fingerprint not in _analysis_reports:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return expand_report(_analysis_reports[fingerprint])
+
+@app.get("/api/reports/{fingerprint}")
+async def get_report_json(
+    fingerprint: str,
+    request: Request,
+    wait: float = Query(0, ge=0)
+) -> Response:
+    """Return a report and the metadata of its alert as JSON.
+    
+    Responses carry an ETag and, once the report is stored, a
+    ``Last-Modified`` date, so a client holding the current report gets an
+    empty 304 response. With ``wait``, the request blocks while the report
+    is processing or the client's ``If-None-Match`` still matches, until
+    the report changes or ``wait`` seconds have passed, whichever is first.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        request: The incoming request, for its conditional headers.
+        wait: Longest time to block, in seconds, capped at
+            ``ONCALLM_REPORT_MAX_WAIT_SECONDS``.
+        
+    Returns:
+        The report as JSON, or 304 Not Modified.
+        
+    Raises:
+        HTTPException: If the report is not found.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    wait = min(wait, float(os.getenv("ONCALLM_REPORT_MAX_WAIT_SECONDS", "60")))
+    changed = _report_events.subscribe(fingerprint)
+    try:
+        deadline = time.monotonic() + wait
+        while True:
+            changed.clear()
+            report = _analysis_reports.get(fingerprint)
+            if not report:
+                raise HTTPException(status_code=404, detail="Report not found")
+            body = json.dumps(
+                _report_resource(fingerprint, report), default=str
+            ).encode("utf-8")
+            # Weak, as the middleware may compress the body.
+            etag = f"W/{page_etag(body)}"
+            waiting = (
+                report["status"] == "processing"
+                or etag_matches(if_none_match, etag)
+            )
+            remaining = deadline - time.monotonic()
+            if not waiting or remaining <= 0:
+                break
+            # Re-read at least every keepalive interval, which also picks
+            # up reports stored by other replicas.
+            recheck_seconds = float(
+                os.getenv("ONCALLM_REPORT_EVENTS_KEEPALIVE_SECONDS", "15")
+            )
+            try:
+                await asyncio.wait_for(
+                    changed.wait(), min(remaining, recheck_seconds)
+                )
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _report_events.unsubscribe(fingerprint, changed)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    updated_at = report.get("updated_at")
+    if updated_at:
+        headers["Last-Modified"] = formatdate(updated_at, usegmt=True)
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        not_modified = _not_modified_since(
+            request.headers.get("if-modified-since"), updated_at
+        )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _report_resource(fingerprint: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the JSON representation of a report.
+    
+    Args:
+        fingerprint: The unique fingerprint of the alert.
+        report: The stored report.
+        
+    Returns:
+        The report's status, analysis and alert, without internal fields.
+    """
+    alert_group = expand_report(report).get("alert_group") or {}
+    alerts = alert_group.get("alerts") or []
+    alert_index = report.get("alert_index", 0)
+    alert = alerts[alert_index] if 0 <= alert_index < len(alerts) else None
+    updated_at = report.get("updated_at")
+    base_url = os.getenv("ONCALLM_BASE_URL", "http://localhost:8001")
+    return {
+        "fingerprint": fingerprint,
+        "status": report["status"],
+        "report_url": f"{base_url}/report/{fingerprint}",
+        "created_at": report.get("created_at"),
+        "updated_at": (
+            datetime.fromtimestamp(updated_at, timezone.utc).isoformat()
+            if updated_at else None
+        ),
+        "resolved_at": report.get("resolved_at"),
+        "group_key": report.get("group_key"),
+        "alert": alert,
+        "related_fingerprints": report.get("related_fingerprints", []),
+        "analysis": report.get("analysis"),
+        "error": report.get("error"),
+    }
+
+def _not_modified_since(
+    if_modified_since: Optional[str], updated_at: Optional[float]
+) -> bool:
+    """Whether a report is unchanged since an ``If-Modified-Since`` date.
+    
+    Args:
+        if_modified_since: The header value, if the request has one.
+        updated_at: When the report was stored, as a Unix timestamp.
+        
+    Returns:
+        True if the client's copy is current; False if either date is
+        missing or the header cannot be parsed.
+    """
+    if not if_modified_since or not updated_at:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have a resolution of one second.
+    return int(updated_at) <= since.timestamp()
+
+def _parse_report_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Validate the ``fields`` parameter of a report listing.
+    
+    Args:
+        fields: Comma-separated field names, or None for the defaults.
+        
+    Returns:
+        The selected field names.
+        
+    Raises:
+        HTTPException: With status 400 if a field is unknown.
+    """
+    if not fields:
+        return _DEFAULT_REPORT_LIST_FIELDS
+    selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+    unknown = [field for field in selected if field not in _REPORT_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown report fields: {', '.join(unknown)}"
+        )
+    return selected
+
+def _project_report(
+    columns: Dict[str, Optional[str]],
+    report: Optional[Dict[str, Any]],
+    selected: Tuple[str, ...]
+) -> Dict[str, Any]:
+    """Build the listing entry of a report from the selected fields.
+    
+    Args:
+        columns: Indexed columns of the report.
+        report: The full report, if it was loaded.
+        selected: Fields to include.
+        
+    Returns:
+        The report's entry in the listing.
+    """
+    entry = {}
+    for field in selected:
+        if field in _INDEXED_REPORT_FIELDS:
+            entry[field] = columns[field]
+        else:
+            entry[field] = (report or {}).get(field)
+    if "created_at" in entry and not entry["created_at"]:
+        entry["created_at"] = "Unknown"
+    return entry
+
+def _invalid_time_bound(error: ValueError) -> HTTPException:
+    """Build the 400 response for a ``since`` or ``until`` that is not a time."""
+    return HTTPException(
+        status_code=400, detail=f"Invalid time bound: {error}"
+    )
+
+def _encode_cursor(sort_key: Tuple[str, str]) -> str:
+    """Encode the sort key of a page's last report as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(sort_key).encode()).decode()
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a cursor produced by :func:`_encode_cursor`.
+    
+    Raises:
+        HTTPException: With status 400 if the cursor is invalid.
+    """
+    try:
+        created_at, fingerprint = json.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return str(created_at), str(fingerprint)
 
 def main() -> None:
     """Main function to run the application."""
@@ -0,0 +1,194 @@
+"""Cache of rendered report pages.
+
+A report page only changes when its report is replaced, so it is rendered
+once, when the analysis finishes, and then served as stored bytes. Every
+page is identified by a strong ETag, the hash of its bytes. The report keeps
+the ETag of its page under ``page_etag``, which tells whether a cached page
+still belongs to the stored report.
+
+Pages are also stored compressed in every available encoding, so the
+compression cost is paid once per page rather than once per request.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from oncallm.compression import compress
+
+
+def page_etag(body: bytes) -> str:
+    """Compute the strong ETag of a page.
+
+    Args:
+        body: The encoded page.
+
+    Returns:
+        Quoted entity tag.
+    """
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header matches an entity tag.
+
+    Uses the weak comparison that RFC 9110 prescribes for this header.
+
+    Args:
+        if_none_match: The header value, if the request has one.
+        etag: Quoted entity tag of the current page.
+
+    Returns:
+        True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    """The entity tag of a page sent with a content coding.
+
+    Args:
+        etag: Quoted entity tag of the uncompressed page.
+        encoding: The content coding, or None for the uncompressed page.
+
+    Returns:
+        A strong entity tag that differs per content coding.
+    """
+    if encoding is None:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class CachedPage:
+    """A rendered page, its entity tag and its compressed variants."""
+
+    __slots__ = ("version", "etag", "body", "encoded", "size")
+
+    def __init__(
+        self,
+        version: str,
+        etag: str,
+        body: bytes,
+        encoded: Dict[str, bytes]
+    ) -> None:
+        self.version = version
+        self.etag = etag
+        self.body = body
+        # encoding -> compressed body, in order of server preference.
+        self.encoded = encoded
+        self.size = len(body) + sum(len(data) for data in encoded.values())
+
+
+class ReportPageCache:
+    """Rendered report pages keyed by alert fingerprint.
+
+    Bounded by the total size of the pages, evicting the least recently used
+    first. Safe to use from the event loop and the analysis threads at the
+    same time.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 0,
+        encodings: Iterable[str] = (),
+        minimum_size: int = 1024
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Maximum total size of the cached pages, compressed
+                variants included. Zero means unbounded.
+            encodings: Content codings to store pages in, in order of
+                server preference.
+            minimum_size: Pages smaller than this are stored uncompressed
+                only.
+        """
+        self.max_bytes = max_bytes
+        self.encodings = tuple(encodings)
+        self.minimum_size = minimum_size
+        self._lock = threading.Lock()
+        # Least recently used first.
+        self._pages: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fingerprint: str, version: str) -> Optional[CachedPage]:
+        """Look up the page of a report.
+
+        Args:
+            fingerprint: Fingerprint of the report's alert.
+            version: ``page_etag`` of the stored report.
+
+        Returns:
+            The cached page, or None if there is none for this version of
+            the report.
+        """
+        with self._lock:
+            page = self._pages.get(fingerprint)
+            if page is None or page.version != version:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(fingerprint)
+            self.hits += 1
+            return page
+
+    def put(
+        self, fingerprint: str, body: bytes, version: Optional[str] = None
+    ) -> CachedPage:
+        """Cache the page of a report.
+
+        Args:
+            fingerprint: Fingerprint of the report's alert.
+            body: The encoded page.
+            version: ``page_etag`` of the report the page was rendered for.
+                Defaults to the page's own ETag, for pages rendered before
+                their report is stored.
+
+        Returns:
+            The cached page.
+        """
+        etag = page_etag(body)
+        encoded = {}
+        if len(body) >= self.minimum_size:
+            for encoding in self.encodings:
+                data = compress(body, encoding)
+                if len(data) < len(body):
+                    encoded[encoding] = data
+        page = CachedPage(version or etag, etag, body, encoded)
+        with self._lock:
+            previous = self._pages.pop(fingerprint, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._pages[fingerprint] = page
+            self._bytes += page.size
+            while len(self._pages) > 1 and 0 < self.max_bytes < self._bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self._bytes -= evicted.size
+        return page
+
+    def clear(self) -> None:
+        """Drop every page."""
+        with self._lock:
+            self._pages.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy and hit counters."""
+        with self._lock:
+            return {
+                "entries": len(self._pages),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,237 @@
+"""Analysis in separate worker processes.
+
+In process mode the API process only ingests alerts, schedules jobs and
+serves reports. The agent runs in a pool of worker processes, each holding
+its own ``OncallmAgent``, so LangChain, pydantic and log parsing overhead is
+spread over all cores instead of contending on one GIL.
+
+Jobs and results cross the process boundary as plain JSON-compatible data
+over the pool's pipes. Errors are classified inside the worker, because
+provider exceptions are not reliably picklable.
+"""
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from oncallm.alerts import AlertGroup, OncallK8sResponse
+from oncallm.llm_service import (
+    AnalysisCancelled,
+    AnalysisDeadlineExceeded,
+    OncallmAgent,
+)
+from oncallm.retry import is_retryable_error
+
+_logger = logging.getLogger(__name__)
+
+# Agent of the current worker process, created by the pool initializer.
+_worker_agent: Optional[OncallmAgent] = None
+
+
+class WorkerAnalysisError(Exception):
+    """An analysis failed inside a worker process.
+
+    Attributes:
+        retryable: Whether the worker classified the failure as transient.
+    """
+
+    def __init__(self, message: str, retryable: bool) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _init_worker() -> None:
+    """Create the agent of a freshly started worker process."""
+    global _worker_agent
+    _worker_agent = OncallmAgent()
+
+
+def _run_analysis(
+    alert_group_json: str,
+    stop_event: Optional[Any],
+    progress_queue: Optional[Any] = None
+) -> Dict[str, Any]:
+    """Analyse an alert group inside a worker process.
+
+    Args:
+        alert_group_json: The alert group serialised as JSON.
+        stop_event: Shared event set by the API process to cancel.
+        progress_queue: Shared queue receiving the agent's progress steps.
+
+    Returns:
+        The outcome as a dictionary with a ``status`` key.
+    """
+    alert_group = AlertGroup.model_validate_json(alert_group_json)
+    should_stop = stop_event.is_set if stop_event is not None else None
+    options: Dict[str, Any] = {"should_stop": should_stop}
+    if progress_queue is not None:
+        options["on_step"] = progress_queue.put
+    try:
+        analysis = _worker_agent.do_analysis(alert_group, **options)
+        return {"status": "completed", "analysis": analysis.model_dump()}
+    except AnalysisDeadlineExceeded as e:
+        return {
+            "status": "partial",
+            "analysis": e.partial_analysis.model_dump(),
+            "elapsed_seconds": e.elapsed_seconds,
+        }
+    except AnalysisCancelled:
+        return {"status": "cancelled"}
+    except Exception as e:
+        return {
+            "status": "failed",
+            "error": str(e),
+            "retryable": is_retryable_error(e),
+        }
+
+
+def _unpack_result(result: Dict[str, Any]) -> OncallK8sResponse:
+    """Turn a worker result back into a response or the matching exception.
+
+    Args:
+        result: Dictionary returned by :func:`_run_analysis`.
+
+    Returns:
+        The completed analysis.
+
+    Raises:
+        AnalysisDeadlineExceeded: If the worker stopped at the deadline.
+        AnalysisCancelled: If the analysis was cancelled.
+        WorkerAnalysisError: If the analysis failed.
+    """
+    status = result["status"]
+    if status == "completed":
+        return OncallK8sResponse(**result["analysis"])
+    if status == "partial":
+        raise AnalysisDeadlineExceeded(
+            OncallK8sResponse(**result["analysis"]), result["elapsed_seconds"]
+        )
+    if status == "cancelled":
+        raise AnalysisCancelled()
+    raise WorkerAnalysisError(result["error"], result["retryable"])
+
+
+def _drain_progress(
+    progress_queue: Any, on_step: Callable[[Dict[str, Any]], None]
+) -> None:
+    """Pass the progress steps reported by a worker to the callback."""
+    while True:
+        try:
+            step = progress_queue.get_nowait()
+        except queue.Empty:
+            return
+        on_step(step)
+
+
+class ProcessPoolAgent:
+    """Drop-in replacement for ``OncallmAgent`` running in worker processes.
+
+    ``do_analysis`` blocks the calling thread until a worker process has
+    finished, so it is called from the existing thread pool; the waiting
+    threads hold no GIL.
+
+    If a worker process dies, for instance killed for running out of
+    memory, the pool is replaced and only the analyses it was running fail.
+    """
+
+    def __init__(self, processes: int, poll_interval_seconds: float = 0.5) -> None:
+        """Start the worker processes.
+
+        Args:
+            processes: Number of worker processes, each running one
+                analysis at a time.
+            poll_interval_seconds: How often a waiting thread checks whether
+                the analysis should be cancelled.
+        """
+        # Spawned rather than forked: the API process runs threads, which
+        # must not be forked.
+        self._mp_context = multiprocessing.get_context("spawn")
+        self.processes = processes
+        self.poll_interval_seconds = poll_interval_seconds
+        self._manager = self._mp_context.Manager()
+        self._pool_lock = threading.Lock()
+        self._pool = self._start_pool()
+        _logger.info("Started %d analysis worker processes", processes)
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """Create the pool of worker processes."""
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=self._mp_context,
+            initializer=_init_worker
+        )
+
+    def _replace_pool(self, broken_pool: ProcessPoolExecutor) -> None:
+        """Replace a pool that became unusable because a worker died.
+
+        Args:
+            broken_pool: The pool the failed analysis was submitted to.
+                Nothing happens if another thread replaced it already.
+        """
+        with self._pool_lock:
+            if self._pool is not broken_pool:
+                return
+            broken_pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._start_pool()
+        _logger.warning(
+            "An analysis worker process died, restarted %d worker processes",
+            self.processes
+        )
+
+    def do_analysis(
+        self,
+        alert_group: AlertGroup,
+        should_stop: Optional[Callable[[], bool]] = None,
+        on_step: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> OncallK8sResponse:
+        """Run an analysis in a worker process and wait for its outcome.
+
+        Args:
+            alert_group: The alert group to analyse.
+            should_stop: Polled while waiting; returning True asks the
+                worker to stop after its current agent step.
+            on_step: Called in this process with the progress steps the
+                worker reports, at most one poll interval late.
+
+        Returns:
+            The structured analysis produced by the agent.
+
+        Raises:
+            AnalysisDeadlineExceeded: If the worker stopped at the deadline.
+            AnalysisCancelled: If the analysis was cancelled.
+            WorkerAnalysisError: If the analysis failed in the worker, or
+                the worker process died; the latter is retryable.
+        """
+        stop_event = self._manager.Event() if should_stop is not None else None
+        progress_queue = self._manager.Queue() if on_step is not None else None
+        pool = self._pool
+        try:
+            future = pool.submit(
+                _run_analysis, alert_group.model_dump_json(), stop_event,
+                progress_queue
+            )
+            while True:
+                try:
+                    result = future.result(timeout=self.poll_interval_seconds)
+                    break
+                except FutureTimeoutError:
+                    if stop_event is not None and should_stop():
+                        stop_event.set()
+                finally:
+                    if progress_queue is not None:
+                        _drain_progress(progress_queue, on_step)
+        except BrokenProcessPool as e:
+            self._replace_pool(pool)
+            raise WorkerAnalysisError(
+                f"Analysis worker process died: {e}", retryable=True
+            ) from e
+        return _unpack_result(result)
+
+    def close(self) -> None:
+        """Stop the worker processes, abandoning queued analyses."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()
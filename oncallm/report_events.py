@@ -0,0 +1,140 @@
+"""Notifications of report changes for the pages waiting on them.
+
+The page of a pending report keeps one Server-Sent Events connection open
+instead of reloading itself every few seconds. Whoever stores a report
+publishes its fingerprint, and every stream subscribed to that fingerprint
+wakes up and reads the new state from the report store. Notifications carry
+no data, so a stream never sends a state that the store does not hold.
+
+While an analysis runs, the steps of the agent are kept here as well, so the
+streams of the group's reports can show them as they happen. They only live
+in the process running the analysis and are dropped once it ends.
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Progress steps kept per analysis; later steps are not shown.
+MAX_PROGRESS_STEPS = 500
+
+
+class ReportEvents:
+    """Wakes up the event streams of reports that changed.
+
+    Streams subscribe from the event loop. Reports are stored from the event
+    loop and the analysis threads alike, so :meth:`publish` is thread-safe.
+    """
+
+    def __init__(self) -> None:
+        """Initialize without subscribers."""
+        self._lock = threading.Lock()
+        # fingerprint -> events of the streams waiting for it.
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # fingerprint -> steps of the running analysis, one list shared by
+        # all the fingerprints of the analysed group.
+        self._progress: Dict[str, List[Dict[str, Any]]] = {}
+
+    def subscribe(self, fingerprint: str) -> asyncio.Event:
+        """Register a stream waiting for a report to change.
+
+        Must be called from the event loop.
+
+        Args:
+            fingerprint: Fingerprint of the report.
+
+        Returns:
+            An event set whenever the report is stored. The subscriber
+            clears it before reading the report.
+        """
+        event = asyncio.Event()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._waiters.setdefault(fingerprint, set()).add(event)
+        return event
+
+    def unsubscribe(self, fingerprint: str, event: asyncio.Event) -> None:
+        """Remove a stream registered with :meth:`subscribe`.
+
+        Args:
+            fingerprint: Fingerprint of the report.
+            event: The event returned by :meth:`subscribe`.
+        """
+        with self._lock:
+            waiters = self._waiters.get(fingerprint)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[fingerprint]
+
+    def publish(self, fingerprint: str) -> None:
+        """Wake up the streams of a report that was stored.
+
+        Args:
+            fingerprint: Fingerprint of the stored report.
+        """
+        self._wake([fingerprint])
+
+    def publish_progress(
+        self, fingerprints: List[str], step: Dict[str, Any]
+    ) -> None:
+        """Record a step of a running analysis and wake up its streams.
+
+        Args:
+            fingerprints: Fingerprints of the analysed alerts.
+            step: JSON-compatible description of the step.
+        """
+        if not fingerprints:
+            return
+        with self._lock:
+            steps = self._progress.get(fingerprints[0])
+            if steps is None:
+                steps = []
+                for fingerprint in fingerprints:
+                    self._progress[fingerprint] = steps
+            if len(steps) >= MAX_PROGRESS_STEPS:
+                return
+            steps.append(step)
+        self._wake(fingerprints)
+
+    def progress(self, fingerprint: str, start: int = 0) -> List[Dict[str, Any]]:
+        """Steps of the analysis running for a report.
+
+        Args:
+            fingerprint: Fingerprint of the report.
+            start: Number of steps the caller has already seen.
+
+        Returns:
+            The steps after the first ``start`` ones.
+        """
+        with self._lock:
+            return self._progress.get(fingerprint, [])[start:]
+
+    def clear_progress(self, fingerprints: Iterable[str]) -> None:
+        """Drop the steps of an analysis that ended.
+
+        Args:
+            fingerprints: Fingerprints of the analysed alerts.
+        """
+        with self._lock:
+            for fingerprint in fingerprints:
+                self._progress.pop(fingerprint, None)
+
+    def _wake(self, fingerprints: Iterable[str]) -> None:
+        with self._lock:
+            waiters = [
+                event
+                for fingerprint in fingerprints
+                for event in self._waiters.get(fingerprint, ())
+            ]
+            loop = self._loop
+        if not waiters or loop is None or loop.is_closed():
+            return
+        for event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def subscriber_count(self) -> int:
+        """Number of open streams."""
+        with self._lock:
+            return sum(len(waiters) for waiters in self._waiters.values())
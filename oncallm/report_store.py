@@ -0,0 +1,1136 @@
+"""Stores for analysis reports keyed by alert fingerprint.
+
+Both stores are ``MutableMapping`` implementations, so callers treat them like
+the dictionary they replace.
+
+``MemoryReportStore`` is the default. It is bounded by the number of reports,
+an approximate byte size and an age limit, evicting the least recently used
+reports first, so memory stays flat however long the process runs. Reports
+stuck in "processing" because their job was lost are reaped as well.
+
+``SQLiteReportStore`` keeps the reports in a database, so they survive
+restarts and can be looked up and listed by indexed columns. On a shared
+volume, several replicas serve the same report links from it.
+
+Reports reference the alert group they belong to through a shared
+``AlertGroupRecord`` and the index of their alert. Both stores account for,
+and the SQLite store writes, each group once however many reports use it.
+"""
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import (
+    Any, Callable, Collection, Dict, Iterator, List, Mapping, Optional, Set,
+    Tuple
+)
+
+from oncallm.alert_records import (
+    AlertGroupRecord, cached_alert_group, load_alert_group
+)
+
+_logger = logging.getLogger(__name__)
+
+# Reasons a report leaves the memory store other than being overwritten.
+EVICTION_REASONS = ("size", "ttl", "stale_processing")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    fingerprint TEXT PRIMARY KEY,
+    status TEXT,
+    created_at TEXT,
+    namespace TEXT,
+    alertname TEXT,
+    severity TEXT,
+    updated_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    group_id TEXT
+);
+CREATE TABLE IF NOT EXISTS alert_groups (
+    group_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL
+);
+"""
+
+# Columns extracted from the payload for lookups and listings.
+_INDEX_COLUMNS = ("status", "created_at", "namespace", "alertname", "severity")
+
+# Indexed columns that listings filter on by exact match.
+_LABEL_COLUMNS = ("status", "namespace", "alertname", "severity")
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS reports_status_idx ON reports (status);
+DROP INDEX IF EXISTS reports_created_at_idx;
+CREATE INDEX IF NOT EXISTS reports_created_idx ON reports (created_at, fingerprint);
+CREATE INDEX IF NOT EXISTS reports_namespace_idx ON reports (namespace);
+CREATE INDEX IF NOT EXISTS reports_alertname_idx ON reports (alertname);
+CREATE INDEX IF NOT EXISTS reports_severity_idx ON reports (severity);
+CREATE INDEX IF NOT EXISTS reports_updated_at_idx ON reports (updated_at);
+CREATE INDEX IF NOT EXISTS reports_group_idx ON reports (group_id);
+"""
+
+# Marks a buffered deletion.
+_DELETED = object()
+
+# Backoff between attempts to commit a batch that failed, doubling from the
+# first up to the last.
+_COMMIT_RETRY_SECONDS = 0.1
+_MAX_COMMIT_RETRY_SECONDS = 30.0
+
+
+def estimate_report_size(report: Dict[str, Any]) -> int:
+    """Approximate the memory held by a report.
+
+    The length of the report's JSON encoding is used as a proxy; it grows
+    linearly with the Python objects behind it and is cheap to compute. A
+    referenced alert group record is not included, since it is shared with
+    the other reports of its group.
+
+    Args:
+        report: The report to measure.
+
+    Returns:
+        Size estimate in bytes.
+    """
+    return len(json.dumps(report, default=_encode_reference))
+
+
+def normalize_timestamp(value: str) -> str:
+    """Convert an ISO 8601 time to the UTC form reports are indexed by.
+
+    Times in that form sort chronologically as strings, whatever offset or
+    precision they were given with.
+
+    Args:
+        value: An ISO 8601 time, e.g. ``"2024-01-02T10:00:00Z"``. Times
+            without an offset are taken as UTC.
+
+    Returns:
+        The time as ``isoformat()`` of a UTC datetime.
+
+    Raises:
+        ValueError: If the value is not an ISO 8601 time.
+    """
+    if value[-1:] in ("Z", "z"):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def expand_report(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a report with its alert group record as a plain dictionary.
+
+    Args:
+        report: A stored report.
+
+    Returns:
+        The report as it can be encoded as JSON; the report itself if it
+        does not reference a record.
+    """
+    alert_group = report.get("alert_group")
+    if not isinstance(alert_group, AlertGroupRecord):
+        return report
+    return {**report, "alert_group": alert_group.to_dict()}
+
+
+@dataclass(frozen=True)
+class ReportQuery:
+    """Filters, order and page of a report listing.
+
+    Reports are ordered by creation time, ties broken by fingerprint. Time
+    bounds are ISO 8601 strings compared with the reports' ``created_at``;
+    both are normalised to UTC first.
+
+    Raises:
+        ValueError: If a time bound is not an ISO 8601 time.
+    """
+
+    status: Optional[str] = None
+    namespace: Optional[str] = None
+    alertname: Optional[str] = None
+    severity: Optional[str] = None
+    since: Optional[str] = None
+    until: Optional[str] = None
+    descending: bool = True
+    limit: int = 100
+    # Sort key (created_at, fingerprint) of the last report of the previous
+    # page.
+    after: Optional[Tuple[str, str]] = None
+
+    def __post_init__(self) -> None:
+        for bound in ("since", "until"):
+            value = getattr(self, bound)
+            if value is not None:
+                object.__setattr__(self, bound, normalize_timestamp(value))
+
+    def label_filters(self) -> Dict[str, str]:
+        """The indexed columns that must match exactly."""
+        return {
+            column: value
+            for column, value in (
+                ("status", self.status),
+                ("namespace", self.namespace),
+                ("alertname", self.alertname),
+                ("severity", self.severity),
+            )
+            if value is not None
+        }
+
+
+# A listed report: its indexed columns and, if loaded, the report itself.
+ReportRow = Tuple[Dict[str, Optional[str]], Optional[Dict[str, Any]]]
+
+
+class _MemoryEntry:
+    """A report held by the memory store."""
+
+    __slots__ = ("report", "size", "stored_at", "columns", "group")
+
+    def __init__(
+        self,
+        report: Dict[str, Any],
+        size: int,
+        stored_at: float,
+        columns: Dict[str, Optional[str]]
+    ) -> None:
+        self.report = report
+        self.size = size
+        self.stored_at = stored_at
+        self.columns = columns
+        group = report.get("alert_group")
+        self.group = group if isinstance(group, AlertGroupRecord) else None
+
+
+class MemoryReportStore(MutableMapping):
+    """In-memory reports with LRU, size and age limits.
+
+    Reading a report marks it as recently used. Reports older than the TTL
+    are dropped when they are read or reaped; the oldest entries are evicted
+    as soon as a write exceeds a size limit, except reports still
+    "processing". Secondary indexes on the status
+    and label columns serve listings. Safe to use from the event loop and the
+    analysis threads at the same time.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 0,
+        max_bytes: int = 0,
+        ttl_seconds: float = 0,
+        processing_ttl_seconds: float = 0,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            max_entries: Maximum number of reports. Zero means unbounded.
+            max_bytes: Maximum estimated size of all reports. Zero means
+                unbounded.
+            ttl_seconds: Age since the last write after which a report is
+                dropped. Zero keeps reports until they are evicted.
+            processing_ttl_seconds: Age after which a report still in
+                "processing" is reaped, unless its job is known to be alive.
+                Zero disables reaping.
+            clock: Monotonic time source, overridable for tests.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.processing_ttl_seconds = processing_ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Least recently used first.
+        self._entries: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        # The entries that are not "processing", in the same order, so
+        # evicting one never scans past the pinned ones.
+        self._evictable: "OrderedDict[str, None]" = OrderedDict()
+        # column -> value -> fingerprints, for the columns of ReportQuery
+        # that must match exactly.
+        self._indexes: Dict[str, Dict[str, Set[str]]] = {
+            column: {} for column in _LABEL_COLUMNS
+        }
+        # group_id -> number of stored reports referencing the group record.
+        self._group_refs: Dict[str, int] = {}
+        self._bytes = 0
+        self.evicted_total = {reason: 0 for reason in EVICTION_REASONS}
+
+    def __getitem__(self, fingerprint: str) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                raise KeyError(fingerprint)
+            if self._expired(entry):
+                self._evict(fingerprint, "ttl")
+                raise KeyError(fingerprint)
+            self._entries.move_to_end(fingerprint)
+            if fingerprint in self._evictable:
+                self._evictable.move_to_end(fingerprint)
+            return entry.report
+
+    def __setitem__(self, fingerprint: str, report: Dict[str, Any]) -> None:
+        entry = _MemoryEntry(
+            report,
+            estimate_report_size(report),
+            self._clock(),
+            _index_columns(fingerprint, report)
+        )
+        with self._lock:
+            if fingerprint in self._entries:
+                self._remove(fingerprint)
+            self._entries[fingerprint] = entry
+            if entry.columns["status"] != "processing":
+                self._evictable[fingerprint] = None
+            self._bytes += entry.size
+            if entry.group is not None:
+                group_id = entry.group.group_id
+                refs = self._group_refs.get(group_id, 0)
+                if not refs:
+                    self._bytes += entry.group.size
+                self._group_refs[group_id] = refs + 1
+            for column, index in self._indexes.items():
+                value = entry.columns[column]
+                if value is not None:
+                    index.setdefault(value, set()).add(fingerprint)
+            self._enforce_limits()
+
+    def __delitem__(self, fingerprint: str) -> None:
+        with self._lock:
+            if fingerprint not in self._entries:
+                raise KeyError(fingerprint)
+            self._remove(fingerprint)
+
+    def __contains__(self, fingerprint: object) -> bool:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            return entry is not None and not self._expired(entry)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Snapshot of all reports without marking them as used."""
+        with self._lock:
+            return [
+                (fingerprint, entry.report)
+                for fingerprint, entry in self._entries.items()
+                if not self._expired(entry)
+            ]
+
+    def clear(self) -> None:
+        """Delete every report."""
+        with self._lock:
+            self._entries.clear()
+            self._evictable.clear()
+            for index in self._indexes.values():
+                index.clear()
+            self._group_refs.clear()
+            self._bytes = 0
+
+    def query(self, report_query: ReportQuery) -> List[ReportRow]:
+        """List reports matching a query without marking them as used.
+
+        Args:
+            report_query: Filters, order and page.
+
+        Returns:
+            Up to ``limit`` reports with their indexed columns.
+        """
+        with self._lock:
+            candidates: Optional[Set[str]] = None
+            # Start from the smallest index bucket.
+            buckets = sorted(
+                (
+                    self._indexes[column].get(value, set())
+                    for column, value in report_query.label_filters().items()
+                ),
+                key=len
+            )
+            for bucket in buckets:
+                candidates = (
+                    set(bucket) if candidates is None else candidates & bucket
+                )
+            if candidates is None:
+                candidates = set(self._entries)
+            matches = []
+            for fingerprint in candidates:
+                entry = self._entries[fingerprint]
+                sort_key = (entry.columns["created_at"], fingerprint)
+                if self._expired(entry) or not _in_page(sort_key, report_query):
+                    continue
+                matches.append((sort_key, entry))
+        matches.sort(key=lambda match: match[0], reverse=report_query.descending)
+        return [
+            ({**entry.columns, "fingerprint": fingerprint}, entry.report)
+            for (_, fingerprint), entry in matches[:report_query.limit]
+        ]
+
+    def reap(self, active: Collection[str] = ()) -> int:
+        """Drop expired reports and reports stuck in "processing".
+
+        Args:
+            active: Fingerprints whose jobs are queued or running; their
+                "processing" reports are kept however old they are.
+
+        Returns:
+            The number of reports dropped.
+        """
+        now = self._clock()
+        reaped = 0
+        with self._lock:
+            for fingerprint, entry in list(self._entries.items()):
+                if self._expired(entry):
+                    self._evict(fingerprint, "ttl")
+                elif (
+                    self.processing_ttl_seconds > 0
+                    and entry.columns["status"] == "processing"
+                    and now - entry.stored_at > self.processing_ttl_seconds
+                    and fingerprint not in active
+                ):
+                    self._evict(fingerprint, "stale_processing")
+                else:
+                    continue
+                reaped += 1
+        if reaped:
+            _logger.info("Reaped %d expired or stale reports", reaped)
+        return reaped
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy, limits and eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "alert_groups": len(self._group_refs),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted_total": dict(self.evicted_total),
+            }
+
+    def _expired(self, entry: _MemoryEntry) -> bool:
+        return (
+            self.ttl_seconds > 0
+            and self._clock() - entry.stored_at > self.ttl_seconds
+        )
+
+    def _remove(self, fingerprint: str) -> None:
+        """Remove an entry and its index references; the lock must be held."""
+        entry = self._entries.pop(fingerprint)
+        self._evictable.pop(fingerprint, None)
+        self._bytes -= entry.size
+        if entry.group is not None:
+            group_id = entry.group.group_id
+            refs = self._group_refs[group_id] - 1
+            if refs:
+                self._group_refs[group_id] = refs
+            else:
+                del self._group_refs[group_id]
+                self._bytes -= entry.group.size
+        for column, index in self._indexes.items():
+            value = entry.columns[column]
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del index[value]
+
+    def _evict(self, fingerprint: str, reason: str) -> None:
+        """Remove an entry and count why; the lock must be held."""
+        self._remove(fingerprint)
+        self.evicted_total[reason] += 1
+
+    def _enforce_limits(self) -> None:
+        """Evict least recently used entries; the lock must be held.
+
+        Reports still "processing" are skipped: their jobs are queued or
+        running and replace them when done, and ``reap`` drops those whose
+        job was lost. They are small, so they only take a few bytes beyond
+        the limits.
+        """
+        # The entry just written is never evicted, even if it alone exceeds
+        # the byte limit.
+        newest = next(reversed(self._entries))
+        while (
+            0 < self.max_entries < len(self._entries)
+            or 0 < self.max_bytes < self._bytes
+        ):
+            victim = next(iter(self._evictable), newest)
+            if victim == newest:
+                return
+            self._evict(victim, "size")
+
+
+class SQLiteReportStore(MutableMapping):
+    """Reports keyed by alert fingerprint, persisted in SQLite.
+
+    Besides the JSON payload, the columns used to look up and list reports
+    are stored separately and indexed. Writes are buffered and committed in
+    batches by a writer thread; reads see buffered writes immediately and
+    otherwise use a small pool of read connections, so the store can be used
+    from the event loop and the analysis threads at the same time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        read_connections: int = 4,
+        max_batch_size: int = 512,
+        shared: bool = False
+    ) -> None:
+        """Open the store, creating or upgrading the database if needed.
+
+        Args:
+            path: SQLite database file, typically on a persistent volume.
+            read_connections: Size of the read connection pool.
+            max_batch_size: Upper bound of writes per transaction.
+            shared: Whether other replicas use the file at the same time,
+                possibly from other nodes. WAL mode is only used otherwise,
+                as it relies on memory shared between the processes.
+        """
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self._shared = shared
+        self._journal_mode = "DELETE" if shared else "WAL"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._write_conn = self._connect()
+        self._migrate()
+        # Row counts kept up to date by the writer, so reading the stats
+        # never scans the tables.
+        self._report_count, self._group_count = self._count_rows()
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, read_connections)):
+            self._readers.put(self._connect())
+        # fingerprint -> report or _DELETED, not yet committed.
+        self._pending: Dict[str, Any] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self.commit_count = 0
+        self.commit_failures = 0
+        # Error of the last commit if it failed, until one succeeds.
+        self._commit_error: Optional[Exception] = None
+        self._writer = threading.Thread(
+            target=self._write_loop, name="oncallm-report-writer", daemon=True
+        )
+        self._writer.start()
+
+    def __getitem__(self, fingerprint: str) -> Dict[str, Any]:
+        with self._condition:
+            report = self._pending.get(fingerprint)
+        if report is _DELETED:
+            raise KeyError(fingerprint)
+        if report is not None:
+            return report
+        rows = self._read(
+            "SELECT payload, group_id FROM reports WHERE fingerprint = ?",
+            (fingerprint,)
+        )
+        if not rows:
+            raise KeyError(fingerprint)
+        return self._decode(rows)[0]
+
+    def __setitem__(self, fingerprint: str, report: Dict[str, Any]) -> None:
+        with self._condition:
+            self._pending[fingerprint] = report
+            self._condition.notify_all()
+
+    def __delitem__(self, fingerprint: str) -> None:
+        if fingerprint not in self:
+            raise KeyError(fingerprint)
+        with self._condition:
+            self._pending[fingerprint] = _DELETED
+            self._condition.notify_all()
+
+    def __contains__(self, fingerprint: object) -> bool:
+        with self._condition:
+            report = self._pending.get(fingerprint)
+        if report is not None:
+            return report is not _DELETED
+        return bool(self._read(
+            "SELECT 1 FROM reports WHERE fingerprint = ?", (fingerprint,)
+        ))
+
+    def __iter__(self) -> Iterator[str]:
+        self.flush()
+        rows = self._read("SELECT fingerprint FROM reports ORDER BY updated_at")
+        return iter([fingerprint for fingerprint, in rows])
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._read("SELECT count(*) FROM reports")[0][0]
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """All reports in one query, oldest update first."""
+        self.flush()
+        rows = self._read(
+            "SELECT fingerprint, payload, group_id FROM reports "
+            "ORDER BY updated_at"
+        )
+        reports = self._decode([row[1:] for row in rows])
+        return [(row[0], report) for row, report in zip(rows, reports)]
+
+    def clear(self) -> None:
+        """Delete every report."""
+        with self._condition:
+            self._pending.clear()
+        self._read("DELETE FROM reports")
+        self._read("DELETE FROM alert_groups")
+        self._report_count = self._group_count = 0
+
+    def flush(self) -> None:
+        """Wait until every buffered write has been committed.
+
+        Raises:
+            sqlite3.OperationalError: If the last commit failed. The writes
+                stay buffered and are retried.
+        """
+        with self._condition:
+            while self._pending and not self._closed:
+                if self._commit_error is not None:
+                    raise sqlite3.OperationalError(
+                        f"Report store commits are failing: "
+                        f"{self._commit_error}"
+                    ) from self._commit_error
+                self._condition.wait()
+
+    def close(self) -> None:
+        """Commit buffered writes and close the database.
+
+        Writes whose commit still fails are dropped and logged.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+        self._write_conn.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+    def query(
+        self, report_query: ReportQuery, load_reports: bool = True
+    ) -> List[ReportRow]:
+        """List reports matching a query using the indexed columns.
+
+        Uses keyset pagination on ``(created_at, fingerprint)``, so every
+        page costs the same however deep it is. Buffered writes are merged
+        into the page instead of waiting for their commit.
+
+        Args:
+            report_query: Filters, order and page.
+            load_reports: Whether to load and decode the full reports.
+                Without them only the indexed columns are read.
+
+        Returns:
+            Up to ``limit`` reports with their indexed columns; the report
+            is None if it was not loaded.
+        """
+        with self._condition:
+            pending = dict(self._pending)
+        conditions = []
+        params: List[Any] = []
+        label_filters = report_query.label_filters()
+        for column, value in label_filters.items():
+            conditions.append(f"{column} = ?")
+            params.append(value)
+        if report_query.since is not None:
+            conditions.append("created_at >= ?")
+            params.append(report_query.since)
+        if report_query.until is not None:
+            conditions.append("created_at <= ?")
+            params.append(report_query.until)
+        if report_query.after is not None:
+            operator = "<" if report_query.descending else ">"
+            conditions.append(f"(created_at, fingerprint) {operator} (?, ?)")
+            params.extend(report_query.after)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        direction = "DESC" if report_query.descending else "ASC"
+        columns = ", ".join(_INDEX_COLUMNS)
+        payload = ", payload, group_id" if load_reports else ""
+        rows = self._read(
+            f"SELECT fingerprint, {columns}{payload} FROM reports {where}"
+            f"ORDER BY created_at {direction}, fingerprint {direction} LIMIT ?",
+            # Buffered writes may replace or delete some of the rows.
+            (*params, report_query.limit + len(pending))
+        )
+        rows = [row for row in rows if row[0] not in pending]
+        end = 1 + len(_INDEX_COLUMNS)
+        if load_reports:
+            reports = self._decode([row[end:] for row in rows])
+        else:
+            reports = [None] * len(rows)
+        result = []
+        for row, report in zip(rows, reports):
+            indexed = dict(zip(_INDEX_COLUMNS, row[1:end]))
+            indexed["fingerprint"] = row[0]
+            result.append((indexed, report))
+        for fingerprint, report in pending.items():
+            if report is _DELETED:
+                continue
+            indexed = _index_columns(fingerprint, report)
+            sort_key = (indexed["created_at"], fingerprint)
+            if not _in_page(sort_key, report_query) or any(
+                indexed[column] != value
+                for column, value in label_filters.items()
+            ):
+                continue
+            indexed["fingerprint"] = fingerprint
+            result.append((indexed, report if load_reports else None))
+        result.sort(
+            key=lambda row: (row[0]["created_at"], row[0]["fingerprint"]),
+            reverse=report_query.descending
+        )
+        return result[:report_query.limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Stored reports, buffered writes and committed or failed batches."""
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "entries": self._report_count,
+            "alert_groups": self._group_count,
+            "pending_writes": pending,
+            "commits_total": self.commit_count,
+            "commit_failures_total": self.commit_failures,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path, isolation_level=None, check_same_thread=False
+        )
+        connection.execute(f"PRAGMA journal_mode={self._journal_mode}")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        # Other replicas may hold the write lock on a slower network volume.
+        connection.execute("PRAGMA busy_timeout=15000")
+        return connection
+
+    def _read(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a statement on a pooled connection and fetch all rows.
+
+        Raises:
+            sqlite3.ProgrammingError: If the store was closed, instead of
+                waiting for a connection that is never returned.
+        """
+        while True:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Report store is closed")
+            try:
+                connection = self._readers.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            break
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            self._readers.put(connection)
+
+    def _decode(
+        self, rows: List[Tuple[str, Optional[str]]]
+    ) -> List[Dict[str, Any]]:
+        """Decode report payloads and attach their alert group records.
+
+        Args:
+            rows: ``(payload, group_id)`` of each report.
+
+        Returns:
+            The reports in the order of the rows.
+        """
+        records: Dict[str, AlertGroupRecord] = {}
+        missing = []
+        for group_id in {group_id for _, group_id in rows if group_id}:
+            record = cached_alert_group(group_id)
+            if record is None:
+                missing.append(group_id)
+            else:
+                records[group_id] = record
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for group_id, encoded in self._read(
+                "SELECT group_id, payload FROM alert_groups "
+                f"WHERE group_id IN ({placeholders})",
+                tuple(chunk)
+            ):
+                records[group_id] = load_alert_group(group_id, encoded)
+        reports = []
+        for payload, group_id in rows:
+            report = json.loads(payload)
+            if group_id in records:
+                report["alert_group"] = records[group_id]
+            reports.append(report)
+        return reports
+
+    def _migrate(self) -> None:
+        """Create the schema and index reports written by older versions."""
+        conn = self._write_conn
+        conn.executescript(_SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(reports)")}
+        if "group_id" not in columns:
+            # Reports written before have their alert group in the payload.
+            conn.execute("ALTER TABLE reports ADD COLUMN group_id TEXT")
+        missing = [column for column in _INDEX_COLUMNS if column not in columns]
+        if missing:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for column in missing:
+                    conn.execute(f"ALTER TABLE reports ADD COLUMN {column} TEXT")
+                rows = conn.execute(
+                    "SELECT fingerprint, payload FROM reports"
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE reports SET status = ?, created_at = ?, "
+                    "namespace = ?, alertname = ?, severity = ? "
+                    "WHERE fingerprint = ?",
+                    [
+                        (*_index_values(fingerprint, json.loads(payload)),
+                         fingerprint)
+                        for fingerprint, payload in rows
+                    ]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            _logger.info("Indexed %d existing reports", len(rows))
+        elif conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+            # Older versions indexed created_at as sent, whatever its offset.
+            rows = conn.execute(
+                "SELECT fingerprint, created_at FROM reports "
+                "WHERE created_at != ''"
+            ).fetchall()
+            updates = []
+            for fingerprint, created_at in rows:
+                try:
+                    normalized = normalize_timestamp(created_at)
+                except ValueError:
+                    continue
+                if normalized != created_at:
+                    updates.append((normalized, fingerprint))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "UPDATE reports SET created_at = ? WHERE fingerprint = ?",
+                    updates
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if updates:
+                _logger.info(
+                    "Normalised the creation time of %d reports", len(updates)
+                )
+        conn.execute("PRAGMA user_version = 1")
+        conn.executescript(_INDEXES)
+
+    def _write_loop(self) -> None:
+        """Commit buffered writes in batches until the store is closed.
+
+        A batch whose commit fails stays buffered and is retried with
+        exponential backoff; only closing the store gives up on it.
+        """
+        delay = _COMMIT_RETRY_SECONDS
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                batch = list(self._pending.items())[:self.max_batch_size]
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                with self._condition:
+                    self.commit_failures += 1
+                    self._commit_error = e
+                    self._condition.notify_all()
+                    if self._closed:
+                        _logger.error(
+                            "Report store commit failed while closing, "
+                            "dropping %d writes: %s", len(self._pending), e
+                        )
+                        self._pending.clear()
+                        return
+                    _logger.error(
+                        "Report store commit of %d writes failed, retrying "
+                        "in %.1fs: %s", len(batch), delay, e
+                    )
+                    # Closing the store cuts the wait short.
+                    self._condition.wait(delay)
+                delay = min(delay * 2, _MAX_COMMIT_RETRY_SECONDS)
+                continue
+            delay = _COMMIT_RETRY_SECONDS
+            with self._condition:
+                self._commit_error = None
+                for fingerprint, report in batch:
+                    # Keep writes made while the batch was being committed.
+                    if self._pending.get(fingerprint) is report:
+                        del self._pending[fingerprint]
+                self._condition.notify_all()
+
+    def _write_batch(self, batch: List[Tuple[str, Any]]) -> None:
+        now = time.time()
+        upserts = []
+        deletes = []
+        # group_id -> encoded record, written once for all its reports.
+        groups: Dict[str, str] = {}
+        for fingerprint, report in batch:
+            if report is _DELETED:
+                deletes.append((fingerprint,))
+                continue
+            group_id = None
+            record = report.get("alert_group")
+            if isinstance(record, AlertGroupRecord):
+                group_id = record.group_id
+                if group_id not in groups:
+                    groups[group_id] = json.dumps(record.to_dict())
+                report = {
+                    key: value for key, value in report.items()
+                    if key != "alert_group"
+                }
+            upserts.append((
+                fingerprint,
+                *_index_values(fingerprint, report),
+                now,
+                json.dumps(report, default=str),
+                group_id
+            ))
+        fingerprints = [row[0] for row in batch]
+        placeholders = ", ".join("?" * len(fingerprints))
+        conn = self._write_conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = conn.execute(
+                "SELECT fingerprint, group_id FROM reports "
+                f"WHERE fingerprint IN ({placeholders})",
+                fingerprints
+            ).fetchall()
+            # Groups that may lose their last report in this batch.
+            replaced = {
+                group_id for _, group_id in existing
+                if group_id is not None and group_id not in groups
+            }
+            added_groups = conn.executemany(
+                "INSERT OR IGNORE INTO alert_groups (group_id, payload) "
+                "VALUES (?, ?)",
+                groups.items()
+            ).rowcount
+            conn.executemany(
+                "INSERT INTO reports (fingerprint, status, created_at, "
+                "namespace, alertname, severity, updated_at, payload, "
+                "group_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (fingerprint) DO UPDATE SET "
+                "status = excluded.status, created_at = excluded.created_at, "
+                "namespace = excluded.namespace, "
+                "alertname = excluded.alertname, "
+                "severity = excluded.severity, "
+                "updated_at = excluded.updated_at, payload = excluded.payload, "
+                "group_id = excluded.group_id",
+                upserts
+            )
+            conn.executemany(
+                "DELETE FROM reports WHERE fingerprint = ?", deletes
+            )
+            removed_groups = conn.executemany(
+                "DELETE FROM alert_groups WHERE group_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM reports WHERE reports.group_id = ?)",
+                [(group_id, group_id) for group_id in replaced]
+            ).rowcount
+            if self._shared:
+                # Other replicas change the tables too.
+                counts = self._count_rows()
+            else:
+                stored = {fingerprint for fingerprint, _ in existing}
+                counts = (
+                    self._report_count
+                    + sum(row[0] not in stored for row in upserts)
+                    - sum(row[0] in stored for row in deletes),
+                    self._group_count + added_groups - removed_groups
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._report_count, self._group_count = counts
+        self.commit_count += 1
+
+    def _count_rows(self) -> Tuple[int, int]:
+        """Count the reports and alert groups on the write connection."""
+        conn = self._write_conn
+        return (
+            conn.execute("SELECT count(*) FROM reports").fetchone()[0],
+            conn.execute("SELECT count(*) FROM alert_groups").fetchone()[0]
+        )
+
+
+def _index_columns(
+    fingerprint: str, report: Dict[str, Any]
+) -> Dict[str, Optional[str]]:
+    """Extract the indexed columns of a report.
+
+    Args:
+        fingerprint: Fingerprint of the report's alert.
+        report: The report.
+
+    Returns:
+        The values of ``_INDEX_COLUMNS``. ``created_at`` is normalised to
+        UTC, and an empty string for reports without one, so that every
+        report has a sort key.
+    """
+    alert_group = report.get("alert_group") or {}
+    if isinstance(alert_group, AlertGroupRecord):
+        labels = alert_group.alert_labels(report.get("alert_index", 0))
+    else:
+        labels = dict(alert_group.get("commonLabels") or {})
+        for alert in alert_group.get("alerts") or []:
+            if alert.get("fingerprint") == fingerprint:
+                labels.update(alert.get("labels") or {})
+                break
+    created_at = report.get("created_at") or ""
+    if created_at:
+        try:
+            created_at = normalize_timestamp(created_at)
+        except ValueError:
+            pass
+    return {
+        "status": report.get("status"),
+        "created_at": created_at,
+        "namespace": labels.get("namespace"),
+        "alertname": labels.get("alertname"),
+        "severity": labels.get("severity"),
+    }
+
+
+def _index_values(
+    fingerprint: str, report: Dict[str, Any]
+) -> Tuple[Optional[str], ...]:
+    """The indexed columns of a report in the order of ``_INDEX_COLUMNS``."""
+    columns = _index_columns(fingerprint, report)
+    return tuple(columns[column] for column in _INDEX_COLUMNS)
+
+
+def query_reports(
+    reports: Mapping[str, Dict[str, Any]],
+    report_query: ReportQuery,
+    load_reports: bool = True
+) -> List[ReportRow]:
+    """List reports matching a query with the best means of the store.
+
+    Args:
+        reports: One of the stores, or a plain mapping of reports keyed by
+            fingerprint.
+        report_query: Filters, order and page.
+        load_reports: Whether the reports are needed besides their indexed
+            columns. Only the SQLite store skips loading them.
+
+    Returns:
+        Up to ``limit`` reports with their indexed columns.
+    """
+    if isinstance(reports, SQLiteReportStore):
+        return reports.query(report_query, load_reports=load_reports)
+    if isinstance(reports, MemoryReportStore):
+        return reports.query(report_query)
+    return scan_reports(reports, report_query)
+
+
+def iter_reports(
+    reports: Mapping[str, Dict[str, Any]],
+    report_query: ReportQuery,
+    page_size: int = 500
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Iterate over all reports matching a query, page by page.
+
+    Only one page is held at a time, so memory stays flat however many
+    reports match. The ``limit`` of the query is ignored.
+
+    Args:
+        reports: One of the stores, or a plain mapping of reports.
+        report_query: Filters and order.
+        page_size: Number of reports loaded per page.
+
+    Yields:
+        Fingerprint and report of each matching report.
+    """
+    page_query = replace(report_query, limit=page_size)
+    while True:
+        rows = query_reports(reports, page_query)
+        for columns, report in rows:
+            if report is not None:
+                yield columns["fingerprint"], report
+        if len(rows) < page_size:
+            return
+        last = rows[-1][0]
+        page_query = replace(
+            page_query, after=(last["created_at"], last["fingerprint"])
+        )
+
+
+def scan_reports(
+    reports: Mapping[str, Dict[str, Any]], report_query: ReportQuery
+) -> List[ReportRow]:
+    """List the reports of a plain mapping matching a query.
+
+    Every report is inspected; the stores answer the same query from their
+    indexes.
+
+    Args:
+        reports: Reports keyed by fingerprint.
+        report_query: Filters, order and page.
+
+    Returns:
+        Up to ``limit`` reports with their indexed columns.
+    """
+    filters = report_query.label_filters()
+    matches = []
+    for fingerprint, report in list(reports.items()):
+        columns = _index_columns(fingerprint, report)
+        sort_key = (columns["created_at"], fingerprint)
+        if any(columns[column] != value for column, value in filters.items()):
+            continue
+        if _in_page(sort_key, report_query):
+            columns["fingerprint"] = fingerprint
+            matches.append((sort_key, columns, report))
+    matches.sort(key=lambda match: match[0], reverse=report_query.descending)
+    return [
+        (columns, report)
+        for _, columns, report in matches[:report_query.limit]
+    ]
+
+
+def _in_page(sort_key: Tuple[str, str], report_query: ReportQuery) -> bool:
+    """Whether a report's sort key lies in the time range and after the
+    previous page."""
+    created_at = sort_key[0]
+    if report_query.since is not None and created_at < report_query.since:
+        return False
+    if report_query.until is not None and created_at > report_query.until:
+        return False
+    if report_query.after is None:
+        return True
+    if report_query.descending:
+        return sort_key < report_query.after
+    return sort_key > report_query.after
+
+
+def _encode_reference(value: Any) -> Any:
+    """JSON fallback that encodes alert group records by their identifier."""
+    if isinstance(value, AlertGroupRecord):
+        return value.group_id
+    return str(value)
@@ -0,0 +1,193 @@
+"""Retries with backoff for failed analyses.
+
+Transient failures (LLM rate limiting, provider outages, network timeouts) are
+retried with exponential backoff and jitter until a per-job attempt budget is
+spent. Jobs waiting for their next attempt sit in a delay queue outside the
+scheduler, so they neither occupy a worker nor block fresh alerts.
+"""
+
+import asyncio
+import logging
+import random
+from typing import Any, Callable, Dict, Optional
+
+import openai
+
+from oncallm.jobs import AnalysisJob
+
+_logger = logging.getLogger(__name__)
+
+# HTTP status codes that signal a temporary condition on the remote side.
+_RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# Exception types that are always transient.
+_RETRYABLE_EXCEPTIONS = (
+    TimeoutError,
+    ConnectionError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class RetryableAnalysisError(Exception):
+    """Raised by a worker when a failed analysis should be attempted again."""
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Classify an analysis error as transient or fatal.
+
+    The exception chain is inspected as well, because LangChain and the
+    worker wrap provider errors.
+
+    Args:
+        error: The exception raised by the analysis.
+
+    Returns:
+        True if retrying the analysis may succeed.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, _RETRYABLE_EXCEPTIONS):
+            return True
+        # Errors already classified elsewhere, e.g. in a worker process.
+        retryable = getattr(current, "retryable", None)
+        if isinstance(retryable, bool):
+            return retryable
+        # OpenAI errors expose ``status_code``, Kubernetes errors ``status``.
+        status = getattr(current, "status_code", None)
+        if status is None:
+            status = getattr(current, "status", None)
+        if isinstance(status, int) and status in _RETRYABLE_STATUS_CODES:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class RetryPolicy:
+    """Attempt budget and backoff schedule for failed analyses."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay_seconds: float = 30.0,
+        max_delay_seconds: float = 600.0,
+        random_func: Callable[[], float] = random.random
+    ) -> None:
+        """Initialize the policy.
+
+        Args:
+            max_attempts: Total attempts per job, including the first one.
+            base_delay_seconds: Backoff before the second attempt.
+            max_delay_seconds: Upper bound for any single backoff.
+            random_func: Source of jitter in ``[0, 1)``, overridable for tests.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay_seconds = base_delay_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._random = random_func
+
+    def should_retry(self, job: AnalysisJob, error: BaseException) -> bool:
+        """Decide whether a failed job gets another attempt.
+
+        Args:
+            job: The job whose analysis failed.
+            error: The exception raised by the analysis.
+
+        Returns:
+            True if the error is transient and the budget is not spent.
+        """
+        return job.attempt < self.max_attempts and is_retryable_error(error)
+
+    def next_delay(self, attempt: int) -> float:
+        """Backoff before the attempt following ``attempt``.
+
+        Uses "equal jitter": half of the exponential delay is fixed and half
+        is random, which spreads retries of a storm without ever retrying
+        immediately after a rate limit.
+
+        Args:
+            attempt: Number of the attempt that just failed, starting at 1.
+
+        Returns:
+            Delay in seconds.
+        """
+        delay = min(
+            self.max_delay_seconds,
+            self.base_delay_seconds * (2 ** (attempt - 1))
+        )
+        return delay / 2 + self._random() * delay / 2
+
+
+class RetryQueue:
+    """Delay queue that re-submits jobs once their backoff has elapsed.
+
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, submit: Callable[[AnalysisJob], None]) -> None:
+        """Initialize the delay queue.
+
+        Args:
+            submit: Called with each job when its retry time is reached.
+        """
+        self._submit = submit
+        self._waiting: Dict[str, asyncio.TimerHandle] = {}
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self.scheduled_total = 0
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def schedule(self, job: AnalysisJob, delay_seconds: float) -> None:
+        """Re-submit a job after a delay.
+
+        Args:
+            job: The job to retry.
+            delay_seconds: Backoff before it is submitted again.
+        """
+        loop = asyncio.get_running_loop()
+        self.cancel(job.job_id)
+        self._jobs[job.job_id] = job
+        self._waiting[job.job_id] = loop.call_later(
+            delay_seconds, self._fire, job.job_id
+        )
+        self.scheduled_total += 1
+
+    def cancel(self, job_id: str) -> Optional[AnalysisJob]:
+        """Withdraw a waiting job.
+
+        Args:
+            job_id: Identifier of the job.
+
+        Returns:
+            The withdrawn job, or None if it was not waiting.
+        """
+        handle = self._waiting.pop(job_id, None)
+        if handle is None:
+            return None
+        handle.cancel()
+        return self._jobs.pop(job_id)
+
+    def close(self) -> None:
+        """Cancel every pending retry."""
+        for handle in self._waiting.values():
+            handle.cancel()
+        self._waiting.clear()
+        self._jobs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of waiting retries and retries scheduled so far."""
+        return {"waiting": len(self), "scheduled_total": self.scheduled_total}
+
+    def _fire(self, job_id: str) -> None:
+        self._waiting.pop(job_id, None)
+        job = self._jobs.pop(job_id, None)
+        if job is None:
+            return
+        try:
+            self._submit(job)
+        except Exception as e:
+            _logger.error("Failed to re-submit job %s for retry: %s", job_id, e)
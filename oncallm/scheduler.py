@@ -0,0 +1,621 @@
+"""Priority scheduling of analysis jobs.
+
+The scheduler is a drop-in replacement for the ``asyncio.Queue`` feeding the
+worker pool. Jobs are ordered by a priority class derived from the alert
+severity or from configurable label rules. Aging makes a waiting job gain one
+class every ``aging_seconds``, so low-priority work is never starved.
+
+The queue can be bounded. When it is full, a new job is either rejected with
+``asyncio.QueueFull`` or, depending on the shed policy, admitted by evicting
+a queued job, which is handed to the ``on_shed`` callback.
+
+Aging is applied without re-sorting: a job of rank ``r`` enqueued at ``t`` has
+the effective rank ``r - (now - t) / aging_seconds``. Comparing two jobs by
+effective rank is equivalent to comparing ``r * aging_seconds + t``, which does
+not depend on ``now`` and can therefore be used as a static heap key.
+
+Optionally, jobs are split into per-tenant sub-queues keyed on a label such
+as ``namespace`` or on the Alertmanager receiver. Tenants take turns by
+smooth weighted round-robin, so one noisy tenant cannot starve the others,
+and each tenant can be capped to a number of concurrently running analyses.
+Priority and aging order jobs within a tenant.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from oncallm.alerts import AlertGroup
+from oncallm.jobs import AnalysisJob
+
+_logger = logging.getLogger(__name__)
+
+# Priority classes from most to least urgent. A job's rank is its index here.
+PRIORITY_CLASSES = ("critical", "high", "warning", "info")
+
+# Maps common Alertmanager severity label values onto priority classes.
+_SEVERITY_CLASSES = {
+    "critical": "critical",
+    "page": "critical",
+    "error": "high",
+    "high": "high",
+    "major": "high",
+    "warning": "warning",
+    "warn": "warning",
+    "minor": "warning",
+    "info": "info",
+    "low": "info",
+    "none": "info",
+}
+
+# Class used when an alert has no severity or an unknown one.
+_DEFAULT_CLASS = "warning"
+
+# What to do with a new job when the queue is at its high-water mark:
+#   reject       - refuse the new job.
+#   drop-lowest  - evict the least urgent queued job if the new one is more
+#                  urgent, otherwise refuse the new job.
+#   drop-oldest  - evict the job that has been queued the longest.
+SHED_POLICIES = ("reject", "drop-lowest", "drop-oldest")
+
+# Tenant key that selects the Alertmanager receiver instead of a label.
+RECEIVER_TENANT_KEY = "receiver"
+
+# Key of the default entry in per-tenant settings.
+DEFAULT_TENANT_SETTING = "*"
+
+# Tenant name used when tenancy is disabled or the key is missing.
+_DEFAULT_TENANT = "default"
+
+
+@dataclass(frozen=True)
+class PriorityRule:
+    """Assigns a priority class to alerts carrying a given label value."""
+
+    label: str
+    value: str
+    priority_class: str
+
+
+def parse_priority_rules(spec: str) -> List[PriorityRule]:
+    """Parse label rules of the form ``label=value:class,...``.
+
+    Args:
+        spec: Comma-separated rules, e.g.
+            ``"namespace=payments:critical,team=batch:info"``.
+
+    Returns:
+        The parsed rules in the order given.
+
+    Raises:
+        ValueError: If a rule is malformed or names an unknown class.
+    """
+    rules = []
+    for raw_rule in spec.split(","):
+        raw_rule = raw_rule.strip()
+        if not raw_rule:
+            continue
+        try:
+            selector, priority_class = raw_rule.rsplit(":", 1)
+            label, value = selector.split("=", 1)
+        except ValueError:
+            raise ValueError(f"Invalid priority rule: {raw_rule!r}") from None
+        priority_class = priority_class.strip().lower()
+        if priority_class not in PRIORITY_CLASSES:
+            raise ValueError(
+                f"Unknown priority class {priority_class!r} in rule {raw_rule!r}"
+            )
+        rules.append(PriorityRule(label.strip(), value.strip(), priority_class))
+    return rules
+
+
+def parse_tenant_settings(spec: str) -> Dict[str, int]:
+    """Parse per-tenant integer settings of the form ``tenant=value,...``.
+
+    Args:
+        spec: Comma-separated settings, e.g. ``"payments=3,*=1"``, where
+            ``*`` sets the value of every tenant not listed.
+
+    Returns:
+        Mapping of tenant name to value.
+
+    Raises:
+        ValueError: If an entry is malformed or its value is negative.
+    """
+    settings = {}
+    for raw_setting in spec.split(","):
+        raw_setting = raw_setting.strip()
+        if not raw_setting:
+            continue
+        try:
+            tenant, value = raw_setting.rsplit("=", 1)
+            settings[tenant.strip()] = int(value)
+        except ValueError:
+            raise ValueError(f"Invalid tenant setting: {raw_setting!r}") from None
+        if settings[tenant.strip()] < 0:
+            raise ValueError(f"Negative tenant setting: {raw_setting!r}")
+    return settings
+
+
+def tenant_of(alert_group: AlertGroup, tenant_key: Optional[str]) -> str:
+    """Determine the tenant an alert group belongs to.
+
+    Args:
+        alert_group: The alert group to assign.
+        tenant_key: ``"receiver"``, a label name such as ``"namespace"``, or
+            None if tenancy is disabled.
+
+    Returns:
+        Name of the tenant.
+    """
+    if not tenant_key:
+        return _DEFAULT_TENANT
+    if tenant_key == RECEIVER_TENANT_KEY:
+        return alert_group.receiver or _DEFAULT_TENANT
+    value = alert_group.commonLabels.get(tenant_key)
+    if value is None and alert_group.alerts:
+        value = alert_group.alerts[0].labels.model_dump().get(tenant_key)
+    return str(value) if value else _DEFAULT_TENANT
+
+
+def classify_alert_group(
+    alert_group: AlertGroup, rules: List[PriorityRule]
+) -> str:
+    """Determine the priority class of an alert group.
+
+    Each alert is classified by the first matching label rule, falling back
+    to its ``severity`` label. The group takes the most urgent class of its
+    alerts.
+
+    Args:
+        alert_group: The alert group to classify.
+        rules: Label rules checked before the severity label.
+
+    Returns:
+        Name of the priority class.
+    """
+    best_rank = len(PRIORITY_CLASSES) - 1
+    for alert in alert_group.alerts:
+        labels: Dict[str, Any] = dict(alert_group.commonLabels)
+        labels.update(
+            (key, value)
+            for key, value in alert.labels.model_dump().items()
+            if value is not None
+        )
+        priority_class = next(
+            (
+                rule.priority_class for rule in rules
+                if labels.get(rule.label) == rule.value
+            ),
+            None
+        )
+        if priority_class is None:
+            severity = str(labels.get("severity", "")).lower()
+            priority_class = _SEVERITY_CLASSES.get(severity, _DEFAULT_CLASS)
+        best_rank = min(best_rank, PRIORITY_CLASSES.index(priority_class))
+    return PRIORITY_CLASSES[best_rank]
+
+
+class _ClassStats:
+    """Queue-wait counters for one priority class."""
+
+    def __init__(self) -> None:
+        self.enqueued = 0
+        self.dequeued = 0
+        self.shed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, wait_seconds: float) -> None:
+        self.dequeued += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+
+class _Tenant:
+    """Sub-queue and dispatch state of one tenant."""
+
+    def __init__(self, name: str, weight: int, max_concurrency: int) -> None:
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.heap: List[list] = []
+        self.queued = 0
+        self.running = 0
+        # Smooth weighted round-robin credit.
+        self.current_weight = 0
+        self.stats = _ClassStats()
+
+    def eligible(self) -> bool:
+        """Whether the tenant has a job that may start now."""
+        return self.queued > 0 and (
+            self.max_concurrency <= 0 or self.running < self.max_concurrency
+        )
+
+
+class AlertScheduler:
+    """Priority queue of analysis jobs with aging and tenant fairness.
+
+    Implements the subset of the ``asyncio.Queue`` interface used by the
+    webhook and the worker pool. Putting a job that is already queued
+    re-evaluates its priority instead of queuing it twice, which keeps
+    refreshed group jobs in the right place.
+
+    Passing the job to :meth:`task_done` releases its tenant's concurrency
+    slot; without it, tenant caps are never released.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[PriorityRule]] = None,
+        aging_seconds: float = 300.0,
+        maxsize: int = 0,
+        shed_policy: str = "reject",
+        on_shed: Optional[Callable[[AnalysisJob], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        tenant_key: Optional[str] = None,
+        tenant_weights: Optional[Dict[str, int]] = None,
+        tenant_limits: Optional[Dict[str, int]] = None
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            rules: Label rules evaluated before the severity label.
+            aging_seconds: Wait time after which a job is promoted by one
+                priority class. Zero disables aging.
+            maxsize: High-water mark for queued jobs. Zero means unbounded.
+            shed_policy: One of ``SHED_POLICIES``.
+            on_shed: Called with every queued job evicted to make room.
+            clock: Monotonic time source, overridable for tests.
+            tenant_key: ``"receiver"`` or a label name that splits jobs into
+                per-tenant sub-queues. None puts every job in one queue.
+            tenant_weights: Dispatch share per tenant, ``*`` for the rest.
+                Defaults to 1.
+            tenant_limits: Maximum concurrently running jobs per tenant,
+                ``*`` for the rest. 0 means no limit, the default.
+
+        Raises:
+            ValueError: If the shed policy is unknown.
+        """
+        if shed_policy not in SHED_POLICIES:
+            raise ValueError(f"Unknown shed policy: {shed_policy!r}")
+        self.rules = rules or []
+        self.aging_seconds = aging_seconds
+        self.maxsize = maxsize
+        self.shed_policy = shed_policy
+        self._on_shed = on_shed
+        self._clock = clock
+        self.tenant_key = tenant_key or None
+        self._tenant_weights = tenant_weights or {}
+        self._tenant_limits = tenant_limits or {}
+        self._tenants: Dict[str, _Tenant] = {}
+        self._entries: Dict[str, list] = {}
+        # job_id -> tenant of jobs handed out by get() and not yet done.
+        self._running: Dict[str, _Tenant] = {}
+        self._counter = itertools.count()
+        # Set whenever a job may have become dispatchable.
+        self._wakeup = asyncio.Event()
+        self._unfinished_tasks = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._stats = {name: _ClassStats() for name in PRIORITY_CLASSES}
+
+    def qsize(self) -> int:
+        """Number of jobs waiting in the queue."""
+        return len(self._entries)
+
+    def empty(self) -> bool:
+        """Whether no job is waiting."""
+        return not self._entries
+
+    def full(self) -> bool:
+        """Whether the queue is at its high-water mark."""
+        return 0 < self.maxsize <= len(self._entries)
+
+    def can_admit(self, job: AnalysisJob) -> bool:
+        """Whether ``put_nowait`` would accept a job right now.
+
+        Nothing is evicted; a full queue admits the job only if the shed
+        policy would make room for it.
+
+        Args:
+            job: The job to check.
+
+        Returns:
+            False if the job would be refused with ``asyncio.QueueFull``.
+        """
+        if job.job_id in self._entries or not self.full():
+            return True
+        rank = PRIORITY_CLASSES.index(
+            classify_alert_group(job.alert_group, self.rules)
+        )
+        return self._find_victim(rank) is not None
+
+    async def put(self, job: AnalysisJob) -> None:
+        """Queue a job, or re-prioritise it if it is already queued.
+
+        Args:
+            job: The job to schedule.
+
+        Raises:
+            asyncio.QueueFull: If the queue is full and the job was refused.
+        """
+        self.put_nowait(job)
+
+    def put_nowait(self, job: AnalysisJob) -> None:
+        """Queue a job, or re-prioritise it if it is already queued.
+
+        Args:
+            job: The job to schedule.
+
+        Raises:
+            asyncio.QueueFull: If the queue is full and the job was refused.
+        """
+        priority_class = classify_alert_group(job.alert_group, self.rules)
+        rank = PRIORITY_CLASSES.index(priority_class)
+        existing = self._entries.get(job.job_id)
+        if existing is not None:
+            enqueued_at = existing[3]
+            tenant = existing[5]
+            if rank >= existing[4]:
+                return
+            # Invalidate the old heap entry; it is skipped when popped.
+            existing[2] = None
+        else:
+            if self.full():
+                self._make_room(rank)
+            if self.full():
+                self._stats[priority_class].rejected += 1
+                raise asyncio.QueueFull
+            enqueued_at = self._clock()
+            tenant = self._get_tenant(tenant_of(job.alert_group, self.tenant_key))
+            tenant.queued += 1
+            tenant.stats.enqueued += 1
+            self._stats[priority_class].enqueued += 1
+            self._unfinished_tasks += 1
+            self._finished.clear()
+
+        entry = [
+            self._sort_key(rank, enqueued_at), next(self._counter), job,
+            enqueued_at, rank, tenant
+        ]
+        self._entries[job.job_id] = entry
+        heapq.heappush(tenant.heap, entry)
+        self._wakeup.set()
+
+    async def get(self) -> AnalysisJob:
+        """Wait for and remove the next job to run.
+
+        The tenant is picked by weighted round-robin among tenants below
+        their concurrency cap; within it, the most urgent job is taken.
+
+        Returns:
+            The job with the best aged priority of the selected tenant.
+        """
+        while True:
+            tenant = self._select_tenant()
+            if tenant is not None:
+                return self._pop(tenant)
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def remove(self, job_id: str) -> Optional[AnalysisJob]:
+        """Withdraw a queued job that no longer needs to run.
+
+        Args:
+            job_id: Identifier of the job.
+
+        Returns:
+            The withdrawn job, or None if it is not queued.
+        """
+        entry = self._entries.pop(job_id, None)
+        if entry is None:
+            return None
+        job = entry[2]
+        entry[2] = None
+        entry[5].queued -= 1
+        self.task_done()
+        self._stats[PRIORITY_CLASSES[entry[4]]].cancelled += 1
+        return job
+
+    def queued_jobs(self) -> List[AnalysisJob]:
+        """Jobs waiting in the queue, in no particular order."""
+        return [entry[2] for entry in self._entries.values()]
+
+    def task_done(self, job: Optional[AnalysisJob] = None) -> None:
+        """Mark a job returned by :meth:`get` as processed.
+
+        Args:
+            job: The processed job, whose tenant concurrency slot is freed.
+
+        Raises:
+            ValueError: If called more times than there were jobs.
+        """
+        if self._unfinished_tasks <= 0:
+            raise ValueError("task_done() called too many times")
+        self._unfinished_tasks -= 1
+        if self._unfinished_tasks == 0:
+            self._finished.set()
+        if job is not None:
+            tenant = self._running.pop(job.job_id, None)
+            if tenant is not None:
+                tenant.running -= 1
+                self._wakeup.set()
+
+    async def join(self) -> None:
+        """Wait until every queued job has been processed."""
+        await self._finished.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and wait-time metrics per priority class.
+
+        Returns:
+            Dictionary suitable for the JSON metrics endpoint.
+        """
+        depth = {name: 0 for name in PRIORITY_CLASSES}
+        for entry in self._entries.values():
+            depth[PRIORITY_CLASSES[entry[4]]] += 1
+
+        classes = {}
+        for name, class_stats in self._stats.items():
+            classes[name] = {
+                "queued": depth[name],
+                "enqueued_total": class_stats.enqueued,
+                "dequeued_total": class_stats.dequeued,
+                "wait_seconds_avg": (
+                    class_stats.wait_seconds_total / class_stats.dequeued
+                    if class_stats.dequeued else 0.0
+                ),
+                "wait_seconds_max": class_stats.wait_seconds_max,
+                "shed_total": class_stats.shed,
+                "rejected_total": class_stats.rejected,
+                "cancelled_total": class_stats.cancelled,
+            }
+        tenants = {}
+        for name, tenant in self._tenants.items():
+            tenants[name] = {
+                "queued": tenant.queued,
+                "running": tenant.running,
+                "weight": tenant.weight,
+                "max_concurrency": tenant.max_concurrency,
+                "enqueued_total": tenant.stats.enqueued,
+                "dequeued_total": tenant.stats.dequeued,
+                "wait_seconds_avg": (
+                    tenant.stats.wait_seconds_total / tenant.stats.dequeued
+                    if tenant.stats.dequeued else 0.0
+                ),
+                "wait_seconds_max": tenant.stats.wait_seconds_max,
+            }
+        return {
+            "queued": self.qsize(),
+            "max_size": self.maxsize,
+            "shed_policy": self.shed_policy,
+            "aging_seconds": self.aging_seconds,
+            "tenant_key": self.tenant_key,
+            "priority_classes": classes,
+            "tenants": tenants,
+        }
+
+    def priority_key(self, job: AnalysisJob) -> float:
+        """Aged priority of a job, lower is more urgent.
+
+        Uses the job's wall-clock ``enqueued_at``, so keys computed by
+        different processes are comparable, e.g. in a shared queue.
+
+        Args:
+            job: The job to rank.
+
+        Returns:
+            The static sort key the scheduler would order the job by.
+        """
+        priority_class = classify_alert_group(job.alert_group, self.rules)
+        rank = PRIORITY_CLASSES.index(priority_class)
+        return self._sort_key(rank, job.enqueued_at)
+
+    def _sort_key(self, rank: int, enqueued_at: float) -> float:
+        """Static heap key implementing linear aging."""
+        if self.aging_seconds <= 0:
+            return float(rank)
+        return rank * self.aging_seconds + enqueued_at
+
+    def _find_victim(self, incoming_rank: int) -> Optional[list]:
+        """Pick the queued entry the shed policy would evict, if any.
+
+        Args:
+            incoming_rank: Rank of the job waiting to be admitted.
+
+        Returns:
+            The heap entry to evict, or None if the job must be refused.
+        """
+        if self.shed_policy == "reject" or not self._entries:
+            return None
+        if self.shed_policy == "drop-oldest":
+            return min(self._entries.values(), key=lambda entry: entry[3])
+        # Least urgent first; among equals, the most recently queued.
+        victim = max(
+            self._entries.values(),
+            key=lambda entry: (entry[4], entry[3])
+        )
+        if victim[4] <= incoming_rank:
+            return None
+        return victim
+
+    def _make_room(self, incoming_rank: int) -> None:
+        """Evict one queued job according to the shed policy, if allowed.
+
+        The victim search is linear, but it only runs at the high-water mark.
+
+        Args:
+            incoming_rank: Rank of the job waiting to be admitted.
+        """
+        victim = self._find_victim(incoming_rank)
+        if victim is None:
+            return
+
+        job = victim[2]
+        victim[2] = None
+        del self._entries[job.job_id]
+        victim[5].queued -= 1
+        self.task_done()
+        self._stats[PRIORITY_CLASSES[victim[4]]].shed += 1
+        _logger.warning(
+            "Queue full (%d jobs), shedding alert group %s",
+            self.maxsize, job.group_key
+        )
+        if self._on_shed is not None:
+            self._on_shed(job)
+
+    def _get_tenant(self, name: str) -> _Tenant:
+        """Return the state of a tenant, creating it on first use."""
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            weight = self._tenant_weights.get(
+                name, self._tenant_weights.get(DEFAULT_TENANT_SETTING, 1)
+            )
+            max_concurrency = self._tenant_limits.get(
+                name, self._tenant_limits.get(DEFAULT_TENANT_SETTING, 0)
+            )
+            tenant = _Tenant(name, max(1, weight), max_concurrency)
+            self._tenants[name] = tenant
+        return tenant
+
+    def _select_tenant(self) -> Optional[_Tenant]:
+        """Pick the next tenant by smooth weighted round-robin.
+
+        Every eligible tenant gains its weight in credit, the richest one is
+        served and pays back the total, which interleaves tenants in
+        proportion to their weights.
+        """
+        selected = None
+        total_weight = 0
+        for tenant in self._tenants.values():
+            if not tenant.eligible():
+                continue
+            tenant.current_weight += tenant.weight
+            total_weight += tenant.weight
+            if selected is None or tenant.current_weight > selected.current_weight:
+                selected = tenant
+        if selected is not None:
+            selected.current_weight -= total_weight
+        return selected
+
+    def _pop(self, tenant: _Tenant) -> AnalysisJob:
+        """Pop the tenant's best valid heap entry and record its queue wait."""
+        while True:
+            _, _, job, enqueued_at, rank, _ = heapq.heappop(tenant.heap)
+            if job is not None:
+                break
+        del self._entries[job.job_id]
+        tenant.queued -= 1
+        tenant.running += 1
+        self._running[job.job_id] = tenant
+        wait_seconds = self._clock() - enqueued_at
+        self._stats[PRIORITY_CLASSES[rank]].record_wait(wait_seconds)
+        tenant.stats.record_wait(wait_seconds)
+        return job
@@ -0,0 +1,272 @@
+"""Work queue shared by several replicas through one SQLite database.
+
+With a single replica the in-memory scheduler owns the queue and the journal
+only backs it up. With several replicas, the database on a shared volume is
+the queue: any replica appends the jobs it receives, and every replica claims
+jobs from it when it has free workers. A claim is a lease; a replica renews
+the leases of its running jobs, so the jobs of a replica that stopped are
+claimed by another one once their leases expire.
+
+Notifications for a group that is still waiting are coalesced into the queued
+job, as the in-memory scheduler does. Jobs are claimed in order of their aged
+priority, which is computed from wall-clock times and therefore agrees across
+replicas.
+
+The database uses a rollback journal instead of WAL, because WAL relies on
+shared memory that does not work when the replicas run on different nodes.
+The volume must support POSIX file locks.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from oncallm.durable_queue import SQLiteJobJournal
+from oncallm.jobs import AnalysisJob
+
+_logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    group_key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_waiting_group_idx
+    ON jobs (group_key) WHERE lease_owner IS NULL;
+CREATE INDEX IF NOT EXISTS jobs_priority_idx ON jobs (priority);
+"""
+
+
+class SharedJobQueue(SQLiteJobJournal):
+    """Job queue on a database shared by all replicas.
+
+    Jobs are appended, leased and acked like in the journal, plus claimed by
+    :meth:`claim`. The public coroutine methods must be called from the
+    event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 900.0,
+        owner_id: Optional[str] = None,
+        max_batch_size: int = 512,
+        priority_key: Optional[Callable[[AnalysisJob], float]] = None
+    ) -> None:
+        """Initialize the queue.
+
+        Args:
+            path: SQLite database file on a volume mounted by every replica.
+            lease_seconds: How long a claimed job is reserved for its owner
+                without being renewed.
+            owner_id: Lease owner name, defaults to host name and pid.
+            max_batch_size: Upper bound of operations per transaction.
+            priority_key: Aged priority of a job, lower is claimed first.
+                Defaults to first come, first served.
+        """
+        super().__init__(
+            path,
+            lease_seconds=lease_seconds,
+            owner_id=owner_id,
+            max_batch_size=max_batch_size
+        )
+        self._priority_key = priority_key or (lambda job: job.enqueued_at)
+        self.claimed_total = 0
+
+    async def append(self, job: AnalysisJob) -> None:
+        """Queue a job, or merge it into the waiting job of its group.
+
+        A job that is already in the queue, such as a job retried by its
+        owner, is updated in place.
+
+        Args:
+            job: The job to queue.
+
+        Raises:
+            sqlite3.Error: If the transaction holding the job failed.
+        """
+        await self._submit(
+            "INSERT INTO jobs (job_id, group_key, payload, enqueued_at, priority) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET payload = excluded.payload "
+            "ON CONFLICT (group_key) WHERE lease_owner IS NULL "
+            "DO UPDATE SET payload = excluded.payload, "
+            "priority = min(priority, excluded.priority)",
+            (
+                job.job_id, job.group_key, job.model_dump_json(),
+                job.enqueued_at, self._priority_key(job)
+            )
+        )
+
+    async def claim(self, limit: int) -> List[AnalysisJob]:
+        """Lease the most urgent jobs that no live replica holds.
+
+        Args:
+            limit: Maximum number of jobs to claim.
+
+        Returns:
+            The claimed jobs, most urgent first.
+        """
+        if limit <= 0:
+            return []
+        rows = await self._run_io(self._claim_rows, limit)
+        jobs = []
+        for job_id, payload in rows:
+            try:
+                job = AnalysisJob.model_validate_json(payload)
+            except ValueError as e:
+                _logger.error("Dropping unreadable shared job %s: %s", job_id, e)
+                self.ack(job_id)
+                continue
+            # A coalesced notification keeps the id of the job it joined.
+            job.job_id = job_id
+            jobs.append(job)
+        self.claimed_total += len(jobs)
+        return jobs
+
+    def renew(self, job_ids: Iterable[str]) -> None:
+        """Extend the leases of jobs this replica still holds.
+
+        Args:
+            job_ids: Identifiers of claimed jobs that have not finished.
+        """
+        expires_at = time.time() + self.lease_seconds
+        for job_id in job_ids:
+            self._submit_nowait(
+                "UPDATE jobs SET lease_expires_at = ? "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (expires_at, job_id, self.owner_id)
+            )
+
+    async def release_owned(self) -> None:
+        """Hand the jobs of this replica back to the queue before it stops.
+
+        Jobs whose group already has a newer waiting job stay leased until
+        their lease expires.
+        """
+        await self._submit(
+            "UPDATE OR IGNORE jobs "
+            "SET lease_owner = NULL, lease_expires_at = NULL "
+            "WHERE lease_owner = ?",
+            (self.owner_id,)
+        )
+
+    async def withdraw_resolved(
+        self, group_key: str, fingerprints: Set[str]
+    ) -> int:
+        """Remove resolved alerts from the waiting job of a group.
+
+        The job is deleted once none of its alerts is left.
+
+        Args:
+            group_key: Alertmanager groupKey of the notification.
+            fingerprints: Fingerprints of the resolved alerts.
+
+        Returns:
+            The number of waiting jobs deleted.
+        """
+        return await self._run_io(self._withdraw_rows, group_key, fingerprints)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Waiting and leased jobs across all replicas."""
+        waiting, leased = await self._run_io(self._count_rows)
+        return {
+            "owner": self.owner_id,
+            "waiting": waiting,
+            "leased": leased,
+            "claimed_total": self.claimed_total,
+        }
+
+    async def replay(self) -> List[AnalysisJob]:
+        """Leave unfinished jobs in the queue.
+
+        Unlike the journal, the queue is not owned by one process: the jobs
+        of a stopped replica are claimed once their leases expire.
+
+        Returns:
+            An empty list.
+        """
+        return []
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        # Other replicas may hold the write lock on a slower network volume.
+        self._conn.execute("PRAGMA busy_timeout=15000")
+        self._conn.executescript(_SCHEMA)
+
+    def _claim_rows(self, limit: int) -> List[Tuple[str, str]]:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._conn.execute(
+                "SELECT job_id, payload FROM jobs "
+                "WHERE lease_owner IS NULL OR lease_expires_at < ? "
+                "ORDER BY priority LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET lease_owner = ?, lease_expires_at = ? "
+                "WHERE job_id = ?",
+                [
+                    (self.owner_id, now + self.lease_seconds, job_id)
+                    for job_id, _ in rows
+                ]
+            )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _withdraw_rows(self, group_key: str, fingerprints: Set[str]) -> int:
+        deleted = 0
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(
+                "SELECT job_id, payload FROM jobs "
+                "WHERE group_key = ? AND lease_owner IS NULL",
+                (group_key,)
+            ).fetchone()
+            if row is not None:
+                job_id, payload = row
+                job = AnalysisJob.model_validate_json(payload)
+                remaining = [
+                    alert for alert in job.alert_group.alerts
+                    if alert.fingerprint not in fingerprints
+                ]
+                if not remaining:
+                    self._conn.execute(
+                        "DELETE FROM jobs WHERE job_id = ?", (job_id,)
+                    )
+                    deleted = 1
+                elif len(remaining) < len(job.alert_group.alerts):
+                    job.alert_group = job.alert_group.model_copy(
+                        update={"alerts": remaining}
+                    )
+                    self._conn.execute(
+                        "UPDATE jobs SET payload = ? WHERE job_id = ?",
+                        (job.model_dump_json(), job_id)
+                    )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def _count_rows(self) -> Tuple[int, int]:
+        waiting, leased = self._conn.execute(
+            "SELECT count(*) - count(lease_owner), count(lease_owner) FROM jobs"
+        ).fetchone()
+        return waiting, leased
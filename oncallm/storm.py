@@ -0,0 +1,228 @@
+"""Micro-batching of correlated alerts during alert storms.
+
+When a node or a shared dependency fails, Alertmanager sends many groups
+within seconds, one per affected workload. With a collection window enabled,
+new jobs are buffered for a few seconds and then clustered by the first
+configured label whose value all alerts of a job share, such as the node or
+the owning workload. Each cluster is analysed once as a single merged job,
+whose result is stored on the report of every member alert.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from oncallm.alerts import AlertGroup
+from oncallm.jobs import AnalysisJob
+
+_logger = logging.getLogger(__name__)
+
+# Labels checked, in order, to correlate alerts. Node comes first because a
+# failed node affects workloads in every namespace.
+DEFAULT_CLUSTER_LABELS = (
+    "node", "deployment", "statefulset", "daemonset", "namespace"
+)
+
+# Prefix of the group key of merged jobs.
+STORM_GROUP_PREFIX = "storm:"
+
+
+def parse_cluster_labels(spec: str) -> List[str]:
+    """Parse a comma-separated list of correlation labels.
+
+    Args:
+        spec: Label names, e.g. ``"node,deployment,namespace"``.
+
+    Returns:
+        The label names in order, or the defaults if ``spec`` is empty.
+    """
+    labels = [label.strip() for label in spec.split(",") if label.strip()]
+    return labels or list(DEFAULT_CLUSTER_LABELS)
+
+
+def correlation_key(
+    alert_group: AlertGroup, cluster_labels: List[str]
+) -> Optional[str]:
+    """Find the label value that correlates an alert group with others.
+
+    Args:
+        alert_group: The alert group of a buffered job.
+        cluster_labels: Labels to check, in order of preference.
+
+    Returns:
+        ``"label=value"`` for the first label whose value every alert of the
+        group shares, or None if no such label exists.
+    """
+    alert_labels = []
+    for alert in alert_group.alerts:
+        labels: Dict[str, Any] = dict(alert_group.commonLabels)
+        labels.update(
+            (key, value)
+            for key, value in alert.labels.model_dump().items()
+            if value is not None
+        )
+        alert_labels.append(labels)
+
+    for label in cluster_labels:
+        values = {labels.get(label) for labels in alert_labels}
+        if len(values) == 1 and None not in values:
+            return f"{label}={values.pop()}"
+    return None
+
+
+def merge_jobs(key: str, jobs: List[AnalysisJob]) -> AnalysisJob:
+    """Combine the jobs of a cluster into one analysis job.
+
+    Args:
+        key: Correlation key shared by the jobs.
+        jobs: Buffered jobs in arrival order, at least two.
+
+    Returns:
+        A new job covering every alert of the cluster once.
+    """
+    groups = [job.alert_group for job in jobs]
+    first = groups[0]
+    alerts = {}
+    for group in groups:
+        for alert in group.alerts:
+            alerts[alert.fingerprint] = alert
+    label, _, value = key.partition("=")
+
+    merged_group = AlertGroup(
+        version=first.version,
+        groupKey=f"{STORM_GROUP_PREFIX}{key}:{jobs[0].job_id}",
+        truncatedAlerts=sum(group.truncatedAlerts for group in groups),
+        status=first.status,
+        receiver=first.receiver,
+        groupLabels={label: value},
+        commonLabels=_shared_items([group.commonLabels for group in groups]),
+        commonAnnotations=_shared_items(
+            [group.commonAnnotations for group in groups]
+        ),
+        externalURL=first.externalURL,
+        alerts=list(alerts.values())
+    )
+    return AnalysisJob(
+        group_key=merged_group.groupKey,
+        alert_group=merged_group,
+        enqueued_at=min(job.enqueued_at for job in jobs),
+        correlation_key=key
+    )
+
+
+def _shared_items(mappings: List[Dict[str, str]]) -> Dict[str, str]:
+    """Items present with the same value in every mapping."""
+    shared = dict(mappings[0])
+    for mapping in mappings[1:]:
+        shared = {
+            key: value for key, value in shared.items()
+            if mapping.get(key) == value
+        }
+    return shared
+
+
+class StormBatcher:
+    """Buffers new jobs for a collection window and clusters them.
+
+    The window opens with the first job buffered after a flush, so a quiet
+    system delays each job by at most ``window_seconds``. Must be used from
+    the event loop thread.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float,
+        submit: Callable[[AnalysisJob, List[AnalysisJob]], Awaitable[None]],
+        cluster_labels: Optional[List[str]] = None
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            window_seconds: How long jobs are collected before clustering.
+            submit: Coroutine called per cluster with the job to schedule
+                and the buffered jobs it replaces. For a cluster of one, the
+                job is its only member.
+            cluster_labels: Labels used to correlate jobs, in order.
+        """
+        self.window_seconds = window_seconds
+        self.cluster_labels = cluster_labels or list(DEFAULT_CLUSTER_LABELS)
+        self._submit = submit
+        self._buffer: Dict[str, AnalysisJob] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches_total = 0
+        self.merged_jobs_total = 0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._buffer
+
+    def add(self, job: AnalysisJob) -> None:
+        """Buffer a job until the current window closes.
+
+        Args:
+            job: A newly accepted job.
+        """
+        self._buffer[job.job_id] = job
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    def remove(self, job_id: str) -> Optional[AnalysisJob]:
+        """Withdraw a buffered job.
+
+        Args:
+            job_id: Identifier of the job.
+
+        Returns:
+            The withdrawn job, or None if it is not buffered.
+        """
+        return self._buffer.pop(job_id, None)
+
+    async def flush(self) -> None:
+        """Cluster the buffered jobs and submit one job per cluster."""
+        jobs = list(self._buffer.values())
+        self._buffer.clear()
+        clusters: Dict[Optional[str], List[AnalysisJob]] = {}
+        for job in jobs:
+            key = correlation_key(job.alert_group, self.cluster_labels)
+            # Jobs without a shared label are never merged.
+            cluster_id = key if key is not None else job.job_id
+            clusters.setdefault(cluster_id, []).append(job)
+
+        for cluster_id, members in clusters.items():
+            if len(members) == 1:
+                job = members[0]
+            else:
+                job = merge_jobs(cluster_id, members)
+                self.batches_total += 1
+                self.merged_jobs_total += len(members)
+                _logger.info(
+                    "Merged %d alert groups sharing %s into one analysis",
+                    len(members), cluster_id
+                )
+            try:
+                await self._submit(job, members)
+            except Exception as e:
+                _logger.error("Failed to submit alert cluster %s: %s", cluster_id, e)
+
+    def close(self) -> None:
+        """Stop the pending window without submitting its jobs."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._buffer.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Buffered jobs and merge counters."""
+        return {
+            "window_seconds": self.window_seconds,
+            "buffered": len(self),
+            "batches_total": self.batches_total,
+            "merged_jobs_total": self.merged_jobs_total,
+        }
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self.window_seconds)
+        self._flush_task = None
+        await self.flush()
@@ -2,21 +2,81 @@
 
 This module provides functionality to load and render HTML templates
 for different alert report states (processing, failed, completed).
+
+Templates are compiled once into alternating literal text and placeholder
+names, and rendered with a single join. Substituted values are HTML-escaped
+unless they are ``Markup``.
 """
 
+import html
 from pathlib import Path
-from typing import Any, Dict
+import re
+from typing import Any, Dict, List, Optional, Tuple
 import os
 
+# A {{name}} placeholder.
+_PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class Markup(str):
+    """HTML that is inserted into a template without escaping."""
+
+
+class CompiledTemplate:
+    """A template split into literal text and placeholders."""
+    
+    __slots__ = ("_literals", "_names")
+    
+    def __init__(self, template_content: str) -> None:
+        """Compile a template.
+        
+        Args:
+            template_content: Raw template content with {{placeholder}} markers.
+        """
+        parts = _PLACEHOLDER.split(template_content)
+        # Literals at even positions, placeholder names between them.
+        self._literals: Tuple[str, ...] = tuple(parts[0::2])
+        self._names: Tuple[str, ...] = tuple(parts[1::2])
+    
+    def render(self, data: Dict[str, Any]) -> str:
+        """Render the template in one pass.
+        
+        Args:
+            data: Values of the placeholders. Placeholders without a value
+                are left as they are.
+            
+        Returns:
+            Rendered HTML with data substituted.
+        """
+        literals = self._literals
+        parts = [literals[0]]
+        for index, name in enumerate(self._names):
+            if name in data:
+                value = data[name]
+                if isinstance(value, Markup):
+                    parts.append(value)
+                else:
+                    parts.append(html.escape(str(value)))
+            else:
+                parts.append(f"{{{{{name}}}}}")
+            parts.append(literals[index + 1])
+        return "".join(parts)
+
+
 class TemplateRenderer:
     """Renders HTML templates with data substitution."""
     
-    def __init__(self, template_dir: str = None) -> None:
-        """Initialize the template renderer.
+    def __init__(
+        self, template_dir: str = None, auto_reload: Optional[bool] = None
+    ) -> None:
+        """Initialize the template renderer and compile its templates.
         
         Args:
             template_dir: Directory containing HTML templates. If None, uses
                          TEMPLATE_DIR env var or defaults to project root/templates.
+            auto_reload: Recompile a template when its file changes, checked
+                on every render. If None, uses ONCALLM_TEMPLATE_AUTO_RELOAD
+                (Default: false); meant for template development.
         """
         if template_dir is None:
             template_dir = os.getenv("TEMPLATE_DIR")
@@ -24,10 +84,19 @@ class TemplateRenderer:
                 # Default to project root templates directory
                 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
                 template_dir = os.path.join(base_dir, "templates")
+        if auto_reload is None:
+            auto_reload = os.getenv(
+                "ONCALLM_TEMPLATE_AUTO_RELOAD", "false"
+            ).lower() in ("1", "true", "yes")
         
         self.template_dir = Path(template_dir)
         if not self.template_dir.exists():
             raise FileNotFoundError(f"Template directory not found: {template_dir}")
+        self.auto_reload = auto_reload
+        # template name -> (file mtime, compiled template)
+        self._compiled: Dict[str, Tuple[int, CompiledTemplate]] = {}
+        for template_path in self.template_dir.glob("*.html"):
+            self._compile(template_path.stem)
     
     def _load_template(self, template_name: str) -> str:
         """Load a template file from disk.
@@ -48,6 +117,53 @@ class TemplateRenderer:
         with open(template_path, 'r', encoding='utf-8') as f:
             return f.read()
     
+    def _compile(self, template_name: str) -> CompiledTemplate:
+        """Load and compile a template, replacing the compiled copy.
+        
+        Args:
+            template_name: Name of the template file (without .html extension).
+            
+        Returns:
+            The compiled template.
+            
+        Raises:
+            FileNotFoundError: If template file doesn't exist.
+        """
+        template_path = self.template_dir / f"{template_name}.html"
+        try:
+            mtime = template_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Template not found: {template_path}")
+        template = CompiledTemplate(self._load_template(template_name))
+        self._compiled[template_name] = (mtime, template)
+        return template
+    
+    def _template(self, template_name: str) -> CompiledTemplate:
+        """Get the compiled template, recompiling it if its file changed.
+        
+        Args:
+            template_name: Name of the template file (without .html extension).
+            
+        Returns:
+            The compiled template.
+            
+        Raises:
+            FileNotFoundError: If template file doesn't exist.
+        """
+        compiled = self._compiled.get(template_name)
+        if compiled is None:
+            return self._compile(template_name)
+        mtime, template = compiled
+        if self.auto_reload:
+            template_path = self.template_dir / f"{template_name}.html"
+            try:
+                changed = template_path.stat().st_mtime_ns != mtime
+            except FileNotFoundError:
+                changed = True
+            if changed:
+                return self._compile(template_name)
+        return template
+    
     def _render_template(self, template_content: str, data: Dict[str, Any]) -> str:
         """Render a template with data substitution.
         
@@ -56,16 +172,9 @@ class TemplateRenderer:
             data: Dictionary of data to substitute in the template.
             
         Returns:
-            Rendered HTML with data substituted.
+            Rendered HTML with data substituted and escaped.
         """
-        rendered = template_content
-        
-        # Replace all {{key}} placeholders with corresponding values.
-        for key, value in data.items():
-            placeholder = f"{{{{{key}}}}}"
-            rendered = rendered.replace(placeholder, str(value))
-        
-        return rendered
+        return CompiledTemplate(template_content).render(data)
     
     def render_processing_page(self, fingerprint: str) -> str:
         """Render the processing state page.
@@ -76,11 +185,10 @@ class TemplateRenderer:
         Returns:
             Rendered HTML for processing page.
         """
-        template = self._load_template("processing")
         data = {
             "fingerprint": fingerprint
         }
-        return self._render_template(template, data)
+        return self._template("processing").render(data)
     
     def render_failed_page(self, fingerprint: str, error_message: str) -> str:
         """Render the failed analysis page.
@@ -92,19 +200,19 @@ class TemplateRenderer:
         Returns:
             Rendered HTML for failed page.
         """
-        template = self._load_template("failed")
         data = {
             "fingerprint": fingerprint,
             "error_message": error_message
         }
-        return self._render_template(template, data)
+        return self._template("failed").render(data)
     
     def render_completed_page(
         self, 
         fingerprint: str, 
         alert_info: Dict[str, str], 
         analysis: Dict[str, Any],
-        created_at: str
+        created_at: str,
+        related_fingerprints: Optional[List[str]] = None
     ) -> str:
         """Render the completed analysis page.
         
@@ -113,12 +221,12 @@ class TemplateRenderer:
             alert_info: Dictionary containing alert information.
             analysis: Dictionary containing AI analysis results.
             created_at: Timestamp when analysis was completed.
+            related_fingerprints: Other alerts covered by the same analysis,
+                linked from the page.
             
         Returns:
             Rendered HTML for completed analysis page.
         """
-        template = self._load_template("completed")
-        
         # Prepare data for template rendering.
         data = {
             "fingerprint": fingerprint,
@@ -137,7 +245,34 @@ class TemplateRenderer:
             "solution": analysis.get("solution", "No solution provided"),
             "conclusion": analysis.get("conclusion", "No conclusion available"),
             "recommendations": analysis.get("recommendations", "No additional recommendations"),
-            "created_at": created_at
+            "created_at": created_at,
+            "related_alerts": self._render_related_alerts(
+                related_fingerprints or []
+            )
         }
         
-        return self._render_template(template, data)
+        return self._template("completed").render(data)
+    
+    def _render_related_alerts(self, fingerprints: List[str]) -> Markup:
+        """Render links to the reports of correlated alerts.
+        
+        The links are relative to the report page, so they keep any path
+        prefix the service is exposed under.
+        
+        Args:
+            fingerprints: Fingerprints of the related alerts.
+            
+        Returns:
+            HTML section, or an empty string if there are none.
+        """
+        if not fingerprints:
+            return Markup("")
+        links = "".join(
+            f'<li><a href="./{html.escape(fingerprint)}">'
+            f"{html.escape(fingerprint)}</a></li>"
+            for fingerprint in fingerprints
+        )
+        return Markup(
+            '<div class="section"><h2>🔗 Analysed Together With</h2>'
+            f"<ul>{links}</ul></div>"
+        )
@@ -1,11 +1,15 @@
 """Tests for OnCallM main API endpoints."""
 
+import asyncio
+import json
+import time
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock, AsyncMock
 
 # Assuming 'oncallm' is in PYTHONPATH and main.py defines 'app' and 'analysis_reports'
-from oncallm.main import app, _analysis_reports
+from oncallm.main import app, _analysis_reports, _deduplicator, _pending_groups, _report_pages, _started_jobs, _storm_jobs
 from oncallm.alerts import AlertGroup, Alert
 from oncallm.llm_service import OncallK8sResponse
 
@@ -18,6 +22,11 @@ def client():
 def clear_reports_before_each_test():
     """Ensure _analysis_reports is empty before each test."""
     _analysis_reports.clear()
+    _report_pages.clear()
+    _pending_groups.clear()
+    _started_jobs.clear()
+    _storm_jobs.clear()
+    _deduplicator.clear()
 
 @pytest.fixture
 def sample_alert_group_dict():
@@ -72,6 +81,539 @@ def test_webhook_success(mock_agent, mock_alert_queue, client, sample_alert_grou
     assert fingerprint in _analysis_reports
     assert _analysis_reports[fingerprint]["status"] == "processing"
 
+@pytest.fixture
+def multi_alert_group_dict(sample_alert_group_dict):
+    """Provides an AlertGroup with three member alerts."""
+    group = dict(sample_alert_group_dict)
+    base_alert = sample_alert_group_dict["alerts"][0]
+    group["alerts"] = [
+        {**base_alert, "fingerprint": f"groupfingerprint{i}"}
+        for i in range(3)
+    ]
+    return group
+
+@patch('oncallm.main._alert_queue', new_callable=lambda: AsyncMock())
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_queues_one_job_per_group(mock_agent, mock_alert_queue, client, multi_alert_group_dict):
+    """A multi-alert group is queued as a single analysis job."""
+    mock_alert_queue.put = AsyncMock()
+
+    response = client.post("/webhook", json=multi_alert_group_dict)
+
+    assert response.status_code == 200
+    assert len(response.json()["report_urls"]) == 3
+    mock_alert_queue.put.assert_awaited_once()
+    job = mock_alert_queue.put.call_args[0][0]
+    assert job.group_key == multi_alert_group_dict["groupKey"]
+    assert job.fingerprints == [f"groupfingerprint{i}" for i in range(3)]
+    for i in range(3):
+        assert _analysis_reports[f"groupfingerprint{i}"]["status"] == "processing"
+
+@patch('oncallm.main._alert_queue', new_callable=lambda: AsyncMock())
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_coalesces_queued_group(mock_agent, mock_alert_queue, client, multi_alert_group_dict):
+    """A repeat notification for a still-queued group updates the pending job."""
+    mock_alert_queue.put = AsyncMock()
+
+    client.post("/webhook", json=multi_alert_group_dict)
+    updated = dict(multi_alert_group_dict)
+    changed_alert = dict(multi_alert_group_dict["alerts"][0])
+    changed_alert["annotations"] = {"summary": "Now failing harder"}
+    updated["alerts"] = [changed_alert, multi_alert_group_dict["alerts"][1]]
+    client.post("/webhook", json=updated)
+
+    # The refreshed job is re-put so the scheduler can re-prioritise it.
+    assert mock_alert_queue.put.await_count == 2
+    first_job = mock_alert_queue.put.call_args_list[0][0][0]
+    job = mock_alert_queue.put.call_args_list[1][0][0]
+    assert job is first_job
+    assert job.fingerprints == ["groupfingerprint0", "groupfingerprint1"]
+    assert job.alert_group.alerts[0].annotations.summary == "Now failing harder"
+
+@patch('oncallm.main._alert_queue', new_callable=lambda: AsyncMock())
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_alert_dropped_from_queued_group_is_analysed_again(mock_agent, mock_alert_queue, client, multi_alert_group_dict):
+    """An alert missing from a refreshed pending job is released."""
+    from oncallm.main import _finish_job
+
+    mock_alert_queue.put = AsyncMock()
+    alerts = multi_alert_group_dict["alerts"]
+    client.post("/webhook", json=multi_alert_group_dict)
+    changed_alert = {**alerts[0], "annotations": {"summary": "Now failing harder"}}
+    client.post("/webhook", json={**multi_alert_group_dict, "alerts": [changed_alert, alerts[1]]})
+
+    assert "groupfingerprint2" not in _analysis_reports
+    job = mock_alert_queue.put.call_args[0][0]
+    del _pending_groups[job.group_key]
+    _finish_job(job, succeeded=True)
+
+    response = client.post("/webhook", json={**multi_alert_group_dict, "alerts": [alerts[2]]})
+
+    assert response.json()["message"] == "Alerts queued for analysis"
+    assert mock_alert_queue.put.call_args[0][0].fingerprints == ["groupfingerprint2"]
+    assert _analysis_reports["groupfingerprint2"]["status"] == "processing"
+
+@patch('oncallm.main._alert_queue', new_callable=lambda: AsyncMock())
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_suppresses_resent_alert(mock_agent, mock_alert_queue, client, sample_alert_group_dict):
+    """An identical re-sent notification reuses the completed report."""
+    from oncallm.jobs import build_analysis_job
+
+    mock_alert_queue.put = AsyncMock()
+    client.post("/webhook", json=sample_alert_group_dict)
+    job = mock_alert_queue.put.call_args[0][0]
+
+    # Simulate the job completing and the next repeat_interval re-send.
+    _pending_groups.clear()
+    _analysis_reports["apitestfingerprint"] = {"status": "completed"}
+    _deduplicator.mark_finished(job, succeeded=True)
+    response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Alerts already analysed or in progress"
+    assert _analysis_reports["apitestfingerprint"]["status"] == "completed"
+    mock_alert_queue.put.assert_awaited_once()
+
+@patch('oncallm.main._agent')
+def test_process_alert_fans_out_group_analysis(mock_agent, multi_alert_group_dict):
+    """One analysis produces a completed report for every alert of the group."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _process_alert
+
+    mock_agent.do_analysis.return_value = OncallK8sResponse(
+        root_cause="Shared root cause",
+        conclusion="c", diagnosis="d", summary_of_findings="s",
+        recommended_actions="a", recommendations="r", solution="fix"
+    )
+
+    _process_alert(build_analysis_job(AlertGroup(**multi_alert_group_dict)))
+
+    mock_agent.do_analysis.assert_called_once()
+    for i in range(3):
+        report = _analysis_reports[f"groupfingerprint{i}"]
+        assert report["status"] == "completed"
+        assert report["fingerprint"] == f"groupfingerprint{i}"
+        assert report["analysis"]["root_cause"] == "Shared root cause"
+    # The reports share one record of the group.
+    records = {id(_analysis_reports[f"groupfingerprint{i}"]["alert_group"]) for i in range(3)}
+    assert len(records) == 1
+    assert _analysis_reports["groupfingerprint2"]["alert_index"] == 2
+
+@patch('oncallm.main._agent')
+def test_process_alert_stores_partial_report_at_deadline(mock_agent, sample_alert_group_dict):
+    """An analysis stopped at its deadline keeps its findings as a partial report."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.llm_service import AnalysisDeadlineExceeded
+    from oncallm.main import _process_alert
+
+    partial = OncallK8sResponse(
+        root_cause="Not determined", conclusion="c", diagnosis="d",
+        summary_of_findings="get_pod_details: CrashLoopBackOff",
+        recommended_actions="a", recommendations="r", solution="s"
+    )
+    mock_agent.do_analysis.side_effect = AnalysisDeadlineExceeded(partial, 301.0)
+
+    with patch('oncallm.main._retry_queue', MagicMock()):
+        assert _process_alert(build_analysis_job(AlertGroup(**sample_alert_group_dict))) is False
+
+    report = _analysis_reports["apitestfingerprint"]
+    assert report["status"] == "partial"
+    assert report["analysis"]["summary_of_findings"] == "get_pod_details: CrashLoopBackOff"
+    assert "301s" in report["error"]
+
+@patch('oncallm.main._agent')
+def test_process_alert_notifies_completion(mock_agent, multi_alert_group_dict):
+    """A finished analysis is handed to the callback notifier once per group."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _process_alert
+
+    mock_agent.do_analysis.side_effect = ValueError("bad response")
+    notifier = MagicMock()
+
+    with patch('oncallm.main._completion_notifier', notifier), \
+            patch('oncallm.main._retry_queue', None):
+        _process_alert(build_analysis_job(AlertGroup(**multi_alert_group_dict)))
+
+    notifier.notify.assert_called_once()
+    event = notifier.notify.call_args.args[0]
+    assert event["status"] == "failed"
+    assert event["error"] == "bad response"
+    assert [r["fingerprint"] for r in event["reports"]] == [
+        f"groupfingerprint{i}" for i in range(3)
+    ]
+    assert event["reports"][0]["api_url"].endswith("/api/reports/groupfingerprint0")
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_returns_503_when_queue_full(mock_agent, client, sample_alert_group_dict, multi_alert_group_dict):
+    """A full queue pushes back on Alertmanager with Retry-After."""
+    from oncallm.scheduler import AlertScheduler
+
+    multi_alert_group_dict["groupKey"] = "{}:{alertname='Other'}"
+    with patch('oncallm.main._alert_queue', AlertScheduler(maxsize=1)):
+        assert client.post("/webhook", json=multi_alert_group_dict).status_code == 200
+        response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+    assert "apitestfingerprint" not in _analysis_reports
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_shed_job_reports_are_marked_shed(mock_agent, client, sample_alert_group_dict, multi_alert_group_dict):
+    """Jobs evicted by the shed policy leave a "shed" report behind."""
+    from oncallm.main import _shed_job
+    from oncallm.scheduler import AlertScheduler
+
+    multi_alert_group_dict["groupKey"] = "{}:{alertname='Other'}"
+    for alert in multi_alert_group_dict["alerts"]:
+        alert["labels"] = {**alert["labels"], "severity": "info"}
+    critical_alert = sample_alert_group_dict["alerts"][0]
+    critical_alert["labels"] = {**critical_alert["labels"], "severity": "critical"}
+    scheduler = AlertScheduler(maxsize=1, shed_policy="drop-lowest", on_shed=_shed_job)
+    with patch('oncallm.main._alert_queue', scheduler):
+        client.post("/webhook", json=multi_alert_group_dict)
+        response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.status_code == 200
+    assert _analysis_reports["groupfingerprint0"]["status"] == "shed"
+    assert _analysis_reports["apitestfingerprint"]["status"] == "processing"
+    assert multi_alert_group_dict["groupKey"] not in _pending_groups
+
+def test_restore_job_requeues_replayed_work(sample_alert_group_dict):
+    """Jobs replayed from the journal are queued and reported as processing."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _restore_job
+    from oncallm.scheduler import AlertScheduler
+
+    scheduler = AlertScheduler()
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    with patch('oncallm.main._alert_queue', scheduler):
+        _restore_job(job)
+
+    assert scheduler.qsize() == 1
+    assert _pending_groups[job.group_key] is job
+    assert _analysis_reports["apitestfingerprint"]["status"] == "processing"
+
+def _resolve(alert_group_dict, *fingerprints):
+    """Copy of an alert group notification with some alerts resolved."""
+    resolved = dict(alert_group_dict)
+    resolved["alerts"] = [
+        {**alert, "status": "resolved", "endsAt": "2024-01-02T10:30:00Z"}
+        if alert["fingerprint"] in fingerprints else alert
+        for alert in alert_group_dict["alerts"]
+    ]
+    if all(alert["status"] == "resolved" for alert in resolved["alerts"]):
+        resolved["status"] = "resolved"
+    return resolved
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_resolved_notification_cancels_queued_job(mock_agent, client, sample_alert_group_dict):
+    """A resolved group is withdrawn from the queue and summarised instead."""
+    from oncallm.scheduler import AlertScheduler
+
+    scheduler = AlertScheduler()
+    with patch('oncallm.main._alert_queue', scheduler):
+        client.post("/webhook", json=sample_alert_group_dict)
+        response = client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+
+    assert response.json()["message"] == "Resolved alerts recorded"
+    assert scheduler.qsize() == 0
+    assert sample_alert_group_dict["groupKey"] not in _pending_groups
+    report = _analysis_reports["apitestfingerprint"]
+    assert report["status"] == "resolved"
+    assert report["analysis"]["conclusion"] == (
+        "APITestAlert in namespace test-ns resolved after 30 minutes."
+    )
+    mock_agent.do_analysis.assert_not_called()
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_partially_resolved_group_only_analyses_firing_alerts(mock_agent, client, multi_alert_group_dict):
+    """Resolved alerts are dropped from the queued job of their group."""
+    from oncallm.scheduler import AlertScheduler
+
+    with patch('oncallm.main._alert_queue', AlertScheduler()):
+        client.post("/webhook", json=multi_alert_group_dict)
+        client.post(
+            "/webhook", json=_resolve(multi_alert_group_dict, "groupfingerprint0")
+        )
+
+    job = _pending_groups[multi_alert_group_dict["groupKey"]]
+    assert job.fingerprints == ["groupfingerprint1", "groupfingerprint2"]
+    assert _analysis_reports["groupfingerprint0"]["status"] == "resolved"
+    assert _analysis_reports["groupfingerprint1"]["status"] == "processing"
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_resolved_notification_stops_started_job(mock_agent, client, sample_alert_group_dict):
+    """A running analysis of a resolved group is asked to stop."""
+    from oncallm.jobs import build_analysis_job
+
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _started_jobs[job.job_id] = job
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+
+    with patch('oncallm.main._alert_queue', AsyncMock()):
+        client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+
+    assert job.cancelled
+    assert _analysis_reports["apitestfingerprint"]["status"] == "resolved"
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_started_job_keeps_reports_of_alerts_resolved_meanwhile(mock_agent, client, multi_alert_group_dict):
+    """The result of a started job does not overwrite a resolved report."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _store_group_reports
+
+    job = build_analysis_job(AlertGroup(**multi_alert_group_dict))
+    _started_jobs[job.job_id] = job
+    for fingerprint in job.fingerprints:
+        _analysis_reports[fingerprint] = {"status": "processing"}
+
+    with patch('oncallm.main._alert_queue', AsyncMock()):
+        client.post(
+            "/webhook", json=_resolve(multi_alert_group_dict, "groupfingerprint0")
+        )
+    _store_group_reports(job, status="completed", analysis={"root_cause": "OOM"})
+
+    assert not job.cancelled
+    assert _analysis_reports["groupfingerprint0"]["status"] == "resolved"
+    assert _analysis_reports["groupfingerprint1"]["status"] == "completed"
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_resolution_keeps_completed_analysis(mock_agent, client, sample_alert_group_dict):
+    """An alert that was already analysed keeps its report when it resolves."""
+    _analysis_reports["apitestfingerprint"] = {
+        "status": "completed", "analysis": {"root_cause": "OOM"}
+    }
+
+    with patch('oncallm.main._alert_queue', AsyncMock()):
+        client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+
+    report = _analysis_reports["apitestfingerprint"]
+    assert report["status"] == "completed"
+    assert report["analysis"]["root_cause"] == "OOM"
+    assert report["resolved_at"].startswith("2024-01-02T10:30:00")
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_buffers_jobs_in_storm_window(mock_agent, client, sample_alert_group_dict):
+    """With a storm window, new jobs wait in the batcher instead of the queue."""
+    from oncallm.scheduler import AlertScheduler
+    from oncallm.storm import StormBatcher
+
+    scheduler = AlertScheduler()
+    batcher = MagicMock(spec=StormBatcher)
+    with patch('oncallm.main._alert_queue', scheduler), \
+         patch('oncallm.main._storm_batcher', batcher):
+        response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.status_code == 200
+    batcher.add.assert_called_once()
+    assert scheduler.qsize() == 0
+    assert _pending_groups[sample_alert_group_dict["groupKey"]] is batcher.add.call_args[0][0]
+
+def test_storm_cluster_is_analysed_once_and_linked(sample_alert_group_dict, multi_alert_group_dict):
+    """A merged cluster replaces its members and links every member report."""
+    import asyncio
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _generate_report_html, _store_group_reports, _submit_storm_cluster
+    from oncallm.scheduler import AlertScheduler
+    from oncallm.storm import merge_jobs
+    from oncallm.template_renderer import TemplateRenderer
+
+    multi_alert_group_dict["groupKey"] = "{}:{alertname='Other'}"
+    members = [
+        build_analysis_job(AlertGroup(**sample_alert_group_dict)),
+        build_analysis_job(AlertGroup(**multi_alert_group_dict)),
+    ]
+    for member in members:
+        _pending_groups[member.group_key] = member
+    merged = merge_jobs("namespace=test-ns", members)
+    scheduler = AlertScheduler()
+
+    with patch('oncallm.main._alert_queue', scheduler):
+        asyncio.run(_submit_storm_cluster(merged, members))
+
+    assert scheduler.qsize() == 1
+    assert not _pending_groups
+
+    _store_group_reports(merged, status="completed", analysis={"root_cause": "Node down"})
+    report = _analysis_reports["apitestfingerprint"]
+    assert report["correlation_key"] == "namespace=test-ns"
+    assert report["related_fingerprints"] == [f"groupfingerprint{i}" for i in range(3)]
+    with patch('oncallm.main._template_renderer', TemplateRenderer()):
+        html = _generate_report_html("apitestfingerprint", report)
+    assert '<a href="./groupfingerprint0">' in html
+
+def _submit_merged_job(sample_alert_group_dict, multi_alert_group_dict, scheduler):
+    """Queue the merged job of two member groups, as a closing storm window does."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _submit_storm_cluster
+    from oncallm.storm import merge_jobs
+
+    multi_alert_group_dict["groupKey"] = "{}:{alertname='Other'}"
+    members = [
+        build_analysis_job(AlertGroup(**sample_alert_group_dict)),
+        build_analysis_job(AlertGroup(**multi_alert_group_dict)),
+    ]
+    for member in members:
+        _pending_groups[member.group_key] = member
+    merged = merge_jobs("namespace=test-ns", members)
+    with patch('oncallm.main._alert_queue', scheduler):
+        asyncio.run(_submit_storm_cluster(merged, members))
+    return merged
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_resolved_member_groups_withdraw_merged_job(mock_agent, client, sample_alert_group_dict, multi_alert_group_dict):
+    """Resolving every member group of a merged storm job withdraws it."""
+    from oncallm.scheduler import AlertScheduler
+
+    scheduler = AlertScheduler()
+    merged = _submit_merged_job(sample_alert_group_dict, multi_alert_group_dict, scheduler)
+
+    with patch('oncallm.main._alert_queue', scheduler):
+        client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+        # The merged job keeps analysing the alerts that still fire.
+        assert scheduler.qsize() == 1
+        assert merged.fingerprints == [f"groupfingerprint{i}" for i in range(3)]
+
+        client.post(
+            "/webhook",
+            json=_resolve(
+                multi_alert_group_dict,
+                *(f"groupfingerprint{i}" for i in range(3))
+            )
+        )
+
+    assert scheduler.qsize() == 0
+    assert not _storm_jobs
+    for fingerprint in ["apitestfingerprint", "groupfingerprint0", "groupfingerprint2"]:
+        assert _analysis_reports[fingerprint]["status"] == "resolved"
+    mock_agent.do_analysis.assert_not_called()
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_resolved_member_groups_withdraw_resubmitted_merged_job(mock_agent, client, sample_alert_group_dict, multi_alert_group_dict):
+    """A merged job put back after a retry is still withdrawn on resolution."""
+    from oncallm.main import _forget_storm_job, _resubmit_job
+    from oncallm.scheduler import AlertScheduler
+
+    scheduler = AlertScheduler()
+    merged = _submit_merged_job(sample_alert_group_dict, multi_alert_group_dict, scheduler)
+    # A worker takes the job, its analysis fails and the backoff elapses.
+    assert asyncio.run(scheduler.get()) is merged
+    scheduler.task_done(merged)
+    _started_jobs[merged.job_id] = merged
+    _forget_storm_job(merged)
+
+    with patch('oncallm.main._alert_queue', scheduler):
+        _resubmit_job(merged)
+        assert scheduler.qsize() == 1
+        client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+        client.post(
+            "/webhook",
+            json=_resolve(
+                multi_alert_group_dict,
+                *(f"groupfingerprint{i}" for i in range(3))
+            )
+        )
+
+    assert scheduler.qsize() == 0
+    assert not _storm_jobs
+    assert not _pending_groups
+    mock_agent.do_analysis.assert_not_called()
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_storm_window_applies_shed_policy(mock_agent, client, sample_alert_group_dict):
+    """A full queue only refuses storm jobs the shed policy cannot make room for."""
+    import copy
+    from oncallm.jobs import build_analysis_job
+    from oncallm.scheduler import AlertScheduler
+    from oncallm.storm import StormBatcher
+
+    queued = copy.deepcopy(sample_alert_group_dict)
+    queued["groupKey"] = "{}:{alertname='Queued'}"
+    queued["alerts"][0]["labels"]["severity"] = "info"
+    queued["commonLabels"]["severity"] = "info"
+    incoming = copy.deepcopy(sample_alert_group_dict)
+    incoming["alerts"][0]["labels"]["severity"] = "critical"
+    incoming["commonLabels"]["severity"] = "critical"
+
+    for shed_policy, status_code in [("reject", 503), ("drop-lowest", 200)]:
+        _pending_groups.clear()
+        _deduplicator.clear()
+        scheduler = AlertScheduler(maxsize=1, shed_policy=shed_policy)
+        scheduler.put_nowait(build_analysis_job(AlertGroup(**queued)))
+        batcher = MagicMock(spec=StormBatcher)
+        with patch('oncallm.main._alert_queue', scheduler), \
+             patch('oncallm.main._storm_batcher', batcher):
+            response = client.post("/webhook", json=incoming)
+        assert response.status_code == status_code, shed_policy
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_webhook_appends_to_shared_queue(mock_agent, client, sample_alert_group_dict):
+    """With a shared queue, jobs go to the shared queue, not the local one."""
+    from oncallm.scheduler import AlertScheduler
+
+    scheduler = AlertScheduler()
+    shared_queue = AsyncMock()
+    with patch('oncallm.main._alert_queue', scheduler), \
+         patch('oncallm.main._shared_queue', shared_queue):
+        response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.status_code == 200
+    shared_queue.append.assert_awaited_once()
+    assert scheduler.qsize() == 0
+    assert not _pending_groups
+    report = _analysis_reports["apitestfingerprint"]
+    assert report["status"] == "processing"
+    assert report["content_hash"]
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+def test_shared_report_suppresses_resent_alert(mock_agent, client, sample_alert_group_dict):
+    """A job queued by another replica is recognised from its report."""
+    shared_queue = AsyncMock()
+    with patch('oncallm.main._alert_queue', AsyncMock()), \
+         patch('oncallm.main._shared_queue', shared_queue):
+        client.post("/webhook", json=sample_alert_group_dict)
+        # Another replica knows the alert only from the shared report.
+        _deduplicator.clear()
+        response = client.post("/webhook", json=sample_alert_group_dict)
+
+    assert response.json()["message"] == "Alerts already analysed or in progress"
+    shared_queue.append.assert_awaited_once()
+
+def test_metrics_endpoint_exposes_queue_stats(client):
+    """The /metrics endpoint reports scheduler metrics per priority class."""
+    from oncallm.scheduler import AlertScheduler
+
+    with patch('oncallm.main._alert_queue', AlertScheduler()):
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    queue_stats = response.json()["queue"]
+    assert queue_stats["queued"] == 0
+    assert set(queue_stats["priority_classes"]) == {"critical", "high", "warning", "info"}
+
+def test_metrics_endpoint_exposes_report_store_occupancy(client):
+    """The /metrics endpoint reports the size of the report store."""
+    from oncallm.scheduler import AlertScheduler
+
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+    with patch('oncallm.main._alert_queue', AlertScheduler()):
+        response = client.get("/metrics")
+
+    report_stats = response.json()["reports"]
+    assert report_stats["entries"] == 1
+    assert report_stats["bytes"] > 0
+    assert set(report_stats["evicted_total"]) == {"size", "ttl", "stale_processing"}
+
 def test_health_check(client):
     """Test the /health endpoint."""
     response = client.get("/health")
@@ -132,7 +674,91 @@ def test_get_reports_with_data(mock_agent, mock_alert_queue, client, sample_aler
     report = json_response["reports"][0]
     assert report["fingerprint"] == fingerprint
     assert report["status"] == "completed"
-    assert report["created_at"] == "2024-01-02T10:00:00Z"
+    assert report["created_at"] == "2024-01-02T10:00:00+00:00"
+
+def _store_listed_reports():
+    for i, namespace in enumerate(["payments", "search", "payments"]):
+        _analysis_reports[f"fp-{i}"] = {
+            "status": "completed",
+            "created_at": f"2024-01-0{i + 1}T10:00:00",
+            "fingerprint": f"fp-{i}",
+            "alert_group": {"commonLabels": {"namespace": namespace}, "alerts": []},
+        }
+
+def test_get_reports_pages_with_cursor(client):
+    """Test that /reports pages newest first and hands out a cursor."""
+    _store_listed_reports()
+
+    first = client.get("/reports", params={"limit": 2}).json()
+    second = client.get(
+        "/reports", params={"limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+
+    assert [r["fingerprint"] for r in first["reports"]] == ["fp-2", "fp-1"]
+    assert [r["fingerprint"] for r in second["reports"]] == ["fp-0"]
+    assert second["next_cursor"] is None
+
+def test_get_reports_filters_and_projects_fields(client):
+    """Test label filters and the fields parameter of /reports."""
+    _store_listed_reports()
+
+    response = client.get(
+        "/reports",
+        params={"namespace": "payments", "sort": "created_at",
+                "fields": "fingerprint,namespace"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["reports"] == [
+        {"fingerprint": "fp-0", "namespace": "payments"},
+        {"fingerprint": "fp-2", "namespace": "payments"},
+    ]
+
+def test_export_streams_full_reports_as_ndjson(client):
+    """Test that /reports/export returns every matching report, oldest first."""
+    _store_listed_reports()
+    _analysis_reports["fp-0"]["analysis"] = {"root_cause": "OOM"}
+
+    response = client.get("/reports/export", params={"namespace": "payments"})
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["fingerprint"] for line in lines] == ["fp-0", "fp-2"]
+    assert lines[0]["analysis"] == {"root_cause": "OOM"}
+    assert lines[0]["alert_group"]["commonLabels"] == {"namespace": "payments"}
+
+@pytest.mark.parametrize("since, until, expected", [
+    ("2024-01-02T10:00:00Z", None, ["fp-2", "fp-1"]),
+    ("2024-01-02T11:00:00+01:00", "2024-01-02T12:00:00+02:00", ["fp-1"]),
+    ("2024-01-02T10:00:00.000001Z", None, ["fp-2"]),
+])
+def test_get_reports_filters_by_time_in_utc(client, since, until, expected):
+    """Test that since and until are compared as instants, not strings."""
+    _store_listed_reports()
+    params = {"since": since}
+    if until is not None:
+        params["until"] = until
+
+    response = client.get("/reports", params=params)
+
+    assert [r["fingerprint"] for r in response.json()["reports"]] == expected
+
+@pytest.mark.parametrize("params", [
+    {"sort": "status"},
+    {"fields": "fingerprint,secret"},
+    {"cursor": "not-a-cursor"},
+    {"since": "yesterday"},
+    {"until": "2024-13-01"},
+])
+def test_get_reports_rejects_invalid_parameters(client, params):
+    """Test that /reports answers 400 on unknown sort, fields, time or cursor."""
+    response = client.get("/reports", params=params)
+    assert response.status_code == 400
+
+def test_export_rejects_invalid_time_bound(client):
+    """Test that /reports/export answers 400 on a time that cannot be parsed."""
+    response = client.get("/reports/export", params={"since": "yesterday"})
+    assert response.status_code == 400
 
 @patch('oncallm.main._alert_queue', new_callable=lambda: AsyncMock())
 @patch('oncallm.main._agent', new_callable=lambda: MagicMock())
@@ -224,6 +850,227 @@ def test_get_report_html_processing_state(mock_template_renderer, client):
     assert response.status_code == 200
     assert "Processing..." in response.text
 
+@patch('oncallm.main._template_renderer')
+def test_finished_report_page_is_rendered_once(mock_template_renderer, client, sample_alert_group_dict):
+    """Test that finished pages are cached and revalidated with ETags."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _store_group_reports
+
+    mock_template_renderer.render_completed_page.return_value = "<html>Done</html>"
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _store_group_reports(job, status="completed", analysis={"root_cause": "OOM"})
+
+    first = client.get("/report/apitestfingerprint")
+    second = client.get(
+        "/report/apitestfingerprint",
+        headers={"If-None-Match": first.headers["etag"]}
+    )
+
+    assert first.status_code == 200
+    assert first.text == "<html>Done</html>"
+    assert first.headers["etag"] == _analysis_reports["apitestfingerprint"]["page_etag"]
+    assert "max-age" in first.headers["cache-control"]
+    assert second.status_code == 304
+    assert second.content == b""
+    mock_template_renderer.render_completed_page.assert_called_once()
+
+@patch('oncallm.main._agent', new_callable=lambda: MagicMock())
+@patch('oncallm.main._template_renderer')
+def test_report_stored_on_event_loop_is_rendered_on_first_request(mock_template_renderer, mock_agent, client, sample_alert_group_dict):
+    """Test that reports stored by the webhook are not rendered on the loop."""
+    from oncallm.scheduler import AlertScheduler
+
+    mock_template_renderer.render_completed_page.return_value = "<html>Resolved</html>"
+    with patch('oncallm.main._alert_queue', AlertScheduler()):
+        client.post("/webhook", json=sample_alert_group_dict)
+        client.post(
+            "/webhook", json=_resolve(sample_alert_group_dict, "apitestfingerprint")
+        )
+    assert "page_etag" not in _analysis_reports["apitestfingerprint"]
+    mock_template_renderer.render_completed_page.assert_not_called()
+
+    first = client.get("/report/apitestfingerprint")
+    second = client.get(
+        "/report/apitestfingerprint",
+        headers={"If-None-Match": first.headers["etag"]}
+    )
+
+    assert first.text == "<html>Resolved</html>"
+    assert not first.headers["etag"].startswith("W/")
+    assert second.status_code == 304
+    mock_template_renderer.render_completed_page.assert_called_once()
+
+@patch('oncallm.main._template_renderer')
+def test_finished_report_page_is_stored_compressed(mock_template_renderer, client, sample_alert_group_dict):
+    """Test that finished pages are compressed once and served as stored."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _store_group_reports
+
+    page = "<html>" + "Root cause: OOM. " * 200 + "</html>"
+    mock_template_renderer.render_completed_page.return_value = page
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _store_group_reports(job, status="completed", analysis={"root_cause": "OOM"})
+
+    with patch('oncallm.page_cache.compress') as mock_compress:
+        compressed = client.get(
+            "/report/apitestfingerprint", headers={"Accept-Encoding": "gzip"}
+        )
+        plain = client.get(
+            "/report/apitestfingerprint", headers={"Accept-Encoding": "identity"}
+        )
+    mock_compress.assert_not_called()
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.text == page
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    assert "content-encoding" not in plain.headers
+    assert plain.text == page
+
+def test_reports_listing_is_compressed(client):
+    """Test that large JSON responses are compressed."""
+    for i in range(50):
+        _analysis_reports[f"fp-{i}"] = {"status": "completed", "created_at": f"2024-01-01T10:00:{i:02d}"}
+
+    response = client.get("/reports", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()["reports"]) == 50
+
+@patch('oncallm.main._template_renderer')
+def test_processing_report_page_is_not_cached(mock_template_renderer, client):
+    """Test that the processing page is neither cached nor tagged."""
+    _analysis_reports["processing-fingerprint"] = {"status": "processing"}
+    mock_template_renderer.render_processing_page.return_value = "<html>...</html>"
+
+    response = client.get("/report/processing-fingerprint")
+
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+
+def test_report_events_end_for_finished_report(client):
+    """Test that the status stream of a finished report ends at once."""
+    _analysis_reports["done-fingerprint"] = {"status": "completed"}
+
+    response = client.get("/report/done-fingerprint/events")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert 'event: status\ndata: {"status": "completed"}' in response.text
+    assert client.get("/report/missing/events").status_code == 404
+
+def test_report_events_push_status_transition(sample_alert_group_dict):
+    """Test that storing a report wakes up its status stream."""
+    import threading
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _report_status_events, _store_group_reports
+
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+
+    async def scenario():
+        stream = _report_status_events("apitestfingerprint", keepalive_seconds=5)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        threading.Thread(
+            target=_store_group_reports, args=(job,), kwargs={"status": "failed"}
+        ).start()
+        received.append(await asyncio.wait_for(stream.__anext__(), 1))
+        return received
+
+    received = asyncio.run(scenario())
+
+    assert '"processing"' in received[1]
+    assert '"failed"' in received[2]
+
+def test_report_events_push_agent_progress():
+    """Test that agent steps are sent before the status of the report."""
+    from oncallm.main import _report_events, _report_status_events
+
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+
+    async def scenario():
+        stream = _report_status_events("apitestfingerprint", keepalive_seconds=5)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        _report_events.publish_progress(
+            ["apitestfingerprint"], {"type": "tool_call", "tool": "get_pod_details"}
+        )
+        received.append(await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+        return received
+
+    try:
+        received = asyncio.run(scenario())
+    finally:
+        _report_events.clear_progress(["apitestfingerprint"])
+
+    assert received[2].startswith("event: progress\n")
+    assert '"get_pod_details"' in received[2]
+
+def _completed_analysis():
+    return OncallK8sResponse(
+        root_cause="rc", conclusion="c", diagnosis="d", summary_of_findings="s",
+        recommended_actions="a", recommendations="r", solution="fix"
+    ).model_dump()
+
+def test_api_report_returns_analysis_and_alert(client, sample_alert_group_dict):
+    """Test the JSON report API and its conditional requests."""
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _store_group_reports
+
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _store_group_reports(job, status="completed", analysis=_completed_analysis())
+
+    response = client.get("/api/reports/apitestfingerprint")
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["status"] == "completed"
+    assert report["analysis"]["solution"] == "fix"
+    assert report["alert"]["labels"]["instance"] == "api-instance"
+    assert report["report_url"].endswith("/report/apitestfingerprint")
+    assert "page_etag" not in report
+    assert response.headers["etag"].startswith('W/"')
+    assert "last-modified" in response.headers
+
+    by_etag = client.get(
+        "/api/reports/apitestfingerprint",
+        headers={"If-None-Match": response.headers["etag"]}
+    )
+    by_date = client.get(
+        "/api/reports/apitestfingerprint",
+        headers={"If-Modified-Since": response.headers["last-modified"]}
+    )
+    assert by_etag.status_code == 304
+    assert by_date.status_code == 304
+    assert client.get("/api/reports/missing").status_code == 404
+
+def test_api_report_wait_blocks_until_analysis_completes(client, sample_alert_group_dict):
+    """Test that ``wait`` returns as soon as a processing report is stored."""
+    import threading
+    from oncallm.jobs import build_analysis_job
+    from oncallm.main import _store_group_reports
+
+    job = build_analysis_job(AlertGroup(**sample_alert_group_dict))
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+    timer = threading.Timer(
+        0.2, _store_group_reports, args=(job,),
+        kwargs={"status": "completed", "analysis": _completed_analysis()}
+    )
+    timer.start()
+
+    started = time.monotonic()
+    response = client.get("/api/reports/apitestfingerprint?wait=10")
+
+    assert response.json()["status"] == "completed"
+    assert time.monotonic() - started < 5
+
+def test_api_report_wait_times_out_with_current_state(client):
+    """Test that ``wait`` returns the pending report once it runs out."""
+    _analysis_reports["apitestfingerprint"] = {"status": "processing"}
+
+    response = client.get("/api/reports/apitestfingerprint?wait=0.1")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "processing"
+
 def test_get_report_html_not_found(client):
     """Test the HTML report endpoint for non-existent report."""
     response = client.get("/report/non-existent-fingerprint")
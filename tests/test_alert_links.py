@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from typing import Any, Dict
-from unittest.mock import AsyncMock, patch
+from unittest.mock import ANY, AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
@@ -340,6 +340,7 @@ def test_process_alert_function(
         sample_alert_with_fingerprint: Sample alert data.
         sample_analysis_response: Sample analysis response.
     """
+    from oncallm.jobs import build_analysis_job
     from oncallm.main import _process_alert
     
     # Setup mock agent.
@@ -351,10 +352,12 @@ def test_process_alert_function(
     fingerprint = "test123fingerprint"
     
     with patch("oncallm.main._analysis_reports") as mock_reports:
-        _process_alert(fingerprint, alert_group)
+        _process_alert(build_analysis_job(alert_group))
         
         # Verify agent was called correctly.
-        mock_agent.do_analysis.assert_called_once_with(alert_group)
+        mock_agent.do_analysis.assert_called_once_with(
+            alert_group, should_stop=ANY, on_step=ANY
+        )
         
         # Verify report was stored.
         mock_reports.__setitem__.assert_called_once()
@@ -374,6 +377,7 @@ def test_process_alert_handles_errors(
         mock_agent: Mocked global agent instance.
         sample_alert_with_fingerprint: Sample alert data.
     """
+    from oncallm.jobs import build_analysis_job
     from oncallm.main import _process_alert
     
     # Setup mock to raise an error.
@@ -383,7 +387,7 @@ def test_process_alert_handles_errors(
     fingerprint = "test123fingerprint"
     
     with patch("oncallm.main._analysis_reports") as mock_reports:
-        _process_alert(fingerprint, alert_group)
+        _process_alert(build_analysis_job(alert_group))
         
         # Verify error was handled and stored.
         mock_reports.__setitem__.assert_called_once()
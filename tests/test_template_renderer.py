@@ -6,7 +6,7 @@ import os
 from pathlib import Path
 from typing import Dict, Any
 
-from oncallm.template_renderer import TemplateRenderer
+from oncallm.template_renderer import Markup, TemplateRenderer
 
 
 @pytest.fixture
@@ -103,6 +103,14 @@ def test_render_processing_page(temp_template_dir: str) -> None:
     assert "<title>Processing</title>" in result
 
 
+def test_processing_page_uses_relative_event_stream_url() -> None:
+    """The shipped page subscribes relative to itself, so path prefixes work."""
+    renderer = TemplateRenderer()
+    html = renderer.render_processing_page("abc123")
+    assert 'new EventSource("./abc123/events")' in html
+    assert '"/report/' not in html
+
+
 def test_render_failed_page(temp_template_dir: str) -> None:
     """Test rendering failed page."""
     renderer = TemplateRenderer(temp_template_dir)
@@ -192,8 +200,46 @@ def test_template_with_special_characters(temp_template_dir: str) -> None:
     data = {"message": "Alert: <script>alert('test')</script>"}
     
     result = renderer._render_template(template_content, data)
-    # Note: This is basic string substitution, not HTML escaping.
-    assert "Alert: <script>alert('test')</script>" in result
+    assert result == "Message: Alert: &lt;script&gt;alert(&#x27;test&#x27;)&lt;/script&gt;"
+
+
+def test_markup_is_not_escaped(temp_template_dir: str) -> None:
+    """Test that values marked as HTML are inserted as they are."""
+    renderer = TemplateRenderer(temp_template_dir)
+    
+    result = renderer._render_template("{{section}}", {"section": Markup("<ul></ul>")})
+    assert result == "<ul></ul>"
+
+
+def test_render_failed_page_escapes_error(temp_template_dir: str) -> None:
+    """Test that error messages cannot inject markup into the page."""
+    renderer = TemplateRenderer(temp_template_dir)
+    
+    result = renderer.render_failed_page("test456", "<img src=x onerror=alert(1)>")
+    
+    assert "<img" not in result
+    assert "Error: &lt;img src=x onerror=alert(1)&gt;" in result
+
+
+def test_templates_are_compiled_once(temp_template_dir: str) -> None:
+    """Test that renders do not read the template file again."""
+    renderer = TemplateRenderer(temp_template_dir, auto_reload=False)
+    template_path = Path(temp_template_dir) / "processing.html"
+    template_path.write_text("<h1>Changed {{fingerprint}}</h1>")
+    
+    assert "Processing Alert test123" in renderer.render_processing_page("test123")
+
+
+def test_auto_reload_recompiles_changed_template(temp_template_dir: str) -> None:
+    """Test that a changed template file is picked up with auto reload."""
+    renderer = TemplateRenderer(temp_template_dir, auto_reload=True)
+    renderer.render_processing_page("test123")
+    template_path = Path(temp_template_dir) / "processing.html"
+    template_path.write_text("<h1>Changed {{fingerprint}}</h1>")
+    stat = template_path.stat()
+    os.utime(template_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    
+    assert renderer.render_processing_page("test123") == "<h1>Changed test123</h1>"
 
 
 def test_multiple_placeholder_replacements(temp_template_dir: str) -> None:
@@ -0,0 +1,67 @@
+"""Tests for the shared alert group records."""
+
+from datetime import datetime
+
+from oncallm.alert_records import compact_alert_group, load_alert_group
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+
+
+def _make_group(summary="Pod is crash looping") -> AlertGroup:
+    return AlertGroup(
+        version="4",
+        groupKey="group-1",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={"alertname": "PodCrashLooping"},
+        commonLabels={"namespace": "payments"},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(
+                    alertname="PodCrashLooping", namespace="payments",
+                    pod=f"api-{i}", severity="critical"
+                ),
+                annotations=AlertAnnotation(summary=summary),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{i}"
+            )
+            for i in range(3)
+        ]
+    )
+
+
+def test_same_group_shares_one_record():
+    record = compact_alert_group(_make_group())
+
+    assert compact_alert_group(_make_group()) is record
+    assert compact_alert_group(_make_group(summary="changed")) is not record
+
+
+def test_label_strings_are_interned():
+    record = compact_alert_group(_make_group())
+    first, second = (dict(alert.labels) for alert in record.alerts[:2])
+
+    assert first["severity"] is second["severity"]
+
+
+def test_record_round_trips_through_json():
+    alert_group = _make_group()
+    record = compact_alert_group(alert_group)
+    data = record.to_dict()
+
+    assert data["groupKey"] == "group-1"
+    assert data["alerts"][1]["labels"]["pod"] == "api-1"
+    # Labels without a value are left out.
+    assert "service" not in data["alerts"][1]["labels"]
+    assert AlertGroup(**data).alerts[2].fingerprint == "fp-2"
+    assert record.alert_labels(1)["pod"] == "api-1"
+    assert record.alert_labels(1)["namespace"] == "payments"
+
+
+def test_loaded_record_reuses_live_record():
+    record = compact_alert_group(_make_group())
+
+    assert load_alert_group(record.group_id, "not json") is record
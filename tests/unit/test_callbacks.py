@@ -0,0 +1,153 @@
+"""Tests for the outbound completion callbacks."""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from typing import Iterator, List
+
+import pytest
+
+from oncallm.callbacks import CompletionNotifier, parse_callback_urls
+from oncallm.retry import RetryPolicy
+
+
+class _CallbackServer:
+    """Local HTTP endpoint answering with scripted status codes."""
+
+    def __init__(self) -> None:
+        self.requests: List[dict] = []
+        self.statuses: List[int] = []
+        received = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                received.requests.append(json.loads(body))
+                status = received.statuses.pop(0) if received.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/hook"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def server() -> Iterator[_CallbackServer]:
+    server = _CallbackServer()
+    yield server
+    server.close()
+
+
+def _fast_retries(max_attempts: int = 3) -> RetryPolicy:
+    return RetryPolicy(
+        max_attempts=max_attempts, base_delay_seconds=0.01, max_delay_seconds=0.01
+    )
+
+
+async def _settle(notifier: CompletionNotifier, events: int = 1) -> None:
+    """Wait until ``events`` events were delivered or dead-lettered."""
+    for _ in range(500):
+        await asyncio.sleep(0.01)
+        stats = notifier.stats()
+        if stats["delivered"] + stats["dead_lettered"] >= events:
+            return
+
+
+def test_parse_callback_urls():
+    assert parse_callback_urls(" http://a/hook, ,http://b/hook ") == [
+        "http://a/hook", "http://b/hook"
+    ]
+
+
+def test_events_from_worker_threads_are_batched(server):
+    notifier = CompletionNotifier(
+        [server.url], batch_size=10, batch_window_seconds=0.2
+    )
+
+    async def scenario():
+        notifier.start()
+        workers = [
+            threading.Thread(target=notifier.notify, args=({"group_key": str(i)},))
+            for i in range(3)
+        ]
+        for worker in workers:
+            worker.start()
+        await _settle(notifier, events=3)
+        await notifier.close()
+
+    asyncio.run(scenario())
+
+    assert len(server.requests) == 1
+    assert sorted(e["group_key"] for e in server.requests[0]["events"]) == ["0", "1", "2"]
+    assert notifier.stats()["delivered"] == 3
+
+
+def test_transient_failures_are_retried(server):
+    server.statuses = [503, 429]
+    notifier = CompletionNotifier([server.url], retry_policy=_fast_retries())
+
+    async def scenario():
+        notifier.start()
+        notifier.notify({"group_key": "g"})
+        await _settle(notifier)
+        await notifier.close()
+
+    asyncio.run(scenario())
+
+    assert len(server.requests) == 3
+    assert notifier.stats()["delivered"] == 1
+
+
+def test_rejected_delivery_is_dead_lettered(server, tmp_path):
+    server.statuses = [400]
+    dead_letters = tmp_path / "dead-letter.ndjson"
+    notifier = CompletionNotifier(
+        [server.url],
+        retry_policy=_fast_retries(),
+        dead_letter_path=str(dead_letters)
+    )
+
+    async def scenario():
+        notifier.start()
+        notifier.notify({"group_key": "g"})
+        await _settle(notifier)
+        await notifier.close()
+
+    asyncio.run(scenario())
+
+    # Client errors are not retried.
+    assert len(server.requests) == 1
+    entry = json.loads(dead_letters.read_text())
+    assert entry["reason"] == "HTTP 400"
+    assert entry["url"] == server.url
+    assert entry["events"] == [{"group_key": "g"}]
+
+
+def test_unreachable_endpoint_is_dead_lettered(tmp_path):
+    dead_letters = tmp_path / "dead-letter.ndjson"
+    notifier = CompletionNotifier(
+        ["http://127.0.0.1:9/hook"],
+        retry_policy=_fast_retries(max_attempts=2),
+        dead_letter_path=str(dead_letters)
+    )
+
+    async def scenario():
+        notifier.start()
+        notifier.notify({"group_key": "g"})
+        await _settle(notifier)
+        await notifier.close()
+
+    asyncio.run(scenario())
+
+    assert notifier.stats()["dead_lettered"] == 1
+    assert json.loads(dead_letters.read_text())["events"] == [{"group_key": "g"}]
@@ -0,0 +1,62 @@
+"""Tests for negotiated response compression."""
+
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from oncallm.compression import (
+    CompressionMiddleware, available_encodings, compress, negotiate_encoding
+)
+
+
+def test_negotiation_follows_quality_then_server_preference():
+    encodings = ("br", "zstd", "gzip")
+
+    assert negotiate_encoding("gzip, br", encodings) == "br"
+    assert negotiate_encoding("br;q=0.5, gzip", encodings) == "gzip"
+    assert negotiate_encoding("br;q=0, *", encodings) == "zstd"
+    assert negotiate_encoding("identity", encodings) is None
+    assert negotiate_encoding(None, encodings) is None
+
+
+def test_configured_encodings(monkeypatch):
+    monkeypatch.setenv("ONCALLM_COMPRESSION_ENCODINGS", "gzip")
+
+    assert available_encodings() == ("gzip",)
+
+
+def test_gzip_round_trip():
+    body = b"<html>" + b"report " * 200 + b"</html>"
+
+    assert gzip.decompress(compress(body, "gzip")) == body
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("x")
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_large_responses(monkeypatch):
+    monkeypatch.setenv("ONCALLM_COMPRESSION_ENCODINGS", "gzip")
+    client = _client()
+
+    large = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.text == "x" * 1000
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in identity.headers
@@ -0,0 +1,125 @@
+"""Tests for alert notification deduplication."""
+
+from datetime import datetime
+
+import pytest
+
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.dedup import AlertDeduplicator, alert_content_hash
+from oncallm.jobs import build_analysis_job
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _make_alert(fingerprint: str = "fp-1", summary: str = "Pod crashing") -> Alert:
+    return Alert(
+        status="firing",
+        labels=AlertLabel(alertname="PodCrashLooping", namespace="default"),
+        annotations=AlertAnnotation(summary=summary),
+        startsAt=datetime(2024, 1, 1, 12, 0, 0),
+        generatorURL="http://prometheus.example.com",
+        fingerprint=fingerprint
+    )
+
+
+def _make_group(*alerts: Alert) -> AlertGroup:
+    return AlertGroup(
+        version="4",
+        groupKey="{}:{alertname='PodCrashLooping'}",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=list(alerts)
+    )
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def deduplicator(clock: FakeClock) -> AlertDeduplicator:
+    return AlertDeduplicator(completed_ttl_seconds=60, clock=clock)
+
+
+def test_content_hash_changes_with_annotations():
+    """Changing an annotation produces a different content hash."""
+    assert alert_content_hash(_make_alert()) == alert_content_hash(_make_alert())
+    assert alert_content_hash(_make_alert()) != alert_content_hash(
+        _make_alert(summary="Pod still crashing")
+    )
+
+
+def test_new_alert_is_not_duplicate(deduplicator):
+    assert not deduplicator.is_duplicate(_make_alert())
+
+
+def test_in_flight_alert_is_duplicate(deduplicator):
+    """An identical alert attaches to the queued job."""
+    deduplicator.mark_in_flight(build_analysis_job(_make_group(_make_alert())))
+
+    assert deduplicator.is_duplicate(_make_alert())
+    assert not deduplicator.is_duplicate(_make_alert(summary="changed"))
+
+
+def test_completed_alert_reused_within_ttl(deduplicator, clock):
+    """A successful analysis is reused until the TTL expires."""
+    job = build_analysis_job(_make_group(_make_alert()))
+    deduplicator.mark_in_flight(job)
+    deduplicator.mark_finished(job, succeeded=True)
+
+    clock.now += 59
+    assert deduplicator.is_duplicate(_make_alert())
+    clock.now += 2
+    assert not deduplicator.is_duplicate(_make_alert())
+
+
+def test_failed_analysis_is_not_reused(deduplicator):
+    """A re-sent notification after a failure triggers a new analysis."""
+    job = build_analysis_job(_make_group(_make_alert()))
+    deduplicator.mark_in_flight(job)
+    deduplicator.mark_finished(job, succeeded=False)
+
+    assert not deduplicator.is_duplicate(_make_alert())
+
+
+def test_finished_job_keeps_newer_in_flight_entry(deduplicator):
+    """Finishing an old job does not release a newer job's alerts."""
+    old_job = build_analysis_job(_make_group(_make_alert()))
+    new_job = build_analysis_job(_make_group(_make_alert(summary="changed")))
+    deduplicator.mark_in_flight(old_job)
+    deduplicator.mark_in_flight(new_job)
+    deduplicator.mark_finished(old_job, succeeded=False)
+
+    assert deduplicator.is_duplicate(_make_alert(summary="changed"))
+
+
+def test_released_alert_is_not_reused(deduplicator):
+    """An alert dropped from a queued job is analysed again when re-sent."""
+    job = build_analysis_job(_make_group(_make_alert()))
+    deduplicator.mark_in_flight(job)
+    deduplicator.release(job, job.fingerprints)
+
+    assert not deduplicator.is_duplicate(_make_alert())
+
+
+def test_resolved_alert_is_forgotten(deduplicator):
+    """An alert that fires again after resolving is a new incident."""
+    job = build_analysis_job(_make_group(_make_alert()))
+    deduplicator.mark_in_flight(job)
+    deduplicator.mark_finished(job, succeeded=True)
+    deduplicator.forget(_make_alert().fingerprint)
+
+    assert not deduplicator.is_duplicate(_make_alert())
@@ -0,0 +1,159 @@
+"""Tests for the SQLite job journal."""
+
+import asyncio
+from datetime import datetime
+import threading
+
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.durable_queue import SQLiteJobJournal
+from oncallm.jobs import AnalysisJob, build_analysis_job
+
+
+def _make_job(index: int) -> AnalysisJob:
+    alert_group = AlertGroup(
+        version="4",
+        groupKey=f"group-{index}",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(alertname="TestAlert", namespace="default"),
+                annotations=AlertAnnotation(summary=f"alert {index}"),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{index}"
+            )
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+def _replay(path: str) -> list:
+    async def scenario():
+        journal = SQLiteJobJournal(path)
+        await journal.start()
+        jobs = await journal.replay()
+        await journal.close()
+        return jobs
+    return asyncio.run(scenario())
+
+
+def test_appended_jobs_survive_restart(tmp_path):
+    path = str(tmp_path / "queue.db")
+
+    async def scenario():
+        journal = SQLiteJobJournal(path)
+        await journal.start()
+        for i in range(3):
+            await journal.append(_make_job(i))
+        await journal.close()
+
+    asyncio.run(scenario())
+    jobs = _replay(path)
+
+    assert [job.group_key for job in jobs] == ["group-0", "group-1", "group-2"]
+    assert jobs[0].alert_group.alerts[0].annotations.summary == "alert 0"
+
+
+def test_acked_jobs_are_not_replayed(tmp_path):
+    path = str(tmp_path / "queue.db")
+
+    async def scenario():
+        journal = SQLiteJobJournal(path)
+        await journal.start()
+        done, running = _make_job(0), _make_job(1)
+        await journal.append(done)
+        await journal.append(running)
+        journal.lease(done.job_id)
+        journal.ack(done.job_id)
+        # A job that was leased but never acked, e.g. the pod was OOM killed.
+        journal.lease(running.job_id)
+        await journal.close()
+
+    asyncio.run(scenario())
+
+    assert [job.group_key for job in _replay(path)] == ["group-1"]
+
+
+def test_appending_same_job_updates_payload(tmp_path):
+    path = str(tmp_path / "queue.db")
+
+    async def scenario():
+        journal = SQLiteJobJournal(path)
+        await journal.start()
+        job = _make_job(0)
+        await journal.append(job)
+        job.alert_group = _make_job(5).alert_group
+        await journal.append(job)
+        await journal.close()
+
+    asyncio.run(scenario())
+    jobs = _replay(path)
+
+    assert len(jobs) == 1
+    assert jobs[0].fingerprints == ["fp-5"]
+
+
+def test_concurrent_appends_are_group_committed(tmp_path):
+    """Concurrent appends share transactions instead of one commit each."""
+    path = str(tmp_path / "queue.db")
+
+    async def scenario():
+        journal = SQLiteJobJournal(path)
+        await journal.start()
+        await asyncio.gather(*(journal.append(_make_job(i)) for i in range(2000)))
+        commits = journal.commit_count
+        await journal.close()
+        return commits
+
+    commits = asyncio.run(scenario())
+
+    assert commits < 100
+    assert len(_replay(path)) == 2000
+
+
+def test_running_job_survives_graceful_shutdown(tmp_path, monkeypatch):
+    """A job still running at shutdown is replayed after the restart."""
+    from unittest.mock import MagicMock
+
+    from oncallm import main
+
+    path = str(tmp_path / "queue.db")
+    monkeypatch.setenv("ONCALLM_QUEUE_BACKEND", "sqlite")
+    monkeypatch.setenv("ONCALLM_QUEUE_PATH", path)
+    # Closing the notifier yields to the event loop during the shutdown.
+    monkeypatch.setenv("ONCALLM_CALLBACK_URLS", "http://127.0.0.1:9/hook")
+    # The lifespan replaces these globals; restore them afterwards.
+    for name in (
+        "_alert_queue", "_executor", "_analysis_semaphore", "_job_journal",
+        "_retry_queue", "_storm_batcher", "_template_renderer", "_agent",
+        "_shared_queue", "_analysis_reports", "_completion_notifier",
+    ):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    release = threading.Event()
+    agent = MagicMock()
+    agent.do_analysis.side_effect = lambda *args, **kwargs: release.wait(5)
+    monkeypatch.setattr(main, "OncallmAgent", lambda: agent)
+    monkeypatch.setattr(main, "_started_jobs", {})
+    monkeypatch.setattr(main, "_pending_groups", {})
+
+    async def scenario():
+        async with main._lifespan(main.app):
+            await main.webhook(_make_job(0).alert_group)
+            for _ in range(100):
+                if agent.do_analysis.called:
+                    break
+                await asyncio.sleep(0.01)
+            assert agent.do_analysis.called
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+
+    assert [job.group_key for job in _replay(path)] == ["group-0"]
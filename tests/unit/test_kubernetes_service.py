@@ -74,7 +74,7 @@ def test_get_pod_details_success(
 
     result = service.get_pod_details(namespace, pod_name)
 
-    mock_k8s_client_v1.read_namespaced_pod.assert_called_once_with(name=pod_name, namespace=namespace)
+    mock_k8s_client_v1.read_namespaced_pod.assert_called_once_with(name=pod_name, namespace=namespace, _request_timeout=None)
     assert result["name"] == "test-pod"
     assert result["namespace"] == "default"
     assert result["status"] == "Running"
@@ -103,7 +103,7 @@ def test_get_pod_details_api_exception(
 
     result = service.get_pod_details(namespace, pod_name)
 
-    mock_k8s_client_v1.read_namespaced_pod.assert_called_once_with(name=pod_name, namespace=namespace)
+    mock_k8s_client_v1.read_namespaced_pod.assert_called_once_with(name=pod_name, namespace=namespace, _request_timeout=None)
     assert isinstance(result, dict)
     assert "error" in result
     assert "status_code" in result
@@ -135,7 +135,7 @@ def test_get_service_details_success(mock_apps_v1_api, mock_core_v1_api, mock_lo
     service = KubernetesService()
     result = service.get_service_details("default", "test-service")
 
-    mock_k8s_client_v1.read_namespaced_service.assert_called_once_with(name="test-service", namespace="default")
+    mock_k8s_client_v1.read_namespaced_service.assert_called_once_with(name="test-service", namespace="default", _request_timeout=None)
     assert result["name"] == "test-service"
     assert result["namespace"] == "default"
     assert result["cluster_ip"] == "10.0.0.100"
@@ -174,7 +174,7 @@ def test_get_pod_logs_success(mock_apps_v1_api, mock_core_v1_api, mock_load_kube
     service = KubernetesService()
     result = service.get_pod_logs("default", "test-pod")
 
-    mock_k8s_client_v1.read_namespaced_pod_log.assert_called_once_with(name="test-pod", namespace="default", container=None, tail_lines=100)
+    mock_k8s_client_v1.read_namespaced_pod_log.assert_called_once_with(name="test-pod", namespace="default", container=None, tail_lines=100, _request_timeout=None)
     assert result == expected_logs
 
 @patch('kubernetes.config.load_kube_config')
@@ -230,8 +230,8 @@ def test_list_pods_for_service_success(mock_apps_v1_api, mock_core_v1_api, mock_
     service = KubernetesService()
     result = service.list_pods_for_service("default", "test-service")
 
-    mock_k8s_client_v1.read_namespaced_service.assert_called_once_with(name="test-service", namespace="default")
-    mock_k8s_client_v1.list_namespaced_pod.assert_called_once_with(namespace="default", label_selector="app=my-app")
+    mock_k8s_client_v1.read_namespaced_service.assert_called_once_with(name="test-service", namespace="default", _request_timeout=None)
+    mock_k8s_client_v1.list_namespaced_pod.assert_called_once_with(namespace="default", label_selector="app=my-app", _request_timeout=None)
     assert len(result) == 2
     assert result[0]["name"] == "pod1"
     assert result[1]["name"] == "pod2"
@@ -293,7 +293,7 @@ def test_get_deployment_details_success(mock_apps_v1_api, mock_core_v1_api, mock
     service = KubernetesService()
     result = service.get_deployment_details("default", "test-deployment")
 
-    mock_k8s_client_apps_v1.read_namespaced_deployment.assert_called_once_with(name="test-deployment", namespace="default")
+    mock_k8s_client_apps_v1.read_namespaced_deployment.assert_called_once_with(name="test-deployment", namespace="default", _request_timeout=None)
     assert result["name"] == "test-deployment"
     assert result["namespace"] == "default"
     assert result["replicas"]["desired"] == 3
@@ -1,9 +1,12 @@
 import pytest
 from unittest.mock import MagicMock, patch, ANY
 from datetime import datetime
+import time
+
+from langchain_core.messages import AIMessage, ToolMessage
 
 # Assuming 'oncallm' is in PYTHONPATH
-from oncallm.llm_service import OncallmAgent
+from oncallm.llm_service import AnalysisCancelled, AnalysisDeadlineExceeded, OncallmAgent
 from oncallm.alerts import AlertGroup, Alert, AlertAnnotation, AlertLabel, OncallK8sResponse # For creating test AlertGroup
 
 # Mock for KubernetesService if its methods are called during OncallmAgent setup
@@ -77,7 +80,8 @@ def test_oncallm_agent_setup_agent(
         model=ANY, # or specific model if you want to assert 'gpt-4.1'
         temperature=ANY, # or 0.4
         openai_api_base=ANY, # os.getenv("LLM_API_BASE")
-        max_tokens=ANY # or 1024
+        max_tokens=ANY, # or 1024
+        timeout=ANY
     )
 
     # Verify tools were created (5 tools expected)
@@ -142,20 +146,21 @@ def test_do_analysis(
         'messages': [MagicMock()], # Placeholder for messages
         'structured_response': OncallK8sResponse(**mock_response_data) # This is what should be returned
     }
-    mock_agent_executor.invoke.return_value = mock_invoke_result
+    mock_agent_executor.stream.return_value = iter([mock_invoke_result])
 
     # The debug_request_to_string method should also be testable, but here we focus on do_analysis
     # For simplicity, we assume debug_request_to_string works as expected.
 
     result = agent_instance.do_analysis(minimal_alert_group)
 
-    mock_agent_executor.invoke.assert_called_once_with(
+    mock_agent_executor.stream.assert_called_once_with(
         {"messages": [ANY]}, # Check that content is a HumanMessage with string content
-        config={"callbacks": [agent_instance.langfuse_handler]}
+        config={"callbacks": [agent_instance.langfuse_handler]},
+        stream_mode="values"
     )
 
     # Check that the HumanMessage content is a JSON string containing the alert data
-    invoked_call_args = mock_agent_executor.invoke.call_args[0][0]
+    invoked_call_args = mock_agent_executor.stream.call_args[0][0]
     human_message_content = invoked_call_args['messages'][0].content
     import json
     parsed_content = json.loads(human_message_content)
@@ -168,3 +173,98 @@ def test_do_analysis(
     assert isinstance(result, OncallK8sResponse)
     assert result.root_cause == "Test Root Cause"
     assert result.conclusion == "Test Conclusion"
+
+
+def _agent_with_stream(states, analysis_timeout):
+    """Build an agent whose graph yields ``states`` slowly."""
+    closed = []
+
+    def slow_stream(*args, **kwargs):
+        try:
+            for state in states:
+                yield state
+                time.sleep(0.02)
+        finally:
+            closed.append(True)
+
+    agent_instance = OncallmAgent.__new__(OncallmAgent)
+    agent_instance.agent = MagicMock()
+    agent_instance.agent.stream.side_effect = slow_stream
+    agent_instance.langfuse_handler = MagicMock()
+    agent_instance.analysis_timeout = analysis_timeout
+    return agent_instance, closed
+
+
+def test_do_analysis_stops_at_deadline_with_partial_report(minimal_alert_group):
+    """The graph is stopped at the deadline and its findings are kept."""
+    tool_call = AIMessage(content="Checking the pod first.")
+    tool_result = ToolMessage(
+        content="status: CrashLoopBackOff", name="get_pod_details",
+        tool_call_id="call-1"
+    )
+    states = [
+        {"messages": [tool_call]},
+        {"messages": [tool_call, tool_result]},
+        {"messages": [tool_call, tool_result, AIMessage(content="never reached")]},
+    ]
+    agent_instance, closed = _agent_with_stream(states, analysis_timeout=0.01)
+
+    with pytest.raises(AnalysisDeadlineExceeded) as exc_info:
+        agent_instance.do_analysis(minimal_alert_group)
+
+    assert closed == [True]
+    partial = exc_info.value.partial_analysis
+    assert "get_pod_details: status: CrashLoopBackOff" in partial.summary_of_findings
+    assert partial.diagnosis == "Checking the pod first."
+
+
+def test_do_analysis_without_deadline_returns_structured_response(minimal_alert_group):
+    response = OncallK8sResponse(
+        root_cause="rc", conclusion="c", diagnosis="d", summary_of_findings="s",
+        recommended_actions="a", recommendations="r", solution="fix"
+    )
+    states = [{"messages": []}, {"messages": [], "structured_response": response}]
+    agent_instance, _ = _agent_with_stream(states, analysis_timeout=None)
+
+    assert agent_instance.do_analysis(minimal_alert_group) is response
+
+
+def test_do_analysis_stops_when_cancelled(minimal_alert_group):
+    """``should_stop`` cancels the analysis after the current step."""
+    states = [{"messages": []}, {"messages": []}]
+    agent_instance, closed = _agent_with_stream(states, analysis_timeout=None)
+
+    with pytest.raises(AnalysisCancelled):
+        agent_instance.do_analysis(minimal_alert_group, should_stop=lambda: True)
+
+    assert closed == [True]
+
+
+def test_do_analysis_reports_each_step(minimal_alert_group):
+    """``on_step`` receives the agent's reasoning, tool calls and results."""
+    call = AIMessage(
+        content="Checking the pod first.",
+        tool_calls=[{"name": "get_pod_details", "args": {"pod": "web-1"}, "id": "call-1"}]
+    )
+    result = ToolMessage(
+        content="status: CrashLoopBackOff", name="get_pod_details",
+        tool_call_id="call-1"
+    )
+    response = OncallK8sResponse(
+        root_cause="rc", conclusion="c", diagnosis="d", summary_of_findings="s",
+        recommended_actions="a", recommendations="r", solution="fix"
+    )
+    states = [
+        {"messages": [call]},
+        {"messages": [call, result], "structured_response": response},
+    ]
+    agent_instance, _ = _agent_with_stream(states, analysis_timeout=None)
+    steps = []
+
+    agent_instance.do_analysis(minimal_alert_group, on_step=steps.append)
+
+    assert [step["type"] for step in steps] == ["reasoning", "tool_call", "tool_result"]
+    assert steps[0]["text"] == "Checking the pod first."
+    assert steps[1]["tool"] == "get_pod_details"
+    assert steps[1]["arguments"] == '{"pod": "web-1"}'
+    assert steps[2]["chars"] == len("status: CrashLoopBackOff")
@@ -0,0 +1,44 @@
+"""Tests for the cache of rendered report pages."""
+
+from oncallm.page_cache import ReportPageCache, etag_matches, page_etag
+
+
+def test_page_is_served_for_its_report_version():
+    cache = ReportPageCache()
+    page = cache.put("fp-1", b"<html>v1</html>")
+
+    assert cache.get("fp-1", page.etag) is page
+    assert cache.get("fp-1", '"other"') is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_page_rendered_for_another_version_keeps_its_etag():
+    cache = ReportPageCache()
+    page = cache.put("fp-1", b"<html>v2</html>", version='"v1"')
+
+    assert cache.get("fp-1", '"v1"') is page
+    assert page.etag == page_etag(b"<html>v2</html>")
+
+
+def test_byte_limit_evicts_least_recently_used_pages():
+    cache = ReportPageCache(max_bytes=20)
+    first = cache.put("a", b"x" * 10)
+    cache.put("b", b"x" * 10)
+    cache.get("a", first.etag)
+    cache.put("c", b"x" * 10)
+
+    assert cache.get("b", page_etag(b"x" * 10)) is None
+    assert cache.get("a", first.etag) is first
+    assert cache.stats()["bytes"] == 20
+
+
+def test_if_none_match_comparison():
+    etag = page_etag(b"page")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"stale", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"stale"', etag)
+    assert not etag_matches(None, etag)
+    assert etag_matches(etag, f"W/{etag}")
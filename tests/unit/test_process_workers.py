@@ -0,0 +1,161 @@
+"""Tests for running analyses in worker processes."""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from oncallm.alerts import (
+    Alert,
+    AlertAnnotation,
+    AlertGroup,
+    AlertLabel,
+    OncallK8sResponse,
+)
+from oncallm.llm_service import AnalysisCancelled, AnalysisDeadlineExceeded
+from oncallm import process_workers
+from oncallm.process_workers import (
+    ProcessPoolAgent,
+    WorkerAnalysisError,
+    _run_analysis,
+    _unpack_result,
+)
+from oncallm.retry import is_retryable_error
+
+
+def _make_response(root_cause: str = "rc") -> OncallK8sResponse:
+    return OncallK8sResponse(
+        root_cause=root_cause, conclusion="c", diagnosis="d",
+        summary_of_findings="s", recommended_actions="a",
+        recommendations="r", solution="fix"
+    )
+
+
+@pytest.fixture
+def alert_group() -> AlertGroup:
+    return AlertGroup(
+        version="4",
+        groupKey="worker-group",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(alertname="TestAlert", namespace="default"),
+                annotations=AlertAnnotation(),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint="worker-fp"
+            )
+        ]
+    )
+
+
+@pytest.mark.parametrize("outcome, expected", [
+    (_make_response("Disk full"), AnalysisDeadlineExceeded),
+    (AnalysisCancelled(), AnalysisCancelled),
+    (TimeoutError("LLM timed out"), WorkerAnalysisError),
+])
+def test_worker_outcomes_round_trip(alert_group, outcome, expected):
+    """Worker results are rebuilt into the exceptions the API process expects."""
+    worker_agent = MagicMock()
+    if isinstance(outcome, OncallK8sResponse):
+        worker_agent.do_analysis.side_effect = AnalysisDeadlineExceeded(outcome, 42.0)
+    else:
+        worker_agent.do_analysis.side_effect = outcome
+
+    with patch("oncallm.process_workers._worker_agent", worker_agent):
+        result = _run_analysis(alert_group.model_dump_json(), None)
+
+    with pytest.raises(expected) as exc_info:
+        _unpack_result(result)
+    if expected is AnalysisDeadlineExceeded:
+        assert exc_info.value.partial_analysis.root_cause == "Disk full"
+        assert exc_info.value.elapsed_seconds == 42.0
+
+
+def test_worker_failure_keeps_retry_classification(alert_group):
+    worker_agent = MagicMock()
+    worker_agent.do_analysis.side_effect = TimeoutError("LLM timed out")
+    with patch("oncallm.process_workers._worker_agent", worker_agent):
+        result = _run_analysis(alert_group.model_dump_json(), None)
+
+    assert result == {"status": "failed", "error": "LLM timed out", "retryable": True}
+    assert is_retryable_error(WorkerAnalysisError("LLM timed out", True))
+    assert not is_retryable_error(WorkerAnalysisError("bad output", False))
+
+
+def test_completed_analysis_is_returned(alert_group):
+    worker_agent = MagicMock()
+    worker_agent.do_analysis.return_value = _make_response("OOM")
+    with patch("oncallm.process_workers._worker_agent", worker_agent):
+        result = _run_analysis(alert_group.model_dump_json(), None)
+
+    assert _unpack_result(result).root_cause == "OOM"
+
+
+def test_cancellation_reaches_the_worker(alert_group):
+    """A cancelled job sets the shared stop event polled by the worker."""
+    def slow_analysis(alert_group, should_stop):
+        while not should_stop():
+            time.sleep(0.01)
+        raise AnalysisCancelled()
+
+    worker_agent = MagicMock()
+    worker_agent.do_analysis.side_effect = slow_analysis
+    agent = ProcessPoolAgent.__new__(ProcessPoolAgent)
+    agent.poll_interval_seconds = 0.01
+    agent._manager = MagicMock()
+    agent._manager.Event.side_effect = threading.Event
+    agent._pool = ThreadPoolExecutor(max_workers=1)
+    cancelled = threading.Event()
+    threading.Timer(0.05, cancelled.set).start()
+
+    with patch("oncallm.process_workers._worker_agent", worker_agent):
+        with pytest.raises(AnalysisCancelled):
+            agent.do_analysis(alert_group, should_stop=cancelled.is_set)
+    agent._pool.shutdown(wait=True)
+
+
+def test_pool_is_replaced_when_a_worker_is_killed(alert_group, tmp_path):
+    """A killed worker fails its own analysis; the next one gets a new pool."""
+    marker = tmp_path / "killed"
+
+    def init_worker():
+        def analyse(alert_group, should_stop=None):
+            if not marker.exists():
+                marker.touch()
+                os.kill(os.getpid(), signal.SIGKILL)
+            return _make_response("OOM")
+
+        process_workers._worker_agent = MagicMock()
+        process_workers._worker_agent.do_analysis.side_effect = analyse
+
+    agent = ProcessPoolAgent.__new__(ProcessPoolAgent)
+    agent.processes = 1
+    agent.poll_interval_seconds = 0.05
+    # Forked, so the workers run the initializer patched below.
+    agent._mp_context = multiprocessing.get_context("fork")
+    agent._pool_lock = threading.Lock()
+    with patch("oncallm.process_workers._init_worker", init_worker):
+        agent._pool = agent._start_pool()
+        broken_pool = agent._pool
+        try:
+            with pytest.raises(WorkerAnalysisError) as exc_info:
+                agent.do_analysis(alert_group)
+            assert exc_info.value.retryable
+            assert agent._pool is not broken_pool
+
+            assert agent.do_analysis(alert_group).root_cause == "OOM"
+        finally:
+            agent._pool.shutdown(wait=True)
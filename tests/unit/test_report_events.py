@@ -0,0 +1,50 @@
+"""Tests for the notifications of report changes."""
+
+import asyncio
+import threading
+
+from oncallm.report_events import ReportEvents
+
+
+def test_publish_from_another_thread_wakes_subscriber():
+    events = ReportEvents()
+
+    async def scenario():
+        changed = events.subscribe("fp-1")
+        other = events.subscribe("fp-2")
+        threading.Thread(target=events.publish, args=("fp-1",)).start()
+        await asyncio.wait_for(changed.wait(), 1)
+        return other.is_set()
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_unsubscribed_stream_is_forgotten():
+    events = ReportEvents()
+
+    async def scenario():
+        changed = events.subscribe("fp-1")
+        count = events.subscriber_count()
+        events.unsubscribe("fp-1", changed)
+        events.publish("fp-1")
+        return count, changed.is_set()
+
+    assert asyncio.run(scenario()) == (1, False)
+    assert events.subscriber_count() == 0
+
+
+def test_progress_is_shared_by_the_group_and_cleared():
+    events = ReportEvents()
+
+    async def scenario():
+        changed = events.subscribe("fp-2")
+        events.publish_progress(["fp-1", "fp-2"], {"type": "reasoning"})
+        await asyncio.wait_for(changed.wait(), 1)
+
+    asyncio.run(scenario())
+    events.publish_progress(["fp-1", "fp-2"], {"type": "tool_call"})
+
+    assert events.progress("fp-2") == [{"type": "reasoning"}, {"type": "tool_call"}]
+    assert events.progress("fp-1", 1) == [{"type": "tool_call"}]
+    events.clear_progress(["fp-1", "fp-2"])
+    assert events.progress("fp-1") == []
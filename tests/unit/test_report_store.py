@@ -0,0 +1,530 @@
+"""Tests for the report stores."""
+
+from datetime import datetime
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from oncallm.alert_records import compact_alert_group
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.report_store import (
+    MemoryReportStore,
+    ReportQuery,
+    SQLiteReportStore,
+    estimate_report_size,
+    iter_reports,
+    normalize_timestamp,
+    scan_reports,
+)
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_least_recently_used_report_is_evicted():
+    store = MemoryReportStore(max_entries=2)
+    store["a"] = {"status": "completed"}
+    store["b"] = {"status": "completed"}
+    store["a"]  # Reading marks "a" as recently used.
+    store["c"] = {"status": "completed"}
+
+    assert list(store) == ["a", "c"]
+    assert store.stats()["evicted_total"]["size"] == 1
+
+
+def test_processing_reports_are_not_evicted():
+    """Reports of queued or running jobs survive eviction."""
+    store = MemoryReportStore(max_entries=2)
+    store["queued"] = {"status": "processing"}
+    store["a"] = {"status": "completed"}
+    store["b"] = {"status": "completed"}
+
+    assert list(store) == ["queued", "b"]
+
+    store["running"] = {"status": "processing"}
+    store["c"] = {"status": "completed"}
+
+    # Only processing reports are left besides the newest one.
+    assert list(store) == ["queued", "running", "c"]
+
+
+def test_eviction_follows_reads_and_completions():
+    """Reads refresh reports and completed reports become evictable."""
+    store = MemoryReportStore(max_entries=3)
+    store["job"] = {"status": "processing"}
+    store["a"] = {"status": "completed"}
+    store["b"] = {"status": "completed"}
+    store["a"]
+    store["c"] = {"status": "completed"}
+
+    assert list(store) == ["job", "a", "c"]
+
+    store["job"] = {"status": "completed"}
+    store["a"]
+    store["d"] = {"status": "completed"}
+
+    assert list(store) == ["job", "a", "d"]
+
+def test_byte_limit_evicts_oldest_reports():
+    report = {"status": "completed", "analysis": {"root_cause": "x" * 100}}
+    size = estimate_report_size(report)
+    store = MemoryReportStore(max_bytes=size * 2)
+    for fingerprint in ("a", "b", "c"):
+        store[fingerprint] = dict(report)
+
+    assert list(store) == ["b", "c"]
+    assert store.stats()["bytes"] == size * 2
+
+
+def test_overwrite_updates_byte_count():
+    store = MemoryReportStore()
+    store["a"] = {"status": "processing"}
+    store["a"] = {"status": "completed", "analysis": {"root_cause": "OOM"}}
+    del store["a"]
+
+    assert store.stats()["bytes"] == 0
+    assert len(store) == 0
+
+
+def test_expired_reports_are_dropped():
+    clock = _FakeClock()
+    store = MemoryReportStore(ttl_seconds=60, clock=clock)
+    store["old"] = {"status": "completed"}
+    clock.now += 30
+    store["new"] = {"status": "completed"}
+    clock.now += 40
+
+    assert "old" not in store
+    assert store.get("old") is None
+    assert [fingerprint for fingerprint, _ in store.items()] == ["new"]
+    assert store.reap() == 0
+    assert store.stats()["evicted_total"]["ttl"] == 1
+
+
+def test_stale_processing_reports_are_reaped_unless_active():
+    clock = _FakeClock()
+    store = MemoryReportStore(processing_ttl_seconds=600, clock=clock)
+    store["lost"] = {"status": "processing"}
+    store["queued"] = {"status": "processing"}
+    store["done"] = {"status": "completed"}
+    clock.now += 601
+
+    assert store.reap(active={"queued"}) == 1
+    assert sorted(store) == ["done", "queued"]
+    assert store.stats()["evicted_total"]["stale_processing"] == 1
+
+
+def _report(status, namespace="payments", fingerprint="fp-1"):
+    return {
+        "status": status,
+        "created_at": "2024-01-01T12:00:00",
+        "fingerprint": fingerprint,
+        "alert_group": {
+            "commonLabels": {"namespace": namespace},
+            "alerts": [{
+                "fingerprint": fingerprint,
+                "labels": {"alertname": "PodCrashLooping", "severity": "critical"},
+            }],
+        },
+    }
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / "shared.db")
+    writer = SQLiteReportStore(path, shared=True)
+    reader = SQLiteReportStore(path, shared=True)
+
+    writer["fp-1"] = {"status": "processing"}
+    writer["fp-1"] = {"status": "completed", "analysis": {"root_cause": "OOM"}}
+    writer["fp-2"] = {"status": "failed", "error": "boom"}
+    writer.flush()
+
+    assert reader["fp-1"]["analysis"] == {"root_cause": "OOM"}
+    assert "fp-2" in reader
+    assert reader.get("missing") is None
+    assert len(reader) == 2
+    assert [fingerprint for fingerprint, _ in reader.items()] == ["fp-1", "fp-2"]
+
+    del reader["fp-2"]
+    reader.flush()
+    assert list(writer) == ["fp-1"]
+    writer.clear()
+    assert len(reader) == 0
+    writer.close()
+    reader.close()
+
+
+def test_sqlite_store_reads_its_buffered_writes(tmp_path):
+    store = SQLiteReportStore(str(tmp_path / "reports.db"))
+    for i in range(200):
+        store[f"fp-{i}"] = {"status": "processing"}
+    store["fp-0"] = {"status": "completed"}
+    del store["fp-1"]
+
+    assert store["fp-0"]["status"] == "completed"
+    assert "fp-1" not in store
+    assert len(store) == 199
+    # Writes are group-committed rather than one transaction each.
+    assert store.stats()["commits_total"] < 200
+    store.close()
+
+
+
+def test_sqlite_store_counts_rows_without_scanning(tmp_path):
+    path = str(tmp_path / "reports.db")
+    record, reports = _group_reports()
+    store = SQLiteReportStore(path)
+    for fingerprint, report in reports.items():
+        store[fingerprint] = report
+    store["fp-1"] = {"status": "completed"}
+    store["other"] = {"status": "failed"}
+    store.flush()
+    assert (store.stats()["entries"], store.stats()["alert_groups"]) == (4, 1)
+
+    del store["fp-0"]
+    del store["fp-2"]
+    store.flush()
+    assert (store.stats()["entries"], store.stats()["alert_groups"]) == (2, 0)
+    store.close()
+
+    reopened = SQLiteReportStore(path, shared=True)
+    replica = SQLiteReportStore(path, shared=True)
+    assert reopened.stats()["entries"] == 2
+    replica["fp-3"] = {"status": "processing"}
+    replica.flush()
+    reopened["fp-4"] = {"status": "processing"}
+    reopened.flush()
+    assert reopened.stats()["entries"] == 4
+    reopened.close()
+    replica.close()
+
+
+def test_sqlite_store_retries_failed_commits(tmp_path):
+    store = SQLiteReportStore(str(tmp_path / "reports.db"))
+    failures = [sqlite3.OperationalError("disk I/O error")] * 2
+    write_batch = store._write_batch
+
+    def flaky_write_batch(batch):
+        if failures:
+            raise failures.pop()
+        write_batch(batch)
+
+    store._write_batch = flaky_write_batch
+    store["fp-1"] = {"status": "completed"}
+
+    with pytest.raises(sqlite3.OperationalError, match="disk I/O error"):
+        store.flush()
+    assert store["fp-1"]["status"] == "completed"
+    while failures or store.stats()["pending_writes"]:
+        time.sleep(0.01)
+    store.flush()
+    assert store.stats()["commit_failures_total"] == 2
+    assert len(store) == 1
+    store.close()
+
+    reopened = SQLiteReportStore(str(tmp_path / "reports.db"))
+    assert reopened["fp-1"]["status"] == "completed"
+    reopened.close()
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "reports.db")
+    store = SQLiteReportStore(path)
+    store["fp-1"] = _report("completed")
+    store.close()
+
+    reopened = SQLiteReportStore(path)
+    assert reopened["fp-1"]["status"] == "completed"
+    assert reopened.stats()["entries"] == 1
+    reopened.close()
+
+
+def test_sqlite_store_indexes_lookup_columns(tmp_path):
+    path = str(tmp_path / "reports.db")
+    store = SQLiteReportStore(path)
+    store["fp-1"] = _report("completed")
+    store.close()
+
+    connection = sqlite3.connect(path)
+    row = connection.execute(
+        "SELECT status, created_at, namespace, alertname, severity "
+        "FROM reports WHERE fingerprint = 'fp-1'"
+    ).fetchone()
+    plan = connection.execute(
+        "EXPLAIN QUERY PLAN SELECT fingerprint FROM reports WHERE namespace = ?",
+        ("payments",)
+    ).fetchall()
+    connection.close()
+
+    assert row == (
+        "completed", "2024-01-01T12:00:00+00:00", "payments", "PodCrashLooping",
+        "critical"
+    )
+    assert "reports_namespace_idx" in str(plan)
+
+
+def test_sqlite_store_refuses_reads_once_closed(tmp_path):
+    store = SQLiteReportStore(str(tmp_path / "reports.db"))
+    store.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.get("fp-1")
+
+
+def test_sqlite_store_indexes_reports_of_older_schema(tmp_path):
+    path = str(tmp_path / "reports.db")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE reports (fingerprint TEXT PRIMARY KEY, "
+        "payload TEXT NOT NULL, updated_at REAL NOT NULL)"
+    )
+    connection.execute(
+        "INSERT INTO reports VALUES ('fp-1', ?, 0)",
+        (json.dumps(_report("completed")),)
+    )
+    connection.commit()
+    connection.close()
+
+    store = SQLiteReportStore(path)
+    assert store["fp-1"]["status"] == "completed"
+    store.close()
+    connection = sqlite3.connect(path)
+    assert connection.execute(
+        "SELECT namespace FROM reports WHERE status = 'completed'"
+    ).fetchone() == ("payments",)
+    connection.close()
+
+
+def test_sqlite_store_normalises_creation_times_of_older_versions(tmp_path):
+    path = str(tmp_path / "reports.db")
+    SQLiteReportStore(path).close()
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.execute(
+        "INSERT INTO reports (fingerprint, created_at, updated_at, payload) "
+        "VALUES ('fp-1', '2024-01-01T14:00:00+02:00', 0, ?)",
+        (json.dumps(_report("completed")),)
+    )
+    connection.commit()
+    connection.close()
+
+    store = SQLiteReportStore(path)
+    rows = store.query(ReportQuery(since="2024-01-01T12:00:00Z"))
+    store.close()
+
+    assert rows[0][0]["created_at"] == "2024-01-01T12:00:00+00:00"
+
+
+def _fill(store):
+    for i, (namespace, status) in enumerate([
+        ("payments", "completed"), ("payments", "failed"),
+        ("search", "completed"), ("payments", "completed"),
+    ]):
+        report = _report(status, namespace=namespace, fingerprint=f"fp-{i}")
+        report["created_at"] = f"2024-01-0{i + 1}T12:00:00"
+        store[f"fp-{i}"] = report
+
+
+def _fingerprints(rows):
+    return [columns["fingerprint"] for columns, _ in rows]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def filled_store(request, tmp_path):
+    if request.param == "memory":
+        store = MemoryReportStore()
+    else:
+        store = SQLiteReportStore(str(tmp_path / "reports.db"))
+    _fill(store)
+    yield store
+    if request.param == "sqlite":
+        store.close()
+
+
+def test_query_filters_and_orders(filled_store):
+    rows = filled_store.query(
+        ReportQuery(namespace="payments", status="completed")
+    )
+
+    assert _fingerprints(rows) == ["fp-3", "fp-0"]
+    assert rows[0][0]["alertname"] == "PodCrashLooping"
+    assert rows[0][1]["status"] == "completed"
+
+
+def test_query_pages_with_keyset(filled_store):
+    first = filled_store.query(ReportQuery(descending=False, limit=2))
+    last = first[-1][0]
+    second = filled_store.query(ReportQuery(
+        descending=False, limit=2,
+        after=(last["created_at"], last["fingerprint"])
+    ))
+
+    assert _fingerprints(first) == ["fp-0", "fp-1"]
+    assert _fingerprints(second) == ["fp-2", "fp-3"]
+
+
+def test_query_time_range(filled_store):
+    rows = filled_store.query(ReportQuery(
+        since="2024-01-02T00:00:00", until="2024-01-03T23:59:59"
+    ))
+
+    assert _fingerprints(rows) == ["fp-2", "fp-1"]
+
+
+
+def test_sqlite_query_merges_buffered_writes(tmp_path):
+    store = SQLiteReportStore(str(tmp_path / "reports.db"))
+    _fill(store)
+    store.flush()
+    # Hold the writer so the next writes stay buffered.
+    release = threading.Event()
+    write_batch = store._write_batch
+    store._write_batch = lambda batch: release.wait() and write_batch(batch)
+    for fingerprint, status, day in [("fp-0", "failed", 1), ("fp-4", "completed", 5)]:
+        report = _report(status, fingerprint=fingerprint)
+        report["created_at"] = f"2024-01-0{day}T12:00:00"
+        store[fingerprint] = report
+    del store["fp-2"]
+
+    assert _fingerprints(store.query(ReportQuery(limit=3))) == [
+        "fp-4", "fp-3", "fp-1"
+    ]
+    assert _fingerprints(store.query(ReportQuery(status="failed"))) == [
+        "fp-1", "fp-0"
+    ]
+    assert store.stats()["pending_writes"] == 3
+    release.set()
+    store.close()
+
+@pytest.mark.parametrize("value, expected", [
+    ("2024-01-02T10:00:00Z", "2024-01-02T10:00:00+00:00"),
+    ("2024-01-02T12:00:00+02:00", "2024-01-02T10:00:00+00:00"),
+    ("2024-01-02T10:00:00.123456789Z", "2024-01-02T10:00:00.123456+00:00"),
+    ("2024-01-02", "2024-01-02T00:00:00+00:00"),
+])
+def test_normalize_timestamp(value, expected):
+    assert normalize_timestamp(value) == expected
+
+
+def test_query_time_range_compares_instants(filled_store):
+    """Bounds and creation times with other offsets or fractions still match."""
+    report = _report("completed", fingerprint="fp-9")
+    report["created_at"] = "2024-01-02T13:00:00.5+01:00"
+    filled_store["fp-9"] = report
+
+    rows = filled_store.query(ReportQuery(
+        since="2024-01-02T12:00:00.4Z", until="2024-01-02T14:30:00+02:00"
+    ))
+
+    assert _fingerprints(rows) == ["fp-9"]
+
+
+def test_query_rejects_invalid_time_bound():
+    with pytest.raises(ValueError):
+        ReportQuery(since="yesterday")
+
+
+def test_scan_matches_indexed_query(filled_store):
+    plain = dict(filled_store.items())
+    report_query = ReportQuery(namespace="payments")
+
+    assert _fingerprints(scan_reports(plain, report_query)) == \
+        _fingerprints(filled_store.query(report_query))
+
+
+def test_iter_reports_pages_through_all_matches(filled_store):
+    exported = iter_reports(
+        filled_store, ReportQuery(descending=False, since="2024-01-02"),
+        page_size=1
+    )
+
+    assert [fingerprint for fingerprint, _ in exported] == ["fp-1", "fp-2", "fp-3"]
+
+
+def _group_reports():
+    group = AlertGroup(
+        version="4",
+        groupKey="group-1",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={"namespace": "payments"},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(
+                    alertname="PodCrashLooping", namespace="payments",
+                    severity="critical" if i else "warning"
+                ),
+                annotations=AlertAnnotation(summary="x" * 200),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{i}"
+            )
+            for i in range(3)
+        ]
+    )
+    record = compact_alert_group(group)
+    return record, {
+        f"fp-{i}": {
+            "status": "completed",
+            "alert_group": record,
+            "alert_index": i,
+            "created_at": "2024-01-01T12:00:00",
+        }
+        for i in range(3)
+    }
+
+
+def test_memory_store_counts_shared_group_once():
+    record, reports = _group_reports()
+    store = MemoryReportStore()
+    for fingerprint, report in reports.items():
+        store[fingerprint] = report
+    report_bytes = sum(estimate_report_size(r) for r in reports.values())
+
+    assert store.stats()["bytes"] == report_bytes + record.size
+    assert store.stats()["alert_groups"] == 1
+    assert [columns["severity"] for columns, _ in store.query(
+        ReportQuery(descending=False)
+    )] == ["warning", "critical", "critical"]
+
+    for fingerprint in reports:
+        del store[fingerprint]
+    assert store.stats()["bytes"] == 0
+    assert store.stats()["alert_groups"] == 0
+
+
+def test_sqlite_store_writes_shared_group_once(tmp_path):
+    path = str(tmp_path / "reports.db")
+    record, reports = _group_reports()
+    store = SQLiteReportStore(path)
+    for fingerprint, report in reports.items():
+        store[fingerprint] = report
+    store.flush()
+
+    assert store.stats()["alert_groups"] == 1
+    assert store["fp-1"]["alert_group"] is record
+    assert store["fp-1"]["alert_index"] == 1
+    store.close()
+
+    reopened = SQLiteReportStore(path)
+    del record, reports
+    loaded = reopened["fp-2"]["alert_group"]
+    assert loaded.alerts[2].fingerprint == "fp-2"
+    assert reopened["fp-0"]["alert_group"] is loaded
+
+    for fingerprint in ("fp-0", "fp-1", "fp-2"):
+        del reopened[fingerprint]
+    reopened.flush()
+    assert reopened.stats()["alert_groups"] == 0
+    reopened.close()
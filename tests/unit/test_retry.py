@@ -0,0 +1,201 @@
+"""Tests for analysis retries with backoff."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from oncallm import main
+from oncallm.alerts import (
+    Alert,
+    AlertAnnotation,
+    AlertGroup,
+    AlertLabel,
+    OncallK8sResponse,
+)
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.retry import (
+    RetryableAnalysisError,
+    RetryPolicy,
+    RetryQueue,
+    is_retryable_error,
+)
+from oncallm.scheduler import AlertScheduler
+
+
+class _StatusError(Exception):
+    """Stand-in for provider errors carrying an HTTP status code."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _make_job() -> AnalysisJob:
+    alert_group = AlertGroup(
+        version="4",
+        groupKey="retry-group",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(alertname="TestAlert", namespace="default"),
+                annotations=AlertAnnotation(),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint="retry-fp"
+            )
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+@pytest.fixture(autouse=True)
+def clear_state():
+    main._analysis_reports.clear()
+    main._pending_groups.clear()
+    main._deduplicator.clear()
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("read timed out"),
+    ConnectionResetError("reset by peer"),
+    _StatusError(429),
+    _StatusError(503),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("bad structured output"),
+    _StatusError(400),
+    _StatusError(401),
+])
+def test_fatal_errors_are_not_retryable(error):
+    assert not is_retryable_error(error)
+
+
+def test_wrapped_transient_error_is_retryable():
+    """Provider errors wrapped by LangChain are found through the chain."""
+    try:
+        try:
+            raise _StatusError(429)
+        except _StatusError as inner:
+            raise RuntimeError("agent failed") from inner
+    except RuntimeError as outer:
+        assert is_retryable_error(outer)
+
+
+def test_backoff_grows_exponentially_with_bounded_jitter():
+    policy = RetryPolicy(
+        base_delay_seconds=10, max_delay_seconds=60, random_func=lambda: 0.999
+    )
+    low = RetryPolicy(
+        base_delay_seconds=10, max_delay_seconds=60, random_func=lambda: 0.0
+    )
+
+    assert low.next_delay(1) == 5
+    assert policy.next_delay(1) == pytest.approx(10, abs=0.01)
+    assert low.next_delay(2) == 10
+    assert low.next_delay(10) == 30
+    assert policy.next_delay(10) == pytest.approx(60, abs=0.1)
+
+
+def test_attempt_budget_is_respected():
+    policy = RetryPolicy(max_attempts=2)
+    job = _make_job()
+
+    assert policy.should_retry(job, TimeoutError())
+    job.attempt = 2
+    assert not policy.should_retry(job, TimeoutError())
+
+
+def test_retry_queue_resubmits_after_delay_and_can_cancel():
+    async def scenario():
+        submitted = []
+        retry_queue = RetryQueue(submit=submitted.append)
+        kept, cancelled = _make_job(), _make_job()
+        retry_queue.schedule(kept, 0.01)
+        retry_queue.schedule(cancelled, 0.01)
+        assert retry_queue.cancel(cancelled.job_id) is cancelled
+        await asyncio.sleep(0.05)
+        return submitted, retry_queue.stats()
+
+    submitted, stats = asyncio.run(scenario())
+
+    assert len(submitted) == 1
+    assert stats == {"waiting": 0, "scheduled_total": 2}
+
+
+@patch("oncallm.main._agent")
+def test_process_alert_raises_for_retryable_failure(mock_agent):
+    """A transient failure leaves no failed report while attempts remain."""
+    mock_agent.do_analysis.side_effect = TimeoutError("LLM timed out")
+
+    with patch("oncallm.main._retry_queue", MagicMock()):
+        with pytest.raises(RetryableAnalysisError):
+            main._process_alert(_make_job())
+
+    assert "retry-fp" not in main._analysis_reports
+
+
+@patch("oncallm.main._agent")
+def test_process_alert_fails_when_budget_spent(mock_agent):
+    mock_agent.do_analysis.side_effect = TimeoutError("LLM timed out")
+    job = _make_job()
+    job.attempt = main._retry_policy.max_attempts
+
+    with patch("oncallm.main._retry_queue", MagicMock()):
+        assert main._process_alert(job) is False
+
+    report = main._analysis_reports["retry-fp"]
+    assert report["status"] == "failed"
+    assert report["attempts"] == job.attempt
+
+
+@patch("oncallm.main._agent")
+def test_transient_failure_is_retried_through_delay_queue(mock_agent):
+    """The worker pool re-runs a rate-limited analysis after backoff."""
+    mock_agent.do_analysis.side_effect = [
+        _StatusError(429),
+        OncallK8sResponse(
+            root_cause="Recovered", conclusion="c", diagnosis="d",
+            summary_of_findings="s", recommended_actions="a",
+            recommendations="r", solution="fix"
+        ),
+    ]
+
+    async def scenario():
+        scheduler = AlertScheduler()
+        executor = ThreadPoolExecutor(max_workers=1)
+        semaphore = asyncio.Semaphore(1)
+        retry_queue = RetryQueue(submit=main._resubmit_job)
+        policy = RetryPolicy(base_delay_seconds=0.01, max_delay_seconds=0.01)
+        with patch("oncallm.main._alert_queue", scheduler), \
+             patch("oncallm.main._retry_queue", retry_queue), \
+             patch("oncallm.main._retry_policy", policy):
+            scheduler.put_nowait(_make_job())
+            worker = asyncio.create_task(
+                main._process_alerts_worker(scheduler, executor, semaphore)
+            )
+            for _ in range(200):
+                report = main._analysis_reports.get("retry-fp", {})
+                if report.get("status") == "completed":
+                    break
+                await asyncio.sleep(0.01)
+            worker.cancel()
+            await worker
+        executor.shutdown(wait=True)
+
+    asyncio.run(scenario())
+
+    assert mock_agent.do_analysis.call_count == 2
+    assert main._analysis_reports["retry-fp"]["analysis"]["root_cause"] == "Recovered"
@@ -0,0 +1,321 @@
+"""Tests for the priority alert scheduler."""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+import pytest
+
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.scheduler import (
+    AlertScheduler,
+    classify_alert_group,
+    parse_priority_rules,
+    parse_tenant_settings,
+    tenant_of,
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _make_job(
+    name: str,
+    severity: Optional[str] = "warning",
+    namespace: str = "default"
+) -> AnalysisJob:
+    alert_group = AlertGroup(
+        version="4",
+        groupKey=f"group-{name}",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(
+                    alertname=name, namespace=namespace, severity=severity
+                ),
+                annotations=AlertAnnotation(),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{name}"
+            )
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+def _drain(scheduler: AlertScheduler) -> list:
+    async def drain():
+        names = []
+        while not scheduler.empty():
+            job = await scheduler.get()
+            scheduler.task_done()
+            names.append(job.alert_group.alerts[0].labels.alertname)
+        return names
+    return asyncio.run(drain())
+
+
+def test_classify_uses_severity_label():
+    assert classify_alert_group(_make_job("a", "critical").alert_group, []) == "critical"
+    assert classify_alert_group(_make_job("a", "info").alert_group, []) == "info"
+    assert classify_alert_group(_make_job("a", None).alert_group, []) == "warning"
+
+
+def test_classify_label_rules_override_severity():
+    rules = parse_priority_rules("namespace=payments:critical")
+    job = _make_job("a", "info", namespace="payments")
+    assert classify_alert_group(job.alert_group, rules) == "critical"
+
+
+def test_parse_priority_rules_rejects_unknown_class():
+    with pytest.raises(ValueError):
+        parse_priority_rules("namespace=payments:urgent")
+    with pytest.raises(ValueError):
+        parse_priority_rules("namespace:critical")
+
+
+def test_critical_jobs_jump_the_queue():
+    """Critical work is dequeued before earlier warning and info work."""
+    clock = FakeClock()
+    scheduler = AlertScheduler(aging_seconds=300, clock=clock)
+    for name, severity in [("i", "info"), ("w", "warning"), ("c", "critical")]:
+        scheduler.put_nowait(_make_job(name, severity))
+        clock.now += 1
+
+    assert _drain(scheduler) == ["c", "w", "i"]
+
+
+def test_aging_prevents_starvation():
+    """A long-waiting info job overtakes freshly queued critical work."""
+    clock = FakeClock()
+    scheduler = AlertScheduler(aging_seconds=10, clock=clock)
+    scheduler.put_nowait(_make_job("old-info", "info"))
+    clock.now += 31
+    scheduler.put_nowait(_make_job("new-critical", "critical"))
+
+    assert _drain(scheduler) == ["old-info", "new-critical"]
+
+
+def test_same_priority_is_fifo_without_aging():
+    scheduler = AlertScheduler(aging_seconds=0)
+    for name in ["first", "second", "third"]:
+        scheduler.put_nowait(_make_job(name, "warning"))
+
+    assert _drain(scheduler) == ["first", "second", "third"]
+
+
+def test_requeued_job_is_promoted_not_duplicated():
+    """Re-putting a refreshed job raises its priority without a duplicate."""
+    scheduler = AlertScheduler(aging_seconds=0)
+    scheduler.put_nowait(_make_job("warning", "warning"))
+    refreshed = _make_job("refreshed", "info")
+    scheduler.put_nowait(refreshed)
+    refreshed.alert_group.alerts[0].labels.severity = "critical"
+    scheduler.put_nowait(refreshed)
+
+    assert scheduler.qsize() == 2
+    assert _drain(scheduler) == ["refreshed", "warning"]
+
+
+def test_stats_report_wait_per_priority_class():
+    clock = FakeClock()
+    scheduler = AlertScheduler(aging_seconds=0, clock=clock)
+    scheduler.put_nowait(_make_job("c", "critical"))
+    scheduler.put_nowait(_make_job("i", "info"))
+    clock.now += 5
+    _drain(scheduler)
+
+    stats = scheduler.stats()
+    assert stats["queued"] == 0
+    critical = stats["priority_classes"]["critical"]
+    assert critical["enqueued_total"] == 1
+    assert critical["dequeued_total"] == 1
+    assert critical["wait_seconds_max"] == 5
+
+
+def test_get_waits_for_put():
+    """A waiting consumer is woken by a later put."""
+    async def scenario():
+        scheduler = AlertScheduler()
+        getter = asyncio.create_task(scheduler.get())
+        await asyncio.sleep(0)
+        await scheduler.put(_make_job("late"))
+        job = await asyncio.wait_for(getter, timeout=1)
+        scheduler.task_done()
+        await asyncio.wait_for(scheduler.join(), timeout=1)
+        return job
+
+    assert asyncio.run(scenario()).group_key == "group-late"
+
+
+def test_full_queue_rejects_by_default():
+    scheduler = AlertScheduler(maxsize=2)
+    scheduler.put_nowait(_make_job("a"))
+    scheduler.put_nowait(_make_job("b"))
+
+    with pytest.raises(asyncio.QueueFull):
+        scheduler.put_nowait(_make_job("c", "critical"))
+    assert scheduler.qsize() == 2
+    assert scheduler.stats()["priority_classes"]["critical"]["rejected_total"] == 1
+
+
+def test_drop_lowest_evicts_least_urgent_job():
+    """A more urgent job displaces the least urgent queued job."""
+    shed = []
+    scheduler = AlertScheduler(
+        aging_seconds=0, maxsize=2, shed_policy="drop-lowest",
+        on_shed=shed.append
+    )
+    scheduler.put_nowait(_make_job("info", "info"))
+    scheduler.put_nowait(_make_job("warning", "warning"))
+    scheduler.put_nowait(_make_job("critical", "critical"))
+
+    assert [job.group_key for job in shed] == ["group-info"]
+    assert _drain(scheduler) == ["critical", "warning"]
+    assert scheduler.stats()["priority_classes"]["info"]["shed_total"] == 1
+
+
+def test_drop_lowest_refuses_job_no_more_urgent_than_queue():
+    shed = []
+    scheduler = AlertScheduler(
+        maxsize=1, shed_policy="drop-lowest", on_shed=shed.append
+    )
+    scheduler.put_nowait(_make_job("warning", "warning"))
+
+    with pytest.raises(asyncio.QueueFull):
+        scheduler.put_nowait(_make_job("info", "info"))
+    assert shed == []
+
+
+def test_can_admit_follows_shed_policy_without_evicting():
+    rejecting = AlertScheduler(maxsize=1)
+    dropping = AlertScheduler(maxsize=1, shed_policy="drop-lowest")
+    for scheduler in (rejecting, dropping):
+        scheduler.put_nowait(_make_job("warning", "warning"))
+
+    assert not rejecting.can_admit(_make_job("critical", "critical"))
+    assert dropping.can_admit(_make_job("critical", "critical"))
+    assert not dropping.can_admit(_make_job("info", "info"))
+    assert dropping.qsize() == 1
+
+
+def test_drop_oldest_evicts_longest_waiting_job():
+    clock = FakeClock()
+    shed = []
+    scheduler = AlertScheduler(
+        maxsize=2, shed_policy="drop-oldest", on_shed=shed.append,
+        clock=clock
+    )
+    for name in ["first", "second", "third"]:
+        scheduler.put_nowait(_make_job(name, "critical"))
+        clock.now += 1
+
+    assert [job.group_key for job in shed] == ["group-first"]
+    assert scheduler.qsize() == 2
+
+
+def test_unknown_shed_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AlertScheduler(shed_policy="drop-everything")
+
+
+def test_shed_jobs_do_not_block_join():
+    """Evicted jobs count as finished so join() still returns."""
+    async def scenario():
+        scheduler = AlertScheduler(maxsize=1, shed_policy="drop-oldest")
+        scheduler.put_nowait(_make_job("first"))
+        scheduler.put_nowait(_make_job("second"))
+        await scheduler.get()
+        scheduler.task_done()
+        await asyncio.wait_for(scheduler.join(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_removed_job_is_not_dispatched():
+    """Withdrawn jobs are skipped and no longer count as unfinished."""
+    scheduler = AlertScheduler()
+    cancelled, kept = _make_job("cancelled"), _make_job("kept")
+    scheduler.put_nowait(cancelled)
+    scheduler.put_nowait(kept)
+
+    assert scheduler.remove(cancelled.job_id) is cancelled
+    assert scheduler.remove(cancelled.job_id) is None
+    assert scheduler.queued_jobs() == [kept]
+    assert _drain(scheduler) == ["kept"]
+    assert scheduler.stats()["priority_classes"]["warning"]["cancelled_total"] == 1
+
+
+def _get_nowait(scheduler: AlertScheduler, timeout: float = 0.05):
+    """Take the next job, or None if none may start."""
+    async def get():
+        try:
+            return await asyncio.wait_for(scheduler.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+    return asyncio.run(get())
+
+
+def test_parse_tenant_settings():
+    assert parse_tenant_settings("payments=3, *=1") == {"payments": 3, "*": 1}
+    assert parse_tenant_settings("") == {}
+    with pytest.raises(ValueError):
+        parse_tenant_settings("payments")
+    with pytest.raises(ValueError):
+        parse_tenant_settings("payments=-1")
+
+
+def test_tenant_of_namespace_and_receiver():
+    alert_group = _make_job("a", namespace="payments").alert_group
+    assert tenant_of(alert_group, "namespace") == "payments"
+    assert tenant_of(alert_group, "receiver") == "test-receiver"
+    assert tenant_of(alert_group, None) == "default"
+    assert tenant_of(alert_group, "team") == "default"
+
+
+def test_noisy_tenant_does_not_starve_others():
+    """Tenants take turns in proportion to their weights."""
+    scheduler = AlertScheduler(
+        tenant_key="namespace", tenant_weights={"quiet": 2}
+    )
+    for i in range(6):
+        scheduler.put_nowait(_make_job(f"noisy{i}", namespace="noisy"))
+    for i in range(2):
+        scheduler.put_nowait(_make_job(f"quiet{i}", namespace="quiet"))
+
+    assert _drain(scheduler)[:5] == ["quiet0", "noisy0", "quiet1", "noisy1", "noisy2"]
+
+
+def test_tenant_concurrency_cap():
+    """A capped tenant waits for its running job while others proceed."""
+    scheduler = AlertScheduler(
+        tenant_key="namespace", tenant_limits={"noisy": 1}
+    )
+    scheduler.put_nowait(_make_job("noisy0", namespace="noisy"))
+    scheduler.put_nowait(_make_job("noisy1", namespace="noisy"))
+    scheduler.put_nowait(_make_job("quiet0", namespace="quiet"))
+
+    running = _get_nowait(scheduler)
+    assert _get_nowait(scheduler).group_key == "group-quiet0"
+    assert _get_nowait(scheduler) is None
+
+    scheduler.task_done(running)
+    assert _get_nowait(scheduler).group_key == "group-noisy1"
+
+    tenants = scheduler.stats()["tenants"]
+    assert tenants["noisy"]["running"] == 1
+    assert tenants["noisy"]["max_concurrency"] == 1
+    assert tenants["quiet"]["dequeued_total"] == 1
@@ -0,0 +1,268 @@
+"""Tests for the work queue shared by replicas."""
+
+import asyncio
+from datetime import datetime
+
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.shared_queue import SharedJobQueue
+
+
+def _make_job(group: str, fingerprints=("fp",), severity="warning") -> AnalysisJob:
+    alert_group = AlertGroup(
+        version="4",
+        groupKey=group,
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(
+                    alertname="TestAlert", namespace="default", severity=severity
+                ),
+                annotations=AlertAnnotation(summary=f"{group} {fingerprint}"),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"{group}-{fingerprint}"
+            )
+            for fingerprint in fingerprints
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+async def _open_replicas(path, count=2, **kwargs):
+    replicas = [
+        SharedJobQueue(path, owner_id=f"replica-{i}", **kwargs)
+        for i in range(count)
+    ]
+    for replica in replicas:
+        await replica.start()
+    return replicas
+
+
+async def _close(replicas):
+    for replica in replicas:
+        await replica.close()
+
+
+def test_job_appended_by_one_replica_is_claimed_once(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(str(tmp_path / "shared.db"))
+        job = _make_job("group-1")
+        await a.append(job)
+        claimed_by_b = await b.claim(5)
+        claimed_by_a = await a.claim(5)
+        stats = await a.stats()
+        await _close([a, b])
+        return job, claimed_by_b, claimed_by_a, stats
+
+    job, claimed_by_b, claimed_by_a, stats = asyncio.run(scenario())
+
+    assert [claimed.job_id for claimed in claimed_by_b] == [job.job_id]
+    assert claimed_by_a == []
+    assert stats["waiting"] == 0
+    assert stats["leased"] == 1
+
+
+def test_claims_follow_priority(tmp_path):
+    def priority(job):
+        return 0.0 if job.group_key == "urgent" else 1.0
+
+    async def scenario():
+        (replica,) = await _open_replicas(
+            str(tmp_path / "shared.db"), count=1, priority_key=priority
+        )
+        await replica.append(_make_job("later"))
+        await replica.append(_make_job("urgent"))
+        claimed = await replica.claim(1)
+        await _close([replica])
+        return claimed
+
+    assert [job.group_key for job in asyncio.run(scenario())] == ["urgent"]
+
+
+def test_waiting_group_is_coalesced(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(str(tmp_path / "shared.db"))
+        first = _make_job("group-1", fingerprints=("a",))
+        second = _make_job("group-1", fingerprints=("a", "b"))
+        await a.append(first)
+        await b.append(second)
+        claimed = await a.claim(5)
+        await _close([a, b])
+        return first, claimed
+
+    first, claimed = asyncio.run(scenario())
+
+    assert len(claimed) == 1
+    # The latest snapshot under the id of the job it joined.
+    assert claimed[0].job_id == first.job_id
+    assert claimed[0].fingerprints == ["group-1-a", "group-1-b"]
+
+
+def test_started_group_gets_a_new_job(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(str(tmp_path / "shared.db"))
+        await a.append(_make_job("group-1"))
+        started = await a.claim(1)
+        await b.append(_make_job("group-1"))
+        claimed = await b.claim(5)
+        await _close([a, b])
+        return started, claimed
+
+    started, claimed = asyncio.run(scenario())
+
+    assert len(claimed) == 1
+    assert claimed[0].job_id != started[0].job_id
+
+
+def test_expired_lease_is_claimed_by_another_replica(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(
+            str(tmp_path / "shared.db"), lease_seconds=0.05
+        )
+        await a.append(_make_job("group-1"))
+        await a.claim(1)
+        await asyncio.sleep(0.1)
+        claimed = await b.claim(1)
+        await _close([a, b])
+        return claimed
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+def test_renewed_lease_is_kept(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(
+            str(tmp_path / "shared.db"), lease_seconds=0.3
+        )
+        await a.append(_make_job("group-1"))
+        (job,) = await a.claim(1)
+        await asyncio.sleep(0.2)
+        a.renew([job.job_id])
+        await asyncio.sleep(0.2)
+        claimed = await b.claim(1)
+        await _close([a, b])
+        return claimed
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_acked_and_released_jobs(tmp_path):
+    async def scenario():
+        a, b = await _open_replicas(str(tmp_path / "shared.db"))
+        await a.append(_make_job("done"))
+        await a.append(_make_job("unfinished"))
+        claimed = {job.group_key: job for job in await a.claim(2)}
+        a.ack(claimed["done"].job_id)
+        await a.release_owned()
+        taken_over = await b.claim(5)
+        await _close([a, b])
+        return taken_over
+
+    assert [job.group_key for job in asyncio.run(scenario())] == ["unfinished"]
+
+
+def test_withdraw_resolved_alerts(tmp_path):
+    async def scenario():
+        (replica,) = await _open_replicas(str(tmp_path / "shared.db"), count=1)
+        await replica.append(_make_job("group-1", fingerprints=("a", "b")))
+        partly = await replica.withdraw_resolved("group-1", {"group-1-a"})
+        (job,) = await replica.claim(1)
+        replica.ack(job.job_id)
+        await replica.append(_make_job("group-2", fingerprints=("a",)))
+        fully = await replica.withdraw_resolved("group-2", {"group-2-a"})
+        remaining = await replica.claim(5)
+        await _close([replica])
+        return partly, job, fully, remaining
+
+    partly, job, fully, remaining = asyncio.run(scenario())
+
+    assert partly == 0
+    assert job.fingerprints == ["group-1-b"]
+    assert fully == 1
+    assert remaining == []
+
+
+
+def test_claimed_jobs_waiting_locally_keep_their_lease(tmp_path, monkeypatch):
+    """Jobs claimed into the local scheduler are not claimed again elsewhere."""
+    from oncallm import main
+    from oncallm.scheduler import AlertScheduler
+
+    monkeypatch.setattr(main, "_started_jobs", {})
+
+    async def scenario():
+        a, b = await _open_replicas(
+            str(tmp_path / "shared.db"), lease_seconds=0.3
+        )
+        await a.append(_make_job("group-1"))
+        scheduler = AlertScheduler()
+        claim_task = asyncio.create_task(
+            main._claim_shared_jobs(a, scheduler, 1, 0.02)
+        )
+        await asyncio.sleep(0.6)
+        claimed = await b.claim(1)
+        claim_task.cancel()
+        await asyncio.gather(claim_task, return_exceptions=True)
+        waiting = scheduler.qsize()
+        await _close([a, b])
+        return claimed, waiting
+
+    claimed, waiting = asyncio.run(scenario())
+
+    assert waiting == 1
+    assert claimed == []
+
+
+def test_running_job_is_released_on_graceful_shutdown(tmp_path, monkeypatch):
+    """Another replica takes over a job that was running at shutdown."""
+    import threading
+    from unittest.mock import MagicMock
+
+    from oncallm import main
+
+    path = str(tmp_path / "shared.db")
+    monkeypatch.setenv("ONCALLM_QUEUE_BACKEND", "shared")
+    monkeypatch.setenv("ONCALLM_SHARED_STORE_PATH", path)
+    monkeypatch.setenv("ONCALLM_SHARED_POLL_SECONDS", "0.02")
+    # Closing the notifier yields to the event loop during the shutdown.
+    monkeypatch.setenv("ONCALLM_CALLBACK_URLS", "http://127.0.0.1:9/hook")
+    # The lifespan replaces these globals; restore them afterwards.
+    for name in (
+        "_alert_queue", "_executor", "_analysis_semaphore", "_job_journal",
+        "_retry_queue", "_storm_batcher", "_template_renderer", "_agent",
+        "_shared_queue", "_analysis_reports", "_completion_notifier",
+    ):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    release = threading.Event()
+    agent = MagicMock()
+    agent.do_analysis.side_effect = lambda *args, **kwargs: release.wait(5)
+    monkeypatch.setattr(main, "OncallmAgent", lambda: agent)
+    monkeypatch.setattr(main, "_started_jobs", {})
+    monkeypatch.setattr(main, "_pending_groups", {})
+
+    async def scenario():
+        async with main._lifespan(main.app):
+            await main.webhook(_make_job("group-1").alert_group)
+            for _ in range(200):
+                if agent.do_analysis.called:
+                    break
+                await asyncio.sleep(0.01)
+            assert agent.do_analysis.called
+        (other,) = await _open_replicas(path, count=1)
+        claimed = await other.claim(5)
+        await _close([other])
+        return claimed
+
+    try:
+        claimed = asyncio.run(scenario())
+    finally:
+        release.set()
+
+    assert [job.group_key for job in claimed] == ["group-1"]
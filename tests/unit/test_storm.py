@@ -0,0 +1,108 @@
+"""Tests for storm-mode micro-batching of correlated alerts."""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List
+
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.storm import (
+    DEFAULT_CLUSTER_LABELS,
+    StormBatcher,
+    correlation_key,
+    merge_jobs,
+    parse_cluster_labels,
+)
+
+
+def _make_job(name: str, **labels: str) -> AnalysisJob:
+    labels.setdefault("namespace", "default")
+    alert_group = AlertGroup(
+        version="4",
+        groupKey=f"group-{name}",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={"alertname": name},
+        commonLabels={"alertname": name, "team": "platform"},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(alertname=name, **labels),
+                annotations=AlertAnnotation(),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{name}"
+            )
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+def test_extra_labels_are_kept():
+    """Labels outside the model, like node, are available for clustering."""
+    job = _make_job("a", node="node-1")
+    assert job.alert_group.alerts[0].labels.model_dump()["node"] == "node-1"
+
+
+def test_parse_cluster_labels_defaults():
+    assert parse_cluster_labels("") == list(DEFAULT_CLUSTER_LABELS)
+    assert parse_cluster_labels(" node , app ") == ["node", "app"]
+
+
+def test_correlation_key_prefers_earlier_labels():
+    job = _make_job("a", node="node-1", deployment="api")
+    assert correlation_key(job.alert_group, ["node", "deployment"]) == "node=node-1"
+    assert correlation_key(job.alert_group, ["deployment"]) == "deployment=api"
+    assert correlation_key(job.alert_group, ["statefulset"]) is None
+
+
+def test_correlation_key_requires_a_shared_value():
+    job = _make_job("a", node="node-1")
+    other = _make_job("b", node="node-2")
+    job.alert_group.alerts.extend(other.alert_group.alerts)
+
+    assert correlation_key(job.alert_group, ["node", "namespace"]) == "namespace=default"
+
+
+def test_merge_jobs_combines_alerts():
+    first = _make_job("a", node="node-1")
+    second = _make_job("b", node="node-1")
+
+    merged = merge_jobs("node=node-1", [first, second])
+
+    assert merged.fingerprints == ["fp-a", "fp-b"]
+    assert merged.correlation_key == "node=node-1"
+    assert merged.alert_group.groupLabels == {"node": "node-1"}
+    assert merged.alert_group.commonLabels == {"team": "platform"}
+    assert merged.group_key.startswith("storm:node=node-1:")
+
+
+def test_batcher_merges_correlated_jobs_after_window():
+    submitted: List[Dict] = []
+
+    async def submit(job, members):
+        submitted.append({"job": job, "members": members})
+
+    async def scenario():
+        batcher = StormBatcher(0.01, submit=submit, cluster_labels=["node"])
+        batcher.add(_make_job("a", node="node-1"))
+        batcher.add(_make_job("b", node="node-1"))
+        batcher.add(_make_job("c", node="node-2"))
+        withdrawn = _make_job("d", node="node-1")
+        batcher.add(withdrawn)
+        assert batcher.remove(withdrawn.job_id) is withdrawn
+        await asyncio.sleep(0.05)
+        return batcher.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert [entry["job"].fingerprints for entry in submitted] == [
+        ["fp-a", "fp-b"], ["fp-c"]
+    ]
+    assert len(submitted[0]["members"]) == 2
+    assert submitted[1]["job"] is submitted[1]["members"][0]
+    assert stats["batches_total"] == 1
+    assert stats["merged_jobs_total"] == 2
+    assert stats["buffered"] == 0
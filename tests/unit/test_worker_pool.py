@@ -0,0 +1,128 @@
+"""Tests for the bounded alert worker pool in oncallm.main."""
+
+import asyncio
+from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from oncallm import main
+from oncallm.alerts import Alert, AlertAnnotation, AlertGroup, AlertLabel
+from oncallm.jobs import AnalysisJob, build_analysis_job
+from oncallm.scheduler import AlertScheduler
+
+
+def _make_job(index: int) -> AnalysisJob:
+    """Build a single-alert analysis job for the given index.
+
+    Args:
+        index: Suffix used for the group key and fingerprint.
+
+    Returns:
+        An analysis job ready to be queued.
+    """
+    alert_group = AlertGroup(
+        version="4",
+        groupKey=f"group-{index}",
+        status="firing",
+        receiver="test-receiver",
+        groupLabels={},
+        commonLabels={},
+        commonAnnotations={},
+        externalURL="http://alertmanager.example.com",
+        alerts=[
+            Alert(
+                status="firing",
+                labels=AlertLabel(alertname="TestAlert", namespace="default"),
+                annotations=AlertAnnotation(),
+                startsAt=datetime(2024, 1, 1, 12, 0, 0),
+                generatorURL="http://prometheus.example.com",
+                fingerprint=f"fp-{index}"
+            )
+        ]
+    )
+    return build_analysis_job(alert_group)
+
+
+def _run_pool(num_alerts: int, concurrency: int, work_seconds: float) -> int:
+    """Drain a queue through the worker pool and report peak concurrency.
+
+    Args:
+        num_alerts: Number of alerts to enqueue.
+        concurrency: Size of the worker pool.
+        work_seconds: Simulated duration of a single analysis.
+
+    Returns:
+        The highest number of analyses observed running at once.
+    """
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def fake_process_alert(job):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(work_seconds)
+        with lock:
+            state["running"] -= 1
+
+    async def scenario():
+        queue = AlertScheduler()
+        for i in range(num_alerts):
+            queue.put_nowait(_make_job(i))
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        semaphore = asyncio.Semaphore(concurrency)
+        worker = asyncio.create_task(
+            main._process_alerts_worker(queue, executor, semaphore)
+        )
+        await asyncio.wait_for(queue.join(), timeout=5)
+        worker.cancel()
+        await worker
+        executor.shutdown(wait=True)
+
+    with patch("oncallm.main._process_alert", fake_process_alert):
+        asyncio.run(scenario())
+    return state["peak"]
+
+
+def test_worker_pool_runs_analyses_concurrently():
+    """Alerts are analysed in parallel up to the configured concurrency."""
+    assert _run_pool(num_alerts=8, concurrency=4, work_seconds=0.1) == 4
+
+
+def test_worker_pool_never_exceeds_concurrency():
+    """The semaphore caps the number of in-flight analyses."""
+    assert _run_pool(num_alerts=10, concurrency=2, work_seconds=0.05) <= 2
+
+
+def test_worker_pool_survives_failing_analysis():
+    """A failing analysis releases its slot and does not stop the pool."""
+    def failing_process_alert(job):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = AlertScheduler()
+        for i in range(3):
+            queue.put_nowait(_make_job(i))
+        executor = ThreadPoolExecutor(max_workers=1)
+        semaphore = asyncio.Semaphore(1)
+        worker = asyncio.create_task(
+            main._process_alerts_worker(queue, executor, semaphore)
+        )
+        await asyncio.wait_for(queue.join(), timeout=5)
+        worker.cancel()
+        await worker
+        executor.shutdown(wait=True)
+        return semaphore.locked()
+
+    with patch("oncallm.main._process_alert", failing_process_alert):
+        assert asyncio.run(scenario()) is False
+
+
+def test_get_worker_concurrency_reads_environment(monkeypatch):
+    """ONCALLM_WORKER_CONCURRENCY controls the pool size."""
+    monkeypatch.setenv("ONCALLM_WORKER_CONCURRENCY", "7")
+    assert main._get_worker_concurrency() == 7
+    monkeypatch.setenv("ONCALLM_WORKER_CONCURRENCY", "0")
+    assert main._get_worker_concurrency() == 1